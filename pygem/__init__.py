@@ -6,18 +6,61 @@ PyGeM init
 #     'stlhandler', 'unvhandler', 'vtkhandler', 'nurbshandler', 'stephandler',
 #     'igeshandler', 'utils', 'gui', 'khandler', 'idw'
 # ]
+import importlib
+import sys
 
 from .affine import *
 from .freeform import FFD
 from .radial import RBF
 from .idw import IDW
 from .filehandler import FileHandler
+from .cache import PointsCache
 from .openfhandler import OpenFoamHandler
-from .stlhandler import StlHandler
+from .openfdecomposedhandler import OpenFoamDecomposedHandler
 from .unvhandler import UnvHandler
-from .vtkhandler import VtkHandler
-from .nurbshandler import NurbsHandler
-from .stephandler import StepHandler
-from .igeshandler import IgesHandler
 from .khandler import KHandler
 from .params import *
+
+# The handlers depending on VTK or pythonOCC, and their modules: they are
+# imported when they are accessed for the first time, so that `import pygem`
+# does not load VTK and pythonOCC.
+_LAZY_HANDLERS = {
+    'StlHandler': 'stlhandler',
+    'VtkHandler': 'vtkhandler',
+    'NurbsHandler': 'nurbshandler',
+    'StepHandler': 'stephandler',
+    'IgesHandler': 'igeshandler'
+}
+
+
+def __getattr__(name):
+    """
+    Imports the lazy handler (or module) `name` when it is accessed for the
+    first time.
+
+    :param str name: the name of the attribute.
+    """
+    if name in _LAZY_HANDLERS.values():
+        return importlib.import_module('.' + name, __name__)
+    if name in _LAZY_HANDLERS:
+        handler = getattr(
+            importlib.import_module('.' + _LAZY_HANDLERS[name], __name__),
+            name)
+        globals()[name] = handler
+        return handler
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(
+        __name__, name))
+
+
+def __dir__():
+    """
+    Lists the attributes of the package, with the lazy handlers.
+    """
+    return sorted(set(globals()) | set(_LAZY_HANDLERS) |
+                  set(_LAZY_HANDLERS.values()))
+
+
+if sys.version_info < (3, 7):
+    # the module __getattr__ is not supported: the handlers are imported now
+    for _name in _LAZY_HANDLERS:
+        __getattr__(_name)
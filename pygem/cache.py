@@ -0,0 +1,206 @@
+"""
+Utilities for caching the points parsed by the file handlers.
+
+A :class:`PointsCache` stores, for each parsed file, the points returned by
+`parse` in a `.npy` file and the layout of the file needed by `write` (e.g.
+the byte spans of the coordinates) in a `.npz` file. The entries are keyed on
+the absolute path, the size and the modification time of the parsed file and,
+optionally, on the hash of its content; the cached points are memory-mapped
+when loaded.
+"""
+import errno
+import hashlib
+import os
+import numpy as np
+from pygem.filehandler import _replace
+
+
+class PointsCache(object):
+    """
+    Class that stores the parsed points of the files on disk.
+
+    :param string directory: the directory where the entries are stored. If
+        None, the entries are stored in a `.pygem_cache` directory next to
+        each parsed file. Default is None.
+    :param int max_size: the maximum size, in bytes, of the entries of a
+        directory: the least recently used entries are removed when it is
+        exceeded. If None, the size is not bounded. Default is None.
+    :param bool use_hash: if True the SHA-1 hash of the content of the files
+        is part of the key, so that a modified file with the same size and
+        modification time is detected. Default is False.
+
+    :cvar string directory: the directory where the entries are stored.
+    :cvar int max_size: the maximum size, in bytes, of the entries of a
+        directory.
+    :cvar bool use_hash: if True the hash of the content of the files is part
+        of the key.
+
+    :Example:
+
+        >>> import pygem.cache as pc
+        >>> import pygem.unvhandler as uh
+        >>> unv_handler = uh.UnvHandler()
+        >>> unv_handler.cache = pc.PointsCache(max_size=2**30)
+        >>> mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+    """
+
+    def __init__(self, directory=None, max_size=None, use_hash=False):
+        self.directory = directory
+        self.max_size = max_size
+        self.use_hash = use_hash
+        self._hashes = {}
+
+    def key(self, filename, tag):
+        """
+        Method that computes the key of the entry of `filename`.
+
+        :param string filename: name of the parsed file.
+        :param string tag: the parser of the file (e.g. the name of the
+            handler class and its options).
+
+        :return: the key, a hexadecimal string.
+        :rtype: string
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        fields = [tag, path, str(stat.st_size), repr(stat.st_mtime)]
+        if self.use_hash:
+            fields.append(self._hash(path, stat))
+        return hashlib.sha1('\n'.join(fields).encode('utf-8')).hexdigest()
+
+    def load(self, filename, key):
+        """
+        Method that loads the entry `key` of `filename`. The points are
+        memory-mapped copy-on-write: they can be modified without changing
+        the entry.
+
+        :param string filename: name of the parsed file.
+        :param string key: the key of the entry.
+
+        :return: the points and the layout of the file, or None if the entry
+            does not exist.
+        :rtype: tuple
+        """
+        points_file, layout_file = self._entry_files(filename, key)
+        if not (os.path.isfile(points_file) and os.path.isfile(layout_file)):
+            return None
+
+        mesh_points = np.load(points_file, mmap_mode='c')
+        with np.load(layout_file) as layout_data:
+            layout = {name: layout_data[name] for name in layout_data.files}
+
+        # the access time is kept in the modification time, for the eviction
+        os.utime(points_file, None)
+        os.utime(layout_file, None)
+        return mesh_points, layout
+
+    def store(self, filename, key, mesh_points, layout):
+        """
+        Method that stores the entry `key` of `filename` and then removes the
+        least recently used entries exceeding `max_size`.
+
+        :param string filename: name of the parsed file.
+        :param string key: the key of the entry.
+        :param numpy.ndarray mesh_points: the parsed points.
+        :param dict layout: the layout of the file, as arrays.
+        """
+        points_file, layout_file = self._entry_files(filename, key)
+        directory = os.path.dirname(points_file)
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            # another job sharing the cache may have just created it
+            if error.errno != errno.EEXIST or not os.path.isdir(directory):
+                raise
+
+        # the entry is written in temporary files and moved, so that a
+        # concurrent job never loads a partial entry
+        temporary = '{0}.{1}.tmp'.format(points_file, os.getpid())
+        with open(temporary, 'wb') as output_file:
+            np.save(output_file, np.asarray(mesh_points))
+        _replace(temporary, points_file)
+        temporary = '{0}.{1}.tmp'.format(layout_file, os.getpid())
+        with open(temporary, 'wb') as output_file:
+            np.savez(output_file, **layout)
+        _replace(temporary, layout_file)
+
+        self._evict(directory)
+
+    def clear(self, directory=None):
+        """
+        Method that removes all the entries of `directory`, the cache
+        directory if None.
+
+        :param string directory: the directory of the entries.
+        """
+        directory = self.directory if directory is None else directory
+        if directory is None or not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.endswith(('.npy', '.npz')):
+                os.remove(os.path.join(directory, name))
+
+    def _entry_files(self, filename, key):
+        """
+        This private method returns the points and the layout files of the
+        entry `key` of `filename`.
+
+        :param string filename: name of the parsed file.
+        :param string key: the key of the entry.
+
+        :rtype: tuple
+        """
+        directory = self.directory
+        if directory is None:
+            directory = os.path.join(
+                os.path.dirname(os.path.abspath(filename)), '.pygem_cache')
+        entry = os.path.join(directory, key)
+        return entry + '.npy', entry + '.npz'
+
+    def _evict(self, directory):
+        """
+        This private method removes the least recently used entries of
+        `directory` until their size does not exceed `max_size`.
+
+        :param string directory: the directory of the entries.
+        """
+        if self.max_size is None:
+            return
+
+        entries = {}
+        for name in os.listdir(directory):
+            key, extension = os.path.splitext(name)
+            if extension not in ('.npy', '.npz'):
+                continue
+            stat = os.stat(os.path.join(directory, name))
+            size, last_use = entries.get(key, (0, 0.))
+            entries[key] = (size + stat.st_size, max(last_use, stat.st_mtime))
+
+        total_size = sum(size for size, _ in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key][1]):
+            if total_size <= self.max_size:
+                break
+            for extension in ('.npy', '.npz'):
+                entry_file = os.path.join(directory, key + extension)
+                if os.path.exists(entry_file):
+                    os.remove(entry_file)
+            total_size -= entries[key][0]
+
+    def _hash(self, path, stat):
+        """
+        This private method returns the SHA-1 hash of the content of `path`.
+        The hash is computed once for each size and modification time.
+
+        :param string path: the absolute path of the file.
+        :param os.stat_result stat: the status of the file.
+
+        :rtype: string
+        """
+        signature = (path, stat.st_size, stat.st_mtime)
+        if signature not in self._hashes:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as input_file:
+                for block in iter(lambda: input_file.read(1 << 20), b''):
+                    digest.update(block)
+            self._hashes[signature] = digest.hexdigest()
+        return self._hashes[signature]
@@ -1,7 +1,14 @@
 """
 Base module with the base class for reading and writing different CAD files.
 """
+import gzip
 import os
+from itertools import islice
+import numpy as np
+
+# os.replace overwrites the destination on all the platforms, but it is not
+# available in Python 2, where os.rename does it on POSIX
+_replace = getattr(os, 'replace', os.rename)
 
 
 class FileHandler(object):
@@ -12,12 +19,21 @@ class FileHandler(object):
     :cvar string outfile: name of the output file where to write in.
     :cvar list extensions: extensions of the input/output files. It is specific
         for each subclass.
+    :cvar bool gzip: if True the input/output files can also be gzip
+        compressed, with the additional '.gz' extension. It is specific for
+        each subclass.
+    :cvar PointsCache cache: if not None, the store of the points parsed by
+        the subclasses supporting it, that are loaded from it instead of
+        parsing again an unchanged file. Default is None.
     """
 
     def __init__(self):
         self.infile = None
         self.outfile = None
         self.extensions = []
+        self.gzip = False
+        self.cache = None
+        self._coord_spans = None
 
     def parse(self, *args):
         """
@@ -39,13 +55,207 @@ class FileHandler(object):
             "Subclass must implement abstract method " \
         + self.__class__.__name__ + ".write")
 
+    def deform_stream(self, deformation, filename, outfile,
+                      block_size=100000):
+        """
+        Deforms the file `filename` into `outfile` without holding the whole
+        mesh in memory: the lines of `filename` are read `block_size` at a
+        time, the points they contain are deformed and the block is written
+        to `outfile` before reading the next one. The same `deformation`
+        object (e.g. :class:`FFD`, :class:`RBF` or :class:`IDW`) is used for
+        all the blocks: its `original_mesh_points` is set to the points of
+        the block and its `perform` method is called.
+
+        The subclasses supporting it implement the private methods
+        `_locate_stream_points`, `_parse_stream_points` and
+        `_format_stream_points`.
+
+        :param deformation: the deformation to apply to the points.
+        :param string filename: name of the input file.
+        :param string outfile: name of the output file, that must be
+            different from the input one. It is written only if the whole
+            file is deformed: the blocks are written in a temporary file in
+            the same directory, that is then renamed to `outfile`.
+        :param int block_size: the number of lines read at a time. The
+            default value is 100000.
+        """
+        self._check_filename_type(filename)
+        self._check_extension(filename)
+        self._check_filename_type(outfile)
+        self._check_extension(outfile)
+        if block_size < 1:
+            raise ValueError('The block size must be positive.')
+        if os.path.exists(outfile) and os.path.samefile(filename, outfile):
+            raise ValueError('The output file must differ from the input one.')
+
+        self.infile = filename
+        self.outfile = outfile
+
+        # the temporary file keeps the extensions of `outfile`, so that it is
+        # compressed in the same way
+        directory, basename = os.path.split(os.path.abspath(self.outfile))
+        temporary = os.path.join(directory,
+                                 '.{0}.{1}'.format(os.getpid(), basename))
+        try:
+            state = None
+            with self._open_file(self.infile, 'rb') as input_file, \
+                    self._open_file(temporary, 'wb') as output_file:
+                lines = list(islice(input_file, block_size))
+                while lines:
+                    indices, state = self._locate_stream_points(lines, state)
+                    if indices:
+                        point_lines = [lines[index] for index in indices]
+                        deformation.original_mesh_points = \
+                            self._parse_stream_points(point_lines)
+                        deformation.perform()
+                        new_lines = self._format_stream_points(
+                            point_lines, deformation.modified_mesh_points)
+                        for index, line in zip(indices, new_lines):
+                            lines[index] = line
+                    output_file.write(b''.join(lines))
+                    lines = list(islice(input_file, block_size))
+            _replace(temporary, self.outfile)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def _locate_stream_points(self, lines, state):
+        """
+        Abstract private method to locate the lines containing points in a
+        block of lines read by `deform_stream`.
+
+        Not implemented, it has to be implemented in subclasses.
+
+        :param list lines: the lines of the block, as bytes.
+        :param state: the state returned for the previous block, None for
+            the first one.
+
+        :return: the indices of the lines containing points and the state
+            at the end of the block.
+        :rtype: tuple
+        """
+        raise NotImplementedError(
+            "Subclass must implement abstract method " \
+        + self.__class__.__name__ + "._locate_stream_points")
+
+    def _parse_stream_points(self, lines):
+        """
+        Abstract private method to parse the points of the `lines` located by
+        `_locate_stream_points`, one point per line.
+
+        Not implemented, it has to be implemented in subclasses.
+
+        :param list lines: the lines containing points, as bytes.
+
+        :rtype: numpy.ndarray
+        """
+        raise NotImplementedError(
+            "Subclass must implement abstract method " \
+        + self.__class__.__name__ + "._parse_stream_points")
+
+    def _format_stream_points(self, lines, mesh_points):
+        """
+        Abstract private method to replace the points of the `lines` located
+        by `_locate_stream_points` with `mesh_points`.
+
+        Not implemented, it has to be implemented in subclasses.
+
+        :param list lines: the lines containing points, as bytes.
+        :param numpy.ndarray mesh_points: the new points, one per line.
+
+        :return: the new lines.
+        :rtype: list
+        """
+        raise NotImplementedError(
+            "Subclass must implement abstract method " \
+        + self.__class__.__name__ + "._format_stream_points")
+
+    @staticmethod
+    def _split_line_ending(line):
+        """
+        This private static method splits `line` into its content and its
+        line ending.
+
+        :param bytes line: the line.
+
+        :return: the content and the line ending.
+        :rtype: tuple
+        """
+        content = line.rstrip(b'\r\n')
+        return content, line[len(content):]
+
+    def _load_cache(self):
+        """
+        This private method loads from `self.cache` the points parsed from
+        `self.infile`, and restores the layout of the file needed by `write`.
+
+        :return: the cached points, or None if there are none.
+        :rtype: numpy.ndarray
+        """
+        if self.cache is None:
+            return None
+        entry = self.cache.load(self.infile,
+                                self.cache.key(self.infile, self._cache_tag()))
+        if entry is None:
+            return None
+        mesh_points, layout = entry
+        self._restore_layout(layout)
+        return mesh_points
+
+    def _store_cache(self, mesh_points):
+        """
+        This private method stores in `self.cache` the points parsed from
+        `self.infile`, together with the layout of the file.
+
+        :param numpy.ndarray mesh_points: the parsed points.
+        """
+        if self.cache is None:
+            return
+        self.cache.store(self.infile,
+                         self.cache.key(self.infile, self._cache_tag()),
+                         mesh_points, self._layout())
+
+    def _cache_tag(self):
+        """
+        This private method returns the tag that distinguishes, in the
+        cache, the parsers of the same file: the class name.
+
+        :rtype: string
+        """
+        return self.__class__.__name__
+
+    def _layout(self):
+        """
+        This private method returns the layout of the parsed file needed by
+        `write`, as a dictionary of arrays. The subclasses extend it with
+        their own attributes.
+
+        :rtype: dict
+        """
+        layout = {}
+        if self._coord_spans is not None:
+            layout['coord_spans'] = self._coord_spans
+        return layout
+
+    def _restore_layout(self, layout):
+        """
+        This private method restores the layout returned by `_layout`.
+
+        :param dict layout: the layout of the parsed file.
+        """
+        self._coord_spans = layout.get('coord_spans')
+
     def _check_extension(self, filename):
         """
         This private class method checks if the given `filename` has the proper
         `extension` set in the child class. If not it raises a ValueError.
+        If the class handles compressed files, the '.gz' extension is
+        ignored.
 
         :param string filename: file to check.
         """
+        if self.gzip and self._is_compressed(filename):
+            filename = filename[:-len('.gz')]
         __, file_ext = os.path.splitext(filename)
         if file_ext not in self.extensions:
             raise ValueError(
@@ -65,6 +275,102 @@ class FileHandler(object):
             raise TypeError(
                 'The given filename ({0!s}) must be a string'.format(filename))
 
+    @staticmethod
+    def _is_compressed(filename):
+        """
+        This private static method checks if `filename` is a gzip compressed
+        file, according to its extension.
+
+        :param string filename: file to check.
+
+        :rtype: bool
+        """
+        return filename.endswith('.gz')
+
+    @classmethod
+    def _open_file(cls, filename, mode):
+        """
+        This private class method opens `filename` in the binary `mode`,
+        decompressing or compressing it on the fly if it is a gzip file.
+
+        :param string filename: name of the file.
+        :param string mode: 'rb' or 'wb'.
+
+        :return: the file object.
+        """
+        if cls._is_compressed(filename):
+            return gzip.open(filename, mode, compresslevel=6)
+        return open(filename, mode)
+
+    @classmethod
+    def _read_file(cls, filename):
+        """
+        This private class method returns the content of `filename`, that is
+        decompressed while reading if it is a gzip file.
+
+        :param string filename: name of the file.
+
+        :rtype: bytes
+        """
+        with cls._open_file(filename, 'rb') as input_file:
+            return input_file.read()
+
+    @classmethod
+    def _write_file(cls, filename, content):
+        """
+        This private class method writes `content` into `filename`, that is
+        compressed while writing if it is a gzip file.
+
+        :param string filename: name of the file.
+        :param bytes content: the content to write.
+        """
+        with cls._open_file(filename, 'wb') as output_file:
+            output_file.write(content)
+
+    @staticmethod
+    def _format_points(mesh_points, point_format):
+        """
+        This private static method formats all the points at once, repeating
+        `point_format` (a printf-style format with three conversion
+        specifiers) for each point.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
+            containing the coordinates of the points.
+        :param string point_format: the format of a single point.
+
+        :return: the formatted points.
+        :rtype: string
+        """
+        mesh_points = np.asarray(mesh_points, dtype=float)
+        return (point_format * mesh_points.shape[0]) % tuple(
+            mesh_points.ravel().tolist())
+
+    def _write_spans(self, pieces):
+        """
+        This private method writes `self.outfile` copying verbatim the bytes
+        of `self.infile`, but the coordinate spans found by `parse` (stored in
+        `self._coord_spans` as an `n_spans`-by-2 array of first and
+        one-past-last byte) that are replaced by `pieces`. Both files are
+        decompressed or compressed on the fly if they are gzip files.
+
+        :param list pieces: the `n_spans` new contents of the spans, as bytes.
+        """
+        if len(pieces) != self._coord_spans.shape[0]:
+            raise ValueError(
+                'The number of points does not match the parsed file.')
+
+        content = self._read_file(self.infile)
+
+        kept_starts = [0] + self._coord_spans[:, 1].tolist()
+        kept_ends = self._coord_spans[:, 0].tolist() + [len(content)]
+        output = [None] * (2 * len(pieces) + 1)
+        output[0::2] = [
+            content[start:end] for start, end in zip(kept_starts, kept_ends)
+        ]
+        output[1::2] = pieces
+
+        self._write_file(self.outfile, b''.join(output))
+
     def _check_infile_instantiation(self):
         """
         This private method checks if `self.infile` is instantiated. If not
@@ -36,7 +36,10 @@ computed value than those lying closer to the node.
     :math:`\\mathrm{x}_i` and :math:`p` is a power parameter, typically equal to
     2.
 """
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
 import numpy as np
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
 
 
@@ -48,6 +51,14 @@ class IDW(object):
     :type idw_parameters: :class:`IDWParameters`
     :param numpy.ndarray original_mesh_points: coordinates of the original
         points of the mesh.
+    :param int chunk_size: the number of mesh points deformed at once, a
+        positive integer. The default is None, that means all the points at
+        once.
+    :param int n_jobs: the number of workers deforming the chunks
+        concurrently, a positive integer. If None, the number of CPUs is
+        used. The default is 1.
+    :param string pool: the kind of workers, 'thread' or 'process'. The
+        default is 'thread'.
 
     :cvar parameters: the parameters of the IDW.
     :vartype parameters: :class:`~pygem.params_idw.IDWParameters`
@@ -55,6 +66,13 @@ class IDW(object):
         points of the mesh.
     :cvar numpy.ndarray modified_mesh_points: coordinates of the deformed
         points of the mesh.
+    :cvar int chunk_size: the number of mesh points deformed at once; the
+        memory needed by the distance and weight matrices is proportional to
+        it.
+    :cvar int n_jobs: the number of workers deforming the chunks concurrently.
+    :cvar string pool: the kind of workers, 'thread' or 'process'.
+    :cvar scipy.spatial.cKDTree tree: the KD-tree of the original control
+        points, used when `n_neighbors` or `radius` of the parameters are set.
 
     :Example:
 
@@ -76,40 +94,264 @@ class IDW(object):
     >>> new_mesh_points = idw.modified_mesh_points
     """
 
-    def __init__(self, idw_parameters, original_mesh_points):
+    def __init__(self,
+                 idw_parameters,
+                 original_mesh_points,
+                 chunk_size=None,
+                 n_jobs=1,
+                 pool='thread'):
+        if pool not in ('thread', 'process'):
+            raise ValueError(
+                "pool must be 'thread' or 'process', not {0!s}".format(pool))
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError(
+                'chunk_size must be positive, not {0!s}'.format(chunk_size))
+        if n_jobs is not None and n_jobs < 1:
+            raise ValueError('n_jobs must be positive, not {0!s}'.format(n_jobs))
+
         self.parameters = idw_parameters
         self.original_mesh_points = original_mesh_points
         self.modified_mesh_points = None
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.pool = pool
+        self._tree = None
+        self._tree_points = None
+
+    @property
+    def tree(self):
+        """
+        The KD-tree built over the original control points, used by the local
+        IDW. It is built on first access and rebuilt only if the original
+        control points of `self.parameters` change.
+
+        :rtype: scipy.spatial.cKDTree
+        """
+        control_points = self.parameters.original_control_points
+        if self._tree is None or not np.array_equal(self._tree_points,
+                                                    control_points):
+            self._tree = cKDTree(control_points)
+            self._tree_points = np.array(control_points, copy=True)
+        return self._tree
 
     def perform(self):
         """
         This method performs the deformation of the mesh points. After the
         execution it sets `self.modified_mesh_points`.
+
+        The mesh points are deformed by chunks of `self.chunk_size` points,
+        distributed among `self.n_jobs` workers; each deformed chunk is
+        written directly into `self.modified_mesh_points`.
+        """
+        n_points = self.original_mesh_points.shape[0]
+        chunk_size = self.chunk_size or max(n_points, 1)
+        chunks = [
+            slice(start, min(start + chunk_size, n_points))
+            for start in range(0, n_points, chunk_size)
+        ]
+        n_jobs = self.n_jobs or cpu_count()
+
+        self.modified_mesh_points = np.empty(self.original_mesh_points.shape)
+
+        if n_jobs == 1 or len(chunks) == 1:
+            displ = self._displacements()
+            for chunk in chunks:
+                self._perform_chunk(chunk, displ)
+        elif self.pool == 'thread':
+            displ = self._displacements()
+            if self._is_local():
+                # build the tree once, before the workers share it
+                self.tree  # pylint: disable=pointless-statement
+            pool = ThreadPool(n_jobs)
+            try:
+                pool.map(lambda chunk: self._perform_chunk(chunk, displ),
+                         chunks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            pool = Pool(
+                n_jobs,
+                initializer=_init_process_worker,
+                initargs=(self.parameters, ))
+            try:
+                offsets = pool.imap(
+                    _process_worker_offset,
+                    (self.original_mesh_points[chunk] for chunk in chunks))
+                for chunk, offset in zip(chunks, offsets):
+                    self.modified_mesh_points[chunk] = (
+                        self.original_mesh_points[chunk] + offset)
+            finally:
+                pool.close()
+                pool.join()
+
+    def _displacements(self):
+        """
+        This private method returns the displacements of the control points.
+
+        :rtype: numpy.ndarray
         """
+        return (self.parameters.deformed_control_points -
+                self.parameters.original_control_points)
 
-        def distance(u, v):
-            """
-            Norm of u - v
-            """
-            return np.linalg.norm(u - v, ord=self.parameters.power)
+    def _is_local(self):
+        """
+        This private method checks if the parameters require the local
+        (modified Shepard) IDW.
+
+        :rtype: bool
+        """
+        return (self.parameters.n_neighbors is not None or
+                self.parameters.radius is not None)
+
+    def _offset(self, points, displ):
+        """
+        This private method computes the displacement of `points`, with the
+        global or the local IDW according to the parameters.
+
+        :param numpy.ndarray points: the `n_points`-by-3 coordinates to move.
+        :param numpy.ndarray displ: the `n_control_points`-by-3 displacements
+            of the control points.
 
-        # Compute displacement of the control points
-        displ = (self.parameters.deformed_control_points -
-                 self.parameters.original_control_points)
+        :return: offset: the `n_points`-by-3 displacements of the points.
+        :rtype: numpy.ndarray
+        """
+        if self._is_local():
+            return self._local_offset(points, displ)
+        return self._global_offset(points, displ)
+
+    def _perform_chunk(self, chunk, displ):
+        """
+        This private method deforms the mesh points selected by `chunk` and
+        stores them in `self.modified_mesh_points`.
 
+        :param slice chunk: the indices of the mesh points to deform.
+        :param numpy.ndarray displ: the `n_control_points`-by-3 displacements
+            of the control points.
+        """
+        points = self.original_mesh_points[chunk]
+        self.modified_mesh_points[chunk] = points + self._offset(points, displ)
+
+    def _global_offset(self, points, displ):
+        """
+        This private method computes the displacement of `points` weighting
+        the displacements of all the control points.
+
+        :param numpy.ndarray points: the `n_points`-by-3 coordinates to move.
+        :param numpy.ndarray displ: the `n_control_points`-by-3 displacements
+            of the control points.
+
+        :return: offset: the `n_points`-by-3 displacements of the points.
+        :rtype: numpy.ndarray
+        """
         # Compute the distance between the mesh points and the control points
-        dist = cdist(self.original_mesh_points,
-                     self.parameters.original_control_points, distance)
+        dist = cdist(points, self.parameters.original_control_points,
+                     'minkowski', p=self.parameters.power)
 
         # Weights are set as the reciprocal of the distance if the distance is
         # not zero, otherwise 1.0 where distance is zero.
-        weights = np.zeros(dist.shape)
-        for i, d in enumerate(dist):
-            weights[i] = 1. / d if d.all() else np.where(d == 0.0, 1.0, 0.0)
+        zero_dist = dist == 0.0
+        with np.errstate(divide='ignore'):
+            weights = 1. / dist
+        on_control_point = np.any(zero_dist, axis=1)
+        weights[on_control_point] = zero_dist[on_control_point]
+
+        return np.dot(weights, displ) / np.sum(weights, axis=1)[:, np.newaxis]
+
+    def _local_offset(self, points, displ):
+        """
+        This private method computes the displacement of `points` with the
+        modified Shepard method, weighting only the displacements of the
+        nearest control points found through `self.tree`. Points with no
+        control point within the radius are not moved.
+
+        :param numpy.ndarray points: the `n_points`-by-3 coordinates to move.
+        :param numpy.ndarray displ: the `n_control_points`-by-3 displacements
+            of the control points.
+
+        :return: offset: the `n_points`-by-3 displacements of the points.
+        :rtype: numpy.ndarray
+        """
+        n_points = points.shape[0]
+        n_neighbors = self.parameters.n_neighbors
+        radius = self.parameters.radius
+        power = self.parameters.power
+
+        # Collect the (point, control point, distance) triplets of the
+        # neighbours, together with the radius of influence of each pair
+        if n_neighbors is None:
+            triplets = cKDTree(points).sparse_distance_matrix(
+                self.tree, radius, p=power, output_type='ndarray')
+            rows, cols, dist = triplets['i'], triplets['j'], triplets['v']
+            influence = np.full(dist.shape, float(radius))
+        else:
+            k = n_neighbors if radius is not None else n_neighbors + 1
+            dist, cols = self.tree.query(
+                points,
+                k=k,
+                p=power,
+                distance_upper_bound=np.inf if radius is None else radius)
+            dist = dist.reshape(n_points, k)
+            cols = cols.reshape(n_points, k)
+            if radius is None:
+                influence = np.repeat(dist[:, -1:], n_neighbors, axis=1)
+                dist, cols = dist[:, :-1], cols[:, :-1]
+            else:
+                influence = np.full(dist.shape, float(radius))
+            rows = np.repeat(np.arange(n_points), n_neighbors)
+            found = np.isfinite(dist.ravel())
+            rows, cols = rows[found], cols.ravel()[found]
+            dist, influence = dist.ravel()[found], influence.ravel()[found]
+
+        # Weights are set as 1/d - 1/R if the distance is not zero, otherwise
+        # 1.0 where distance is zero (and 0.0 for the other control points).
+        zero_dist = dist == 0.0
+        with np.errstate(divide='ignore'):
+            weights = 1. / dist - 1. / influence
+        on_control_point = np.bincount(
+            rows, weights=zero_dist, minlength=n_points) > 0
+        weights = np.where(on_control_point[rows], zero_dist, weights)
+        if radius is None:
+            # when the n_neighbors-th and the next distances tie, R is equal
+            # to all the distances and all the weights vanish: the plain
+            # inverse distances of the tied neighbours are used instead
+            degenerate = np.bincount(
+                rows, weights=weights, minlength=n_points) == 0.0
+            with np.errstate(divide='ignore'):
+                weights = np.where(degenerate[rows], 1. / dist, weights)
+
+        weights_sum = np.bincount(rows, weights=weights, minlength=n_points)
+        offset = np.zeros((n_points, displ.shape[1]))
+        for j in range(displ.shape[1]):
+            offset[:, j] = np.bincount(
+                rows, weights=weights * displ[cols, j], minlength=n_points)
+        moved = weights_sum > 0.0
+        offset[moved] /= weights_sum[moved, np.newaxis]
+        return offset
 
-        offset = np.array([
-            np.sum(displ * wi[:, np.newaxis] / np.sum(wi), axis=0)
-            for wi in weights
-        ])
 
-        self.modified_mesh_points = self.original_mesh_points + offset
+_WORKER_IDW = None
+
+
+def _init_process_worker(idw_parameters):
+    """
+    Initializer of the processes of the pool used by :meth:`IDW.perform`: it
+    sets up, once per process, the IDW (and its KD-tree) used by the worker.
+
+    :param IDWParameters idw_parameters: the parameters of the IDW.
+    """
+    global _WORKER_IDW
+    _WORKER_IDW = IDW(idw_parameters, None)
+
+
+def _process_worker_offset(points):
+    """
+    It computes, inside a process of the pool used by :meth:`IDW.perform`, the
+    displacement of a chunk of mesh points.
+
+    :param numpy.ndarray points: the `n_points`-by-3 coordinates to move.
+
+    :return: offset: the `n_points`-by-3 displacements of the points.
+    :rtype: numpy.ndarray
+    """
+    return _WORKER_IDW._offset(points, _WORKER_IDW._displacements())
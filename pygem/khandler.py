@@ -1,9 +1,15 @@
 """
 Derived module from filehandler.py to handle LS-DYNA keyword (.k) files.
 """
+import os
+import shutil
 import numpy as np
 import pygem.filehandler as fh
 
+# The number of node lines whose fields are gathered at a time, so that the
+# byte indices of the fields take a bounded memory.
+_CHUNK_SIZE = 16384
+
 
 class KHandler(fh.FileHandler):
     """
@@ -13,16 +19,28 @@ class KHandler(fh.FileHandler):
     :cvar string outfile: name of the output file where to write in.
     :cvar list extensions: extensions of the input/output files. It is equal
             to '.k'.
+    :cvar bool gzip: it is True, since the files can also be gzip
+            compressed ('.k.gz').
+    :cvar numpy.ndarray node_ids: the IDs of the nodes of the *NODE sections,
+            in the same order of the points returned by `parse`.
     """
 
     def __init__(self):
         super(KHandler, self).__init__()
         self.extensions = ['.k']
+        self.gzip = True
+        self.node_ids = None
+        self._fixed_width = False
 
     def parse(self, filename):
         """
         Method to parse the file `filename`. It returns a matrix with all the
-        coordinates. It reads only the section *NODE of the k files.
+        coordinates. It reads only the section *NODE of the k files: the lines
+        of the sections are located once and their fixed-width fields are
+        converted all together. The node IDs are stored in `self.node_ids`
+        and the byte spans of the coordinate fields are stored, in order to
+        replace them when writing. If `self.cache` is set, the points of an
+        unchanged file are loaded from it.
 
         :param string filename: name of the input file.
 
@@ -33,57 +51,228 @@ class KHandler(fh.FileHandler):
         self._check_filename_type(filename)
         self._check_extension(filename)
         self.infile = filename
-        index = -9
-        mesh_points = []
-        with open(self.infile, 'r') as input_file:
-            for num, line in enumerate(input_file):
-                if line.startswith('*NODE'):
-                    index = num
-                if num == index + 1:
-                    if line.startswith('$'):
-                        index = num
-                    elif line.startswith('*'):
-                        index = -9
-                    else:
-                        l = []
-                        l.append(float(line[8:24]))
-                        l.append(float(line[24:40]))
-                        l.append(float(line[40:56]))
-                        mesh_points.append(l)
-                        index = num
-            mesh_points = np.array(mesh_points)
+
+        mesh_points = self._load_cache()
+        if mesh_points is not None:
+            return mesh_points
+
+        content = np.frombuffer(self._read_file(self.infile), dtype=np.uint8)
+
+        # first and one-past-last byte (newline excluded) of every line
+        line_starts = np.r_[0, np.flatnonzero(content == ord('\n')) + 1]
+        line_starts = line_starts[line_starts < content.size]
+        line_ends = np.r_[line_starts[1:] - 1, content.size]
+        line_ends[line_ends > line_starts] -= (
+            content[line_ends[line_ends > line_starts] - 1] == ord('\r'))
+        first_chars = content[line_starts]
+
+        # every line belongs to the section of the last keyword before it
+        keywords = np.flatnonzero(first_chars == ord('*'))
+        node_keywords = np.array(
+            [
+                content[k:k + 5].tobytes() == b'*NODE'
+                for k in line_starts[keywords]
+            ],
+            dtype=bool)
+        section = np.searchsorted(keywords, np.arange(line_starts.size),
+                                  'right') - 1
+        in_node_section = np.zeros(line_starts.size, dtype=bool)
+        in_node_section[section >= 0] = node_keywords[section[section >= 0]]
+
+        nodes = (in_node_section & (first_chars != ord('*')) &
+                 (first_chars != ord('$')) & (line_ends > line_starts))
+        node_starts = line_starts[nodes]
+        node_lengths = line_ends[nodes] - node_starts
+
+        # the first 56 characters of the node lines, blank padded, are
+        # gathered and converted `_CHUNK_SIZE` lines at a time
+        n_nodes = node_starts.size
+        self.node_ids = np.empty(n_nodes, dtype=np.int64)
+        mesh_points = np.empty((n_nodes, 3))
+        columns = np.arange(56)
+        for start in range(0, n_nodes, _CHUNK_SIZE):
+            chunk = slice(start, start + _CHUNK_SIZE)
+            fields = np.where(
+                columns < node_lengths[chunk, np.newaxis],
+                content[np.minimum(node_starts[chunk, np.newaxis] + columns,
+                                   content.size - 1)],
+                ord(' ')).astype(np.uint8)
+            self.node_ids[chunk] = fields[:, :8].copy().view(
+                'S8').ravel().astype(np.int64)
+            mesh_points[chunk] = fields[:, 8:].copy().view('S16').astype(
+                float)
+
+        self._coord_spans = np.column_stack(
+            (node_starts + 8, node_starts + np.clip(node_lengths, 8, 56)))
+        self._fixed_width = bool(np.all(node_lengths >= 56))
+        self._store_cache(mesh_points)
         return mesh_points
 
-    def write(self, mesh_points, filename):
+    def write(self, mesh_points, filename, mmap=False):
         """
         Writes a .k file, called filename, copying all the lines from
         self.filename but the coordinates. mesh_points is a matrix that
-        contains the new coordinates to write in the .k file.
+        contains the new coordinates to write in the .k file. The input file
+        is not scanned again: its bytes are copied verbatim but the
+        coordinate fields located by `parse`.
 
         :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
                           containing the coordinates of the points of the mesh
         :param string filename: name of the output file.
+        :param bool mmap: if True the input file is copied into `filename`
+                (unless they are the same file) and the coordinate fields are
+                overwritten in place through a memory map, using the byte
+                offsets found by `parse`. It requires every coordinate to fit
+                in its 16 characters field and it is not available for gzip
+                compressed files. The default value is False.
         """
         self._check_filename_type(filename)
         self._check_extension(filename)
         self._check_infile_instantiation()
         self.outfile = filename
-        index = -9
-        i = 0
-        with open(self.outfile, 'w') as output_file:
-            with open(self.infile, 'r') as input_file:
-                for num, line in enumerate(input_file):
-                    if line.startswith('*NODE'):
-                        index = num
-                    if num == index + 1:
-                        if line.startswith('$'):
-                            index = num
-                        elif line.startswith('*'):
-                            index = -9
-                        else:
-                            for j in range(0, 3):
-                                line = line[:8 + 16 * (j)] + '{:16.10f}'.format(
-                                    mesh_points[i][j]) + line[8 + 16 * (j + 1):]
-                            i += 1
-                            index = num
-                    output_file.write(line)
+
+        if mmap:
+            self._write_mmap(mesh_points)
+            return
+
+        formatted = self._format_points(mesh_points,
+                                        '%16.10f%16.10f%16.10f\n')
+        self._write_spans(formatted.encode('ascii').split(b'\n')[:-1])
+
+    def _layout(self):
+        """
+        This private method returns the layout of the parsed file: the
+        coordinate spans, the node IDs and the fixed width flag.
+
+        :rtype: dict
+        """
+        layout = super(KHandler, self)._layout()
+        layout['node_ids'] = self.node_ids
+        layout['fixed_width'] = np.array(self._fixed_width)
+        return layout
+
+    def _restore_layout(self, layout):
+        """
+        This private method restores the layout returned by `_layout`.
+
+        :param dict layout: the layout of the parsed file.
+        """
+        super(KHandler, self)._restore_layout(layout)
+        self.node_ids = layout['node_ids']
+        self._fixed_width = bool(layout['fixed_width'])
+
+    def _locate_stream_points(self, lines, state):
+        """
+        This private method locates the lines of the *NODE sections in a
+        block of lines read by `deform_stream`. The state tells if the block
+        starts inside a *NODE section.
+
+        :param list lines: the lines of the block, as bytes.
+        :param bool state: True if the previous block ended inside a *NODE
+            section, None for the first block.
+
+        :return: the indices of the node lines and the state at the end of
+            the block.
+        :rtype: tuple
+        """
+        in_node_section = bool(state)
+        indices = []
+        for index, line in enumerate(lines):
+            first_char = line[:1]
+            if first_char == b'*':
+                in_node_section = line.startswith(b'*NODE')
+            elif in_node_section and first_char not in (b'$', b'\r', b'\n'):
+                indices.append(index)
+        return indices, in_node_section
+
+    def _parse_stream_points(self, lines):
+        """
+        This private method converts the fixed-width coordinate fields of the
+        node `lines` all together.
+
+        :param list lines: the node lines, as bytes.
+
+        :rtype: numpy.ndarray
+        """
+        fields = b''.join(
+            self._split_line_ending(line)[0][8:56].ljust(48) for line in lines)
+        return np.frombuffer(fields, dtype='S16').astype(float).reshape(-1, 3)
+
+    def _format_stream_points(self, lines, mesh_points):
+        """
+        This private method replaces the coordinate fields of the node
+        `lines` with `mesh_points`, as `write` does.
+
+        :param list lines: the node lines, as bytes.
+        :param numpy.ndarray mesh_points: the new points, one per line.
+
+        :return: the new lines.
+        :rtype: list
+        """
+        formatted = self._format_points(mesh_points, '%16.10f%16.10f%16.10f\n')
+        new_lines = []
+        for line, fields in zip(lines,
+                                formatted.encode('ascii').split(b'\n')):
+            content, ending = self._split_line_ending(line)
+            new_lines.append(content[:8] + fields + content[56:] + ending)
+        return new_lines
+
+    def _write_mmap(self, mesh_points):
+        """
+        This private method writes `mesh_points` into `self.outfile`, patching
+        through a memory map the coordinate fields of a copy of
+        `self.infile`.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
+                          containing the coordinates of the points of the mesh
+        """
+        if self._is_compressed(self.infile) or self._is_compressed(
+                self.outfile):
+            raise ValueError(
+                "Gzip compressed files can not be patched in place.")
+
+        if not self._fixed_width:
+            raise ValueError(
+                "The *NODE lines of {0!s} are shorter than the coordinate "
+                "fields, they can not be patched in place.".format(self.infile))
+
+        if mesh_points.shape[0] != self._coord_spans.shape[0]:
+            raise ValueError(
+                'The number of points does not match the parsed file.')
+        fields = self._format_coordinates(mesh_points)
+
+        if not os.path.exists(self.outfile) or not os.path.samefile(
+                self.infile, self.outfile):
+            shutil.copyfile(self.infile, self.outfile)
+
+        if fields.size == 0:
+            return
+
+        output_map = np.memmap(self.outfile, dtype=np.uint8, mode='r+')
+        columns = np.arange(fields.shape[1])
+        for start in range(0, fields.shape[0], _CHUNK_SIZE):
+            chunk = slice(start, start + _CHUNK_SIZE)
+            output_map[self._coord_spans[chunk, :1] + columns] = fields[chunk]
+        output_map.flush()
+        del output_map
+
+    def _format_coordinates(self, mesh_points):
+        """
+        This private method formats, at once, the coordinates in the 16
+        characters wide fields of the *NODE section. If a coordinate does not
+        fit in its field it raises a ValueError.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
+                          containing the coordinates of the points of the mesh
+
+        :return: fields: the `n_points`-by-48 matrix with the bytes of the
+                coordinate fields of each node.
+        :rtype: numpy.ndarray
+        """
+        n_points = mesh_points.shape[0]
+        formatted = self._format_points(mesh_points, '%16.10f%16.10f%16.10f')
+        if len(formatted) != 48 * n_points:
+            raise ValueError(
+                'Some coordinates do not fit in 16 characters wide fields.')
+        return np.frombuffer(
+            formatted.encode('ascii'), dtype=np.uint8).reshape(n_points, 48)
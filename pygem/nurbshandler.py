@@ -4,15 +4,25 @@ Implements all methods for parsing an object and applying FFD.
 File handling operations (reading/writing) must be implemented
 in derived classes.
 """
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import cpu_count
 import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 from OCC.BRep import BRep_Tool, BRep_Builder, BRep_Tool_Curve
-from OCC.BRepAlgo import brepalgo_IsValid
 from OCC.BRepBuilderAPI import (
-    BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeFace,
+    BRepBuilderAPI_Copy, BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeFace,
     BRepBuilderAPI_NurbsConvert, BRepBuilderAPI_MakeWire, BRepBuilderAPI_Sewing)
+from OCC.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.BRepOffsetAPI import BRepOffsetAPI_FindContigousEdges
-from OCC.Display.SimpleGui import init_display
+from OCC.BRepTools import breptools_Read, breptools_Write
+from OCC.Geom import Handle_Geom_BSplineSurface, Handle_Geom_BSplineCurve
 from OCC.GeomConvert import (geomconvert_SurfaceToBSplineSurface,
                              geomconvert_CurveToBSplineCurve)
 from OCC.gp import gp_Pnt, gp_XYZ
@@ -21,16 +31,84 @@ from OCC.ShapeAnalysis import ShapeAnalysis_WireOrder
 from OCC.ShapeFix import ShapeFix_ShapeTolerance, ShapeFix_Shell
 from OCC.StlAPI import StlAPI_Writer
 from OCC.TColgp import TColgp_Array1OfPnt, TColgp_Array2OfPnt
+from OCC.TColStd import TColStd_Array1OfReal, TColStd_Array2OfReal
 from OCC.TopAbs import (TopAbs_FACE, TopAbs_EDGE, TopAbs_WIRE, TopAbs_FORWARD,
-                        TopAbs_SHELL)
+                        TopAbs_SHELL, TopAbs_REVERSED)
 from OCC.TopExp import TopExp_Explorer, topexp
 from OCC.TopoDS import (topods_Face, TopoDS_Compound, topods_Shell, topods_Edge,
                         topods_Wire, topods, TopoDS_Shape)
-from matplotlib import pyplot
-from mpl_toolkits import mplot3d
-from stl import mesh
+from OCC.TopLoc import TopLoc_Location
+from OCC.TopTools import TopTools_IndexedMapOfShape
 import pygem.filehandler as fh
 
+# The handler whose faces are rebuilt (or whose shells are sewed) by the
+# processes of a pool, set by `_init_process_worker`.
+_WORKER_HANDLER = None
+
+
+def _fork_context():
+    """
+    Returns the multiprocessing context forking the processes, or None if
+    the platform can not fork. The shapes of the handler can not be pickled,
+    so the processes of the pools must inherit them by forking.
+
+    :return: the multiprocessing context.
+    """
+    if not hasattr(multiprocessing, 'get_context'):
+        # Python 2 forks the processes everywhere but on Windows
+        return None if sys.platform == 'win32' else multiprocessing
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+def _init_process_worker(handler):
+    """
+    Initializer of the processes of the pools used by :class:`NurbsHandler`:
+    it sets the handler used by the workers. The processes are forked, so
+    `handler` is inherited, with its shapes, and not pickled.
+
+    :param NurbsHandler handler: the handler.
+    """
+    global _WORKER_HANDLER
+    _WORKER_HANDLER = handler
+
+
+def _rebuild_face_worker(arguments):
+    """
+    Rebuilds a face calling the method of `_WORKER_HANDLER` with the given
+    arguments, and writes it in a BRep file, since the faces can not be sent
+    back to the parent process.
+
+    :param tuple arguments: the name of the method, its arguments and the
+        name of the BRep file.
+
+    :return: the name of the BRep file and None.
+    :rtype: tuple
+    """
+    method, face_arguments, filename = arguments
+    face = getattr(_WORKER_HANDLER, method)(*face_arguments)
+    breptools_Write(face, filename)
+    return filename, None
+
+
+def _sew_shell_worker(arguments):
+    """
+    Sews a shell of `_WORKER_HANDLER` and writes it in a BRep file, since the
+    shells can not be sent back to the parent process.
+
+    :param tuple arguments: the index of the shell and the name of the BRep
+        file.
+
+    :return: the name of the BRep file and the statistics of the sewing.
+    :rtype: tuple
+    """
+    index, filename = arguments
+    shell, stats = _WORKER_HANDLER._sew_shell(index)
+    breptools_Write(shell, filename)
+    return filename, stats
+
 
 class NurbsHandler(fh.FileHandler):
     """
@@ -41,8 +119,45 @@ class NurbsHandler(fh.FileHandler):
     :cvar list control_point_position: index of the first NURBS
         control point (or pole) of each face of the files.
     :cvar TopoDS_Shape shape: shape meant for modification.
+    :cvar numpy.ndarray weights: the weights of the control points returned
+        by the last call to `parse` or `parse_shape_points`, one for each
+        point. They are 1 for the poles of non rational surfaces and curves.
+    :cvar dict shape_table: the position of the control points of the
+        shells, faces and edges in the matrix returned by
+        `parse_shape_points`. 'shell_offsets' are the first face of each
+        shell, 'face_offsets' and 'edge_offsets' the first point of each face
+        and edge, 'face_shapes' the numbers of U and V poles of each face;
+        'face_edges' are the indices of the edges of the wires of the faces,
+        from 'face_edge_offsets'. Each array of offsets ends with the total.
     :cvar float tolerance: tolerance for the construction of the faces
         and wires in the write function. Default value is 1e-6.
+    :cvar int n_jobs: the number of processes rebuilding the faces in the
+        write functions. If None, the number of CPUs is used. Default value
+        is 1. The faces are rebuilt in forked processes and sent back as
+        BRep files; they are combined in the parent process, in their
+        original order. The faces rebuilt in different processes do not
+        share their edges, even if each moved edge is rebuilt once: they get
+        copies of it, with the same geometry, that are merged by the sewing
+        of `write_shape`. When a shape has several shells, they are sewed in
+        forked processes too. On the platforms that can not fork, the
+        faces and the shells are always processed serially.
+    :cvar float sew_tolerance: tolerance for sewing the faces of each shell
+        in `write_shape`. Default value is 0.01.
+    :cvar bool find_contiguous_edges: if True the contiguous edges of each
+        shell are analysed before sewing it, in `write_shape`. Default value
+        is False, since the sewing finds them anyway.
+    :cvar list sewing_stats: the statistics returned by `combine_faces` for
+        each shell written by the last call to `write_shape`.
+    :cvar numpy.ndarray triangles: the `n_triangles`-by-3 matrix of the
+        indices of the vertices of each triangle of the shape triangulated by
+        `parse_tessellation`, oriented as the faces.
+
+    The B-spline surfaces and curves obtained converting the faces and the
+    edges of `shape` are cached when parsing, so that writing does not
+    convert them again. The edges shared by several faces are converted,
+    parsed and rebuilt once. The poles are moved keeping their weights, so
+    that rational surfaces and curves (e.g. cylinders and circles) are
+    rebuilt exactly; new weights can be given to the write functions.
 
     .. warning::
 
@@ -56,8 +171,28 @@ class NurbsHandler(fh.FileHandler):
         super(NurbsHandler, self).__init__()
         self._control_point_position = None
         self.tolerance = 1e-6
+        self.n_jobs = 1
+        self.sew_tolerance = 0.01
+        self.find_contiguous_edges = False
+        self.sewing_stats = []
         self.shape = None
+        self.weights = None
         self.check_topo = 0
+        self._faces_map = TopTools_IndexedMapOfShape()
+        self._nurbs_faces = []
+        self._faces_poles = []
+        self._faces_weights = []
+        self._edges_map = TopTools_IndexedMapOfShape()
+        self._bspline_edges = []
+        self._edges_poles = []
+        self._edges_weights = []
+        self._write_faces = []
+        self._write_face_edges = []
+        self._write_edges = {}
+        self._sew_compounds = []
+        self.shape_table = None
+        self.triangles = None
+        self._n_vertices = 0
 
     def _check_infile_instantiation(self):
         """
@@ -83,7 +218,8 @@ class NurbsHandler(fh.FileHandler):
     def parse(self, filename):
         """
         Method to parse the file `filename`. It returns a matrix with all
-        the coordinates.
+        the coordinates. The weights of the points are stored in
+        `self.weights`.
 
         :param string filename: name of the input file.
 
@@ -94,61 +230,39 @@ class NurbsHandler(fh.FileHandler):
         """
         self.infile = filename
         self.shape = self.load_shape_from_file(filename)
+        self._clear_nurbs_cache()
 
-        # cycle on the faces to get the control points
-        # init some quantities
-        n_faces = 0
-        control_point_position = [0]
+        # cycle on the faces to get the control points: the poles of each
+        # face are collected in their own array and all the arrays are
+        # concatenated once at the end
         faces_explorer = TopExp_Explorer(self.shape, TopAbs_FACE)
-        mesh_points = np.zeros(shape=(0, 3))
+        faces_poles = []
+        faces_weights = []
 
         while faces_explorer.More():
             # performing some conversions to get the right format (BSplineSurface)
             face = topods_Face(faces_explorer.Current())
-            nurbs_converter = BRepBuilderAPI_NurbsConvert(face)
-            nurbs_converter.Perform(face)
-            nurbs_face = nurbs_converter.Shape()
-            brep_face = BRep_Tool.Surface(topods_Face(nurbs_face))
-            bspline_face = geomconvert_SurfaceToBSplineSurface(brep_face)
-
-            # openCascade object
-            occ_face = bspline_face.GetObject()
 
             # extract the Control Points of each face
-            n_poles_u = occ_face.NbUPoles()
-            n_poles_v = occ_face.NbVPoles()
-            control_polygon_coordinates = np.zeros(
-                shape=(n_poles_u * n_poles_v, 3))
-
-            # cycle over the poles to get their coordinates
-            i = 0
-            for pole_u_direction in range(n_poles_u):
-                for pole_v_direction in range(n_poles_v):
-                    control_point_coordinates = occ_face.Pole(
-                        pole_u_direction + 1, pole_v_direction + 1)
-                    control_polygon_coordinates[i, :] = [
-                        control_point_coordinates.X(),
-                        control_point_coordinates.Y(),
-                        control_point_coordinates.Z()
-                    ]
-                    i += 1
-            # pushing the control points coordinates to the mesh_points array
-            # (used for FFD)
-            mesh_points = np.append(
-                mesh_points, control_polygon_coordinates, axis=0)
-            control_point_position.append(
-                control_point_position[-1] + n_poles_u * n_poles_v)
-
-            n_faces += 1
+            faces_poles.append(self._face_poles(face))
+            faces_weights.append(self._face_weights(face))
             faces_explorer.Next()
-        self._control_point_position = control_point_position
-        return mesh_points
 
-    def write(self, mesh_points, filename, tolerance=None):
+        self._control_point_position = [0] + np.cumsum(
+            [poles.shape[0] for poles in faces_poles], dtype=int).tolist()
+        if not faces_poles:
+            self.weights = np.zeros(shape=(0, ))
+            return np.zeros(shape=(0, 3))
+        self.weights = np.concatenate(faces_weights)
+        return np.concatenate(faces_poles)
+
+    def write(self, mesh_points, filename, tolerance=None, weights=None):
         """
         Writes a output file, called `filename`, copying all the structures
         from self.filename but the coordinates. `mesh_points` is a matrix
         that contains the new coordinates to write in the output file.
+        Only the faces whose control points moved are rebuilt, the other
+        ones are copied from `self.shape`.
 
         :param numpy.ndarray mesh_points: it is a *n_points*-by-3 matrix
             containing the coordinates of the points of the mesh.
@@ -156,6 +270,8 @@ class NurbsHandler(fh.FileHandler):
         :param float tolerance: tolerance for the construction of the faces
             and wires in the write function. If not given it uses
             `self.tolerance`.
+        :param numpy.ndarray weights: the new weights of the points. If not
+            given the parsed ones are kept.
         """
         self._check_filename_type(filename)
         self._check_extension(filename)
@@ -165,75 +281,182 @@ class NurbsHandler(fh.FileHandler):
 
         if tolerance is not None:
             self.tolerance = tolerance
+        if weights is not None and weights.shape[0] != mesh_points.shape[0]:
+            raise ValueError(
+                'The number of weights does not match the number of points.')
 
         # cycle on the faces to update the control points position
-        # init some quantities
-        faces_explorer = TopExp_Explorer(self.shape, TopAbs_FACE)
-        n_faces = 0
+        self._write_faces = self._explore_faces(self.shape)
+
+        # only the faces whose poles (or weights) moved are rebuilt, the
+        # others are copied
         control_point_position = self._control_point_position
+        new_faces = list(self._write_faces)
+        arguments = []
+        for index, face in enumerate(self._write_faces):
+            start = control_point_position[index]
+            end = control_point_position[index + 1]
+            points_face = mesh_points[start:end]
+            weights_face = None if weights is None else weights[start:end]
+            if not np.array_equal(points_face, self._face_poles(face)) or (
+                    weights_face is not None and
+                    not np.array_equal(weights_face,
+                                       self._face_weights(face))):
+                arguments.append((index, points_face, weights_face))
+        rebuilt_faces = self._rebuild_faces('_rebuild_face', arguments)
+        for item, new_face in zip(arguments, rebuilt_faces):
+            new_faces[item[0]] = new_face
 
         compound_builder = BRep_Builder()
         compound = TopoDS_Compound()
         compound_builder.MakeCompound(compound)
+        for new_face in new_faces:
+            compound_builder.Add(compound, new_face)
+        self.write_shape_to_file(compound, self.outfile)
 
-        while faces_explorer.More():
-            # similar to the parser method
-            face = topods_Face(faces_explorer.Current())
-            nurbs_converter = BRepBuilderAPI_NurbsConvert(face)
-            nurbs_converter.Perform(face)
-            nurbs_face = nurbs_converter.Shape()
-            face_aux = topods_Face(nurbs_face)
-            brep_face = BRep_Tool.Surface(topods_Face(nurbs_face))
-            bspline_face = geomconvert_SurfaceToBSplineSurface(brep_face)
-            occ_face = bspline_face.GetObject()
-
-            n_poles_u = occ_face.NbUPoles()
-            n_poles_v = occ_face.NbVPoles()
-
-            i = 0
-            for pole_u_direction in range(n_poles_u):
-                for pole_v_direction in range(n_poles_v):
-                    control_point_coordinates = mesh_points[
-                        i + control_point_position[n_faces], :]
-                    point_xyz = gp_XYZ(*control_point_coordinates)
-
-                    gp_point = gp_Pnt(point_xyz)
-                    occ_face.SetPole(pole_u_direction + 1, pole_v_direction + 1,
-                                     gp_point)
-                    i += 1
-
-            # construct the deformed wire for the trimmed surfaces
-            wire_maker = BRepBuilderAPI_MakeWire()
-            tol = ShapeFix_ShapeTolerance()
-            brep = BRepBuilderAPI_MakeFace(occ_face.GetHandle(),
-                                           self.tolerance).Face()
-            brep_face = BRep_Tool.Surface(brep)
+    def _rebuild_face(self, index, points_face, weights_face=None):
+        """
+        This private method rebuilds the face `index` of the faces explored
+        by `write`, moving the poles of its surface to `points_face` and
+        trimming it with its edges evaluated on the new surface.
 
-            # cycle on the edges
-            edge_explorer = TopExp_Explorer(nurbs_face, TopAbs_EDGE)
-            while edge_explorer.More():
-                edge = topods_Edge(edge_explorer.Current())
-                # edge in the (u,v) coordinates
-                edge_uv_coordinates = BRep_Tool.CurveOnSurface(edge, face_aux)
-                # evaluating the new edge: same (u,v) coordinates, but
-                # different (x,y,x) ones
-                edge_phis_coordinates_aux = BRepBuilderAPI_MakeEdge(
-                    edge_uv_coordinates[0], brep_face)
-                edge_phis_coordinates = edge_phis_coordinates_aux.Edge()
-                tol.SetTolerance(edge_phis_coordinates, self.tolerance)
-                wire_maker.Add(edge_phis_coordinates)
-                edge_explorer.Next()
-
-            # grouping the edges in a wire
-            wire = wire_maker.Wire()
-
-            # trimming the surfaces
-            brep_surf = BRepBuilderAPI_MakeFace(occ_face.GetHandle(),
-                                                wire).Shape()
-            compound_builder.Add(compound, brep_surf)
-            n_faces += 1
-            faces_explorer.Next()
-        self.write_shape_to_file(compound, self.outfile)
+        :param int index: the index of the face.
+        :param numpy.ndarray points_face: the new poles of the face.
+        :param numpy.ndarray weights_face: the new weights of the poles. If
+            None the weights of the surface are kept. Default is None.
+
+        :return: the new face.
+        :rtype: TopoDS_Shape
+        """
+        # similar to the parser method, but the cached surface is copied
+        # before moving its poles; the handle of the copy is kept, since it
+        # owns the surface
+        face = self._write_faces[index]
+        nurbs_face, bspline_face = self._nurbs_face(face)
+        h_occ_face = self._copy_surface(bspline_face)
+        occ_face = h_occ_face.GetObject()
+
+        n_poles_u = occ_face.NbUPoles()
+        n_poles_v = occ_face.NbVPoles()
+
+        i = 0
+        for pole_u_direction in range(n_poles_u):
+            for pole_v_direction in range(n_poles_v):
+                point_xyz = gp_XYZ(*points_face[i, :])
+
+                gp_point = gp_Pnt(point_xyz)
+                if weights_face is None:
+                    occ_face.SetPole(pole_u_direction + 1,
+                                     pole_v_direction + 1, gp_point)
+                else:
+                    occ_face.SetPole(pole_u_direction + 1,
+                                     pole_v_direction + 1, gp_point,
+                                     float(weights_face[i]))
+                i += 1
+
+        # construct the deformed wire for the trimmed surfaces
+        wire_maker = BRepBuilderAPI_MakeWire()
+        tol = ShapeFix_ShapeTolerance()
+        brep = BRepBuilderAPI_MakeFace(occ_face.GetHandle(),
+                                       self.tolerance).Face()
+        brep_face = BRep_Tool.Surface(brep)
+
+        # cycle on the edges
+        edge_explorer = TopExp_Explorer(nurbs_face, TopAbs_EDGE)
+        while edge_explorer.More():
+            edge = topods_Edge(edge_explorer.Current())
+            # edge in the (u,v) coordinates
+            edge_uv_coordinates = BRep_Tool.CurveOnSurface(edge, nurbs_face)
+            # evaluating the new edge: same (u,v) coordinates, but
+            # different (x,y,x) ones
+            edge_phis_coordinates_aux = BRepBuilderAPI_MakeEdge(
+                edge_uv_coordinates[0], brep_face)
+            edge_phis_coordinates = edge_phis_coordinates_aux.Edge()
+            tol.SetTolerance(edge_phis_coordinates, self.tolerance)
+            wire_maker.Add(edge_phis_coordinates)
+            edge_explorer.Next()
+
+        # grouping the edges in a wire
+        wire = wire_maker.Wire()
+
+        # trimming the surfaces
+        return BRepBuilderAPI_MakeFace(occ_face.GetHandle(), wire).Shape()
+
+    def _rebuild_faces(self, method, arguments):
+        """
+        This private method rebuilds faces calling the method named `method`
+        with each item of `arguments`. If `self.n_jobs` is not 1 the calls
+        are distributed to a pool of forked processes, that send back the
+        faces as BRep files.
+
+        :param str method: the name of the method rebuilding a face.
+        :param list arguments: the arguments of the calls; they refer to the
+            faces by their index in `self._write_faces`.
+
+        :return: the new faces, in the order of `arguments`.
+        :rtype: list
+        """
+        n_jobs = self._n_processes(len(arguments))
+        if n_jobs <= 1:
+            return [getattr(self, method)(*item) for item in arguments]
+
+        return [
+            topods.Face(face) for face, __ in self._map_processes(
+                _rebuild_face_worker, [(method, item) for item in arguments],
+                n_jobs)
+        ]
+
+    def _n_processes(self, n_tasks):
+        """
+        This private method returns the number of processes to run
+        `n_tasks` tasks, from `self.n_jobs`: it is 1 if the processes can
+        not be forked.
+
+        :param int n_tasks: the number of tasks.
+
+        :rtype: int
+        """
+        if _fork_context() is None:
+            return 1
+        n_jobs = cpu_count() if self.n_jobs is None else self.n_jobs
+        return min(n_jobs, n_tasks)
+
+    def _map_processes(self, worker, arguments, n_jobs):
+        """
+        This private method calls `worker` with each item of `arguments`,
+        followed by the name of a BRep file, in a pool of `n_jobs` forked
+        processes. The worker writes a shape in the BRep file and returns
+        its name along with some data.
+
+        :param function worker: the function run by the processes.
+        :param list arguments: the arguments of the calls, as tuples.
+        :param int n_jobs: the number of processes.
+
+        :return: the shapes and the data returned by the calls, in the
+            order of `arguments`.
+        :rtype: list
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            pool = _fork_context().Pool(
+                n_jobs, initializer=_init_process_worker, initargs=(self, ))
+            try:
+                results = pool.map(worker, [
+                    item + (os.path.join(directory, '{0}.brep'.format(index)),)
+                    for index, item in enumerate(arguments)
+                ])
+            finally:
+                pool.close()
+                pool.join()
+
+            shapes = []
+            for filename, data in results:
+                shape = TopoDS_Shape()
+                breptools_Read(shape, filename, BRep_Builder())
+                shapes.append((shape, data))
+            return shapes
+        finally:
+            shutil.rmtree(directory)
 
     def check_topology(self):
         """
@@ -272,6 +495,267 @@ class NurbsHandler(fh.FileHandler):
         else:
             self.check_topo = 0
 
+    @staticmethod
+    def _surface_poles(bspline_surface):
+        """
+        This private static method extracts all the poles of a B-spline
+        surface at once, in a matrix preallocated from their number. The
+        poles are ordered with the v index running fastest.
+
+        :param Geom_BSplineSurface bspline_surface: the surface.
+
+        :return: the `n_poles_u*n_poles_v`-by-3 matrix of the poles.
+        :rtype: numpy.ndarray
+        """
+        n_poles_u = bspline_surface.NbUPoles()
+        n_poles_v = bspline_surface.NbVPoles()
+        poles = TColgp_Array2OfPnt(1, n_poles_u, 1, n_poles_v)
+        bspline_surface.Poles(poles)
+
+        coordinates = np.empty(shape=(n_poles_u * n_poles_v, 3))
+        i = 0
+        for pole_u_direction in range(1, n_poles_u + 1):
+            for pole_v_direction in range(1, n_poles_v + 1):
+                pole = poles.Value(pole_u_direction, pole_v_direction)
+                coordinates[i] = pole.X(), pole.Y(), pole.Z()
+                i += 1
+        return coordinates
+
+    @staticmethod
+    def _curve_poles(bspline_curve):
+        """
+        This private static method extracts all the poles of a B-spline
+        curve at once, in a matrix preallocated from their number.
+
+        :param Geom_BSplineCurve bspline_curve: the curve.
+
+        :return: the `n_poles`-by-3 matrix of the poles.
+        :rtype: numpy.ndarray
+        """
+        n_poles = bspline_curve.NbPoles()
+        poles = TColgp_Array1OfPnt(1, n_poles)
+        bspline_curve.Poles(poles)
+
+        coordinates = np.empty(shape=(n_poles, 3))
+        for i in range(n_poles):
+            pole = poles.Value(i + 1)
+            coordinates[i] = pole.X(), pole.Y(), pole.Z()
+        return coordinates
+
+    @staticmethod
+    def _surface_weights(bspline_surface):
+        """
+        This private static method extracts all the weights of the poles of
+        a B-spline surface at once, in the order of `_surface_poles`. They
+        are all 1 if the surface is not rational.
+
+        :param Geom_BSplineSurface bspline_surface: the surface.
+
+        :return: the array of the `n_poles_u*n_poles_v` weights.
+        :rtype: numpy.ndarray
+        """
+        n_poles_u = bspline_surface.NbUPoles()
+        n_poles_v = bspline_surface.NbVPoles()
+        if not (bspline_surface.IsURational() or
+                bspline_surface.IsVRational()):
+            return np.ones(n_poles_u * n_poles_v)
+
+        weights = TColStd_Array2OfReal(1, n_poles_u, 1, n_poles_v)
+        bspline_surface.Weights(weights)
+        return np.array([
+            weights.Value(pole_u_direction, pole_v_direction)
+            for pole_u_direction in range(1, n_poles_u + 1)
+            for pole_v_direction in range(1, n_poles_v + 1)
+        ])
+
+    @staticmethod
+    def _curve_weights(bspline_curve):
+        """
+        This private static method extracts all the weights of the poles of
+        a B-spline curve at once. They are all 1 if the curve is not
+        rational.
+
+        :param Geom_BSplineCurve bspline_curve: the curve.
+
+        :return: the array of the `n_poles` weights.
+        :rtype: numpy.ndarray
+        """
+        n_poles = bspline_curve.NbPoles()
+        if not bspline_curve.IsRational():
+            return np.ones(n_poles)
+
+        weights = TColStd_Array1OfReal(1, n_poles)
+        bspline_curve.Weights(weights)
+        return np.array([weights.Value(i + 1) for i in range(n_poles)])
+
+    def _clear_nurbs_cache(self):
+        """
+        This private method empties the cache of the B-spline surfaces and
+        curves, when a new shape is loaded.
+        """
+        self._faces_map = TopTools_IndexedMapOfShape()
+        self._nurbs_faces = []
+        self._faces_poles = []
+        self._faces_weights = []
+        self._edges_map = TopTools_IndexedMapOfShape()
+        self._bspline_edges = []
+        self._edges_poles = []
+        self._edges_weights = []
+        self._write_faces = []
+        self._write_face_edges = []
+        self._write_edges = {}
+        self._sew_compounds = []
+        self.shape_table = None
+        self.triangles = None
+        self._n_vertices = 0
+
+    def _nurbs_face(self, topo_face):
+        """
+        This private method converts `topo_face` to a NURBS face and its
+        surface to a B-spline surface. The conversion is done once for each
+        face, whatever its orientation: then the cached result is returned.
+
+        :param TopoDS_Face topo_face: the face to convert.
+
+        :return: the NURBS face and the handle of its B-spline surface.
+        :rtype: tuple(TopoDS_Face, Handle_Geom_BSplineSurface)
+        """
+        index = self._faces_map.FindIndex(topo_face)
+        if index == 0:
+            nurbs_converter = BRepBuilderAPI_NurbsConvert(topo_face)
+            nurbs_converter.Perform(topo_face)
+            nurbs_face = topods.Face(nurbs_converter.Shape())
+            h_bsurface = geomconvert_SurfaceToBSplineSurface(
+                BRep_Tool.Surface(nurbs_face))
+            index = self._faces_map.Add(topo_face)
+            self._nurbs_faces.append((nurbs_face, h_bsurface))
+            self._faces_poles.append(
+                self._surface_poles(h_bsurface.GetObject()))
+            self._faces_weights.append(
+                self._surface_weights(h_bsurface.GetObject()))
+        return self._nurbs_faces[index - 1]
+
+    def _face_poles(self, topo_face):
+        """
+        This private method returns the poles of the B-spline surface of
+        `topo_face`, as they are before any deformation. The returned matrix
+        is cached, it must not be modified.
+
+        :param TopoDS_Face topo_face: the face.
+
+        :rtype: numpy.ndarray
+        """
+        self._nurbs_face(topo_face)
+        return self._faces_poles[self._faces_map.FindIndex(topo_face) - 1]
+
+    def _face_weights(self, topo_face):
+        """
+        This private method returns the weights of the poles of the B-spline
+        surface of `topo_face`, as they are before any deformation. The
+        returned array is cached, it must not be modified.
+
+        :param TopoDS_Face topo_face: the face.
+
+        :rtype: numpy.ndarray
+        """
+        self._nurbs_face(topo_face)
+        return self._faces_weights[self._faces_map.FindIndex(topo_face) - 1]
+
+    def _bspline_edge(self, topo_edge):
+        """
+        This private method converts the curve of `topo_edge` to a B-spline
+        curve. The conversion is done once for each edge, also when it is
+        shared by several faces: then the cached result is returned.
+
+        :param TopoDS_Edge topo_edge: the edge to convert.
+
+        :return: the handle of the B-spline curve.
+        :rtype: Handle_Geom_BSplineCurve
+        """
+        index = self._edges_map.FindIndex(topo_edge)
+        if index == 0:
+            nurbs_converter = BRepBuilderAPI_NurbsConvert(topo_edge)
+            nurbs_converter.Perform(topo_edge)
+            h_geomcurve = BRep_Tool_Curve(
+                topods_Edge(nurbs_converter.Shape()))[0]
+            index = self._edges_map.Add(topo_edge)
+            h_bcurve = geomconvert_CurveToBSplineCurve(h_geomcurve)
+            self._bspline_edges.append(h_bcurve)
+            self._edges_poles.append(self._curve_poles(h_bcurve.GetObject()))
+            self._edges_weights.append(
+                self._curve_weights(h_bcurve.GetObject()))
+        return self._bspline_edges[index - 1]
+
+    def _edge_poles(self, topo_edge):
+        """
+        This private method returns the poles of the B-spline curve of
+        `topo_edge`, as they are before any deformation. The returned matrix
+        is cached, it must not be modified.
+
+        :param TopoDS_Edge topo_edge: the edge.
+
+        :rtype: numpy.ndarray
+        """
+        return self._edges_poles[self._edge_index(topo_edge)]
+
+    def _edge_index(self, topo_edge):
+        """
+        This private method returns the index of `topo_edge` among the
+        converted edges: the faces sharing an edge get the same index.
+
+        :param TopoDS_Edge topo_edge: the edge.
+
+        :rtype: int
+        """
+        self._bspline_edge(topo_edge)
+        return self._edges_map.FindIndex(topo_edge) - 1
+
+    @staticmethod
+    def _face_edges(topo_face):
+        """
+        This private static method returns the edges of the wires of
+        `topo_face`, in the order they are explored.
+
+        :param TopoDS_Face topo_face: the face.
+
+        :rtype: list
+        """
+        edges = []
+        face_wires_explorer = TopExp_Explorer(topo_face, TopAbs_WIRE)
+        while face_wires_explorer.More():
+            wire_explorer_edge = TopExp_Explorer(
+                topods_Wire(face_wires_explorer.Current()), TopAbs_EDGE)
+            while wire_explorer_edge.More():
+                edges.append(topods_Edge(wire_explorer_edge.Current()))
+                wire_explorer_edge.Next()
+            face_wires_explorer.Next()
+        return edges
+
+    @staticmethod
+    def _copy_surface(h_bsurface):
+        """
+        This private static method copies a B-spline surface, so that its
+        poles can be moved without changing the cached one.
+
+        :param Handle_Geom_BSplineSurface h_bsurface: the surface to copy.
+
+        :rtype: Handle_Geom_BSplineSurface
+        """
+        return Handle_Geom_BSplineSurface.DownCast(
+            h_bsurface.GetObject().Copy())
+
+    @staticmethod
+    def _copy_curve(h_bcurve):
+        """
+        This private static method copies a B-spline curve, so that its
+        poles can be moved without changing the cached one.
+
+        :param Handle_Geom_BSplineCurve h_bcurve: the curve to copy.
+
+        :rtype: Handle_Geom_BSplineCurve
+        """
+        return Handle_Geom_BSplineCurve.DownCast(h_bcurve.GetObject().Copy())
+
     @staticmethod
     def parse_face(topo_face):
         """
@@ -287,70 +771,28 @@ class NurbsHandler(fh.FileHandler):
         :rtype: tuple(numpy.ndarray, list)
 
         """
-        # get some Face - Edge - Vertex data map information
-        mesh_points_edge = []
-        face_exp_wire = TopExp_Explorer(topo_face, TopAbs_WIRE)
-        # loop on wires per face
-        while face_exp_wire.More():
-            twire = topods_Wire(face_exp_wire.Current())
-            wire_exp_edge = TopExp_Explorer(twire, TopAbs_EDGE)
-            # loop on edges per wire
-            while wire_exp_edge.More():
-                edge = topods_Edge(wire_exp_edge.Current())
-                bspline_converter = BRepBuilderAPI_NurbsConvert(edge)
-                bspline_converter.Perform(edge)
-                bspline_tshape_edge = bspline_converter.Shape()
-                h_geom_edge = BRep_Tool_Curve(
-                    topods_Edge(bspline_tshape_edge))[0]
-                h_bspline_edge = geomconvert_CurveToBSplineCurve(h_geom_edge)
-                bspline_geom_edge = h_bspline_edge.GetObject()
-
-                nb_poles = bspline_geom_edge.NbPoles()
-
-                # Edge geometric properties
-                edge_ctrlpts = TColgp_Array1OfPnt(1, nb_poles)
-                bspline_geom_edge.Poles(edge_ctrlpts)
-
-                points_single_edge = np.zeros((0, 3))
-                for i in range(1, nb_poles + 1):
-                    ctrlpt = edge_ctrlpts.Value(i)
-                    ctrlpt_position = np.array(
-                        [[ctrlpt.Coord(1),
-                          ctrlpt.Coord(2),
-                          ctrlpt.Coord(3)]])
-                    points_single_edge = np.append(
-                        points_single_edge, ctrlpt_position, axis=0)
-
-                mesh_points_edge.append(points_single_edge)
-
-                wire_exp_edge.Next()
-
-            face_exp_wire.Next()
-        # extract mesh points (control points) on Face
-        mesh_points_face = np.zeros((0, 3))
-        # convert Face to Geom B-spline Face
-        nurbs_converter = BRepBuilderAPI_NurbsConvert(topo_face)
-        nurbs_converter.Perform(topo_face)
-        nurbs_face = nurbs_converter.Shape()
-        h_geomsurface = BRep_Tool.Surface(topods.Face(nurbs_face))
-        h_bsurface = geomconvert_SurfaceToBSplineSurface(h_geomsurface)
-        bsurface = h_bsurface.GetObject()
+        return NurbsHandler()._parse_face(topo_face)
 
-        # get access to control points (poles)
-        nb_u = bsurface.NbUPoles()
-        nb_v = bsurface.NbVPoles()
-        ctrlpts = TColgp_Array2OfPnt(1, nb_u, 1, nb_v)
-        bsurface.Poles(ctrlpts)
-
-        for indice_u_direction in range(1, nb_u + 1):
-            for indice_v_direction in range(1, nb_v + 1):
-                ctrlpt = ctrlpts.Value(indice_u_direction, indice_v_direction)
-                ctrlpt_position = np.array(
-                    [[ctrlpt.Coord(1),
-                      ctrlpt.Coord(2),
-                      ctrlpt.Coord(3)]])
-                mesh_points_face = np.append(
-                    mesh_points_face, ctrlpt_position, axis=0)
+    def _parse_face(self, topo_face):
+        """
+        This private method parses `topo_face` as `parse_face`, converting
+        the Face and its Edges to B-splines through the cache of the
+        handler: the Edges shared with the Faces already parsed are not
+        converted again.
+
+        :param Face topo_face: the input Face.
+
+        :return: control points of the `Face`, control points related to
+            `Edges`.
+        :rtype: tuple(numpy.ndarray, list)
+        """
+        # get the control points of the edges of the wires of the Face
+        mesh_points_edge = [
+            self._edge_poles(edge).copy()
+            for edge in self._face_edges(topo_face)
+        ]
+        # extract mesh points (control points) on Face
+        mesh_points_face = self._face_poles(topo_face).copy()
 
         return mesh_points_face, mesh_points_edge
 
@@ -360,7 +802,12 @@ class NurbsHandler(fh.FileHandler):
         and 1 shell = multi-faces)
         It returns a list of matrix with all the coordinates of control points
         of each Face and a second list with all the control points related to
-        Edges of each Face.
+        Edges of each Face. Every Face gets its own arrays, so that they can
+        be deformed in place one by one: the Faces sharing an Edge must give
+        it the same control points, otherwise `write_shape` raises a
+        ValueError. An Edge shared by several Faces is rebuilt once by
+        `write_shape`. To deform each shared Edge once, use
+        `parse_shape_points`.
 
         :param str filename: the input filename.
 
@@ -369,72 +816,155 @@ class NurbsHandler(fh.FileHandler):
                  edge_points: it is a list of numpy.narray)
         :rtype: a list of shells
 
+        """
+        return [[(points_face.copy(),
+                  [points_edge.copy() for points_edge in list_points_edge])
+                 for points_face, list_points_edge in faces]
+                for faces in self._shape_shells(
+                    self.parse_shape_points(filename))]
+
+    def parse_shape_points(self, filename):
+        """
+        Method to parse a Shape with multiple objects as `parse_shape`, in a
+        single contiguous matrix: it contains the control points of all the
+        Faces, then the control points of all the Edges, each Edge shared by
+        several Faces appearing once. Their positions are stored in
+        `self.shape_table` and their weights in `self.weights`, so that the
+        points can be deformed all together and written by
+        `write_shape_points`.
+
+        :param str filename: the input filename.
+
+        :return: mesh_points: it is a `n_points`-by-3 matrix containing the
+            coordinates of the control points of the Faces and of the Edges.
+        :rtype: numpy.ndarray
         """
         self.infile = filename
         self.shape = self.load_shape_from_file(filename)
+        self._clear_nurbs_cache()
 
         self.check_topology()
 
-        # parse and get control points
-        l_shells = []  # an empty list of shells
-        n_shells = 0
-
         if self.check_topo == 0:
-
+            # the faces of each shell
+            shells_faces = []
             shells_explorer = TopExp_Explorer(self.shape, TopAbs_SHELL)
-
-            # cycle on shells
             while shells_explorer.More():
                 topo_shell = topods.Shell(shells_explorer.Current())
-                shell_faces_explorer = TopExp_Explorer(topo_shell, TopAbs_FACE)
-                l_faces = []  # an empty list of faces per shell
-
-                # cycle on faces
-                while shell_faces_explorer.More():
-                    topo_face = topods.Face(shell_faces_explorer.Current())
-                    mesh_point, edge_point = self.parse_face(topo_face)
-                    l_faces.append((mesh_point, edge_point))
-                    shell_faces_explorer.Next()
-
-                l_shells.append(l_faces)
-                n_shells += 1
+                shells_faces.append(self._explore_faces(topo_shell))
                 shells_explorer.Next()
-
         else:
-            # cycle only on faces
-            shell_faces_explorer = TopExp_Explorer(self.shape, TopAbs_FACE)
-            l_faces = []  # an empty list of faces per shell
-
-            while shell_faces_explorer.More():
-                topo_face = topods.Face(shell_faces_explorer.Current())
-                mesh_point, edge_point = self.parse_face(topo_face)
-                l_faces.append((mesh_point, edge_point))
-                shell_faces_explorer.Next()
+            # only the free faces, in a single shell
+            shells_faces = [self._explore_faces(self.shape)]
+
+        faces = [face for faces in shells_faces for face in faces]
+        faces_points = [self._face_poles(face) for face in faces]
+        faces_edges = [[
+            self._edge_index(edge) for edge in self._face_edges(face)
+        ] for face in faces]
+        mesh_points = np.concatenate(
+            [np.empty((0, 3))] + faces_points + self._edges_poles)
+        self.weights = np.concatenate(
+            [np.empty((0, ))] + [self._face_weights(face) for face in faces] +
+            self._edges_weights)
+
+        faces_surface = [
+            self._nurbs_face(face)[1].GetObject() for face in faces
+        ]
+        face_offsets = np.cumsum(
+            [0] + [points.shape[0] for points in faces_points])
+        self.shape_table = {
+            'shell_offsets':
+            np.cumsum([0] + [len(faces) for faces in shells_faces]),
+            'face_offsets':
+            face_offsets,
+            'face_shapes':
+            np.array([(surface.NbUPoles(), surface.NbVPoles())
+                      for surface in faces_surface],
+                     dtype=int).reshape(-1, 2),
+            'edge_offsets':
+            face_offsets[-1] + np.cumsum(
+                [0] + [points.shape[0] for points in self._edges_poles]),
+            'face_edge_offsets':
+            np.cumsum([0] + [len(edges) for edges in faces_edges]),
+            'face_edges':
+            np.array([index for edges in faces_edges for index in edges],
+                     dtype=int)
+        }
+        return mesh_points
 
+    def _shape_shells(self, mesh_points):
+        """
+        This private method splits the matrix of control points returned by
+        `parse_shape_points` (or the array of their weights) in the list of
+        shells returned by `parse_shape`, as views of it: the Faces sharing
+        an Edge get the same view.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
+            containing the coordinates of the control points of the Faces
+            and of the Edges, or the array of their weights.
+
+        :return: the list of (face points, list of edge points) of each
+            shell.
+        :rtype: list
+        """
+        table = self.shape_table
+        if mesh_points.shape[0] != table['edge_offsets'][-1]:
+            raise ValueError(
+                'The number of points does not match the parsed shape.')
+
+        edge_offsets = table['edge_offsets']
+        edges_points = [
+            mesh_points[edge_offsets[index]:edge_offsets[index + 1]]
+            for index in range(edge_offsets.shape[0] - 1)
+        ]
+
+        face_offsets = table['face_offsets']
+        face_edge_offsets = table['face_edge_offsets']
+        shell_offsets = table['shell_offsets']
+        l_shells = []
+        for ishell in range(shell_offsets.shape[0] - 1):
+            l_faces = []
+            for iface in range(shell_offsets[ishell],
+                               shell_offsets[ishell + 1]):
+                face_edges = table['face_edges'][face_edge_offsets[iface]:
+                                                 face_edge_offsets[iface + 1]]
+                l_faces.append(
+                    (mesh_points[face_offsets[iface]:face_offsets[iface + 1]],
+                     [edges_points[index] for index in face_edges]))
             l_shells.append(l_faces)
-            n_shells += 1
-
         return l_shells
 
     @staticmethod
-    def write_edge(points_edge, topo_edge):
+    def write_edge(points_edge, topo_edge, weights_edge=None):
         """
         Method to recreate an Edge associated to a geometric curve
         after the modification of its points.
         :param points_edge: the deformed points array.
         :param topo_edge: the Edge to be modified
+        :param weights_edge: the new weights of the points; if None the
+            weights of the curve are kept. Default is None.
         :return: Edge (Shape)
 
         :rtype: TopoDS_Edge
 
         """
-        # convert Edge to Geom B-spline Curve
-        nurbs_converter = BRepBuilderAPI_NurbsConvert(topo_edge)
-        nurbs_converter.Perform(topo_edge)
-        nurbs_curve = nurbs_converter.Shape()
-        topo_curve = topods_Edge(nurbs_curve)
-        h_geomcurve = BRep_Tool.Curve(topo_curve)[0]
-        h_bcurve = geomconvert_CurveToBSplineCurve(h_geomcurve)
+        return NurbsHandler()._write_edge(points_edge, topo_edge, weights_edge)
+
+    def _write_edge(self, points_edge, topo_edge, weights_edge=None):
+        """
+        This private method recreates an Edge as `write_edge`, copying the
+        B-spline curve of `topo_edge` converted once by the handler.
+
+        :param numpy.ndarray points_edge: the deformed points array.
+        :param TopoDS_Edge topo_edge: the Edge to be modified.
+        :param numpy.ndarray weights_edge: the new weights of the points, or
+            None. Default is None.
+
+        :rtype: TopoDS_Edge
+        """
+        # convert Edge to Geom B-spline Curve, or copy the cached one
+        h_bcurve = self._copy_curve(self._bspline_edge(topo_edge))
         bspline_edge_curve = h_bcurve.GetObject()
 
         # Edge geometric properties
@@ -447,13 +977,25 @@ class NurbsHandler(fh.FileHandler):
         else:
             for i in range(1, nb_cpt + 1):
                 cpt = points_edge[i - 1]
-                bspline_edge_curve.SetPole(i, gp_Pnt(cpt[0], cpt[1], cpt[2]))
+                if weights_edge is None:
+                    bspline_edge_curve.SetPole(i,
+                                               gp_Pnt(cpt[0], cpt[1], cpt[2]))
+                else:
+                    bspline_edge_curve.SetPole(i,
+                                               gp_Pnt(cpt[0], cpt[1], cpt[2]),
+                                               float(weights_edge[i - 1]))
 
         new_edge = BRepBuilderAPI_MakeEdge(bspline_edge_curve.GetHandle())
 
         return new_edge.Edge()
 
-    def write_face(self, points_face, list_points_edge, topo_face, toledge):
+    def write_face(self,
+                   points_face,
+                   list_points_edge,
+                   topo_face,
+                   toledge,
+                   edges=None,
+                   weights_face=None):
         """
         Method to recreate a Face associated to a geometric surface
         after the modification of Face points. It returns a TopoDS_Face.
@@ -462,19 +1004,21 @@ class NurbsHandler(fh.FileHandler):
         :param list_points_edge: new edge points
         :param topo_face: the face to be modified
         :param toledge: tolerance on the surface creation after modification
+        :param edges: the Edges already rebuilt, used in place of the ones
+            of the face; None for the Edges to rebuild from
+            `list_points_edge`. Default is None.
+        :param weights_face: the new weights of the face points; if None the
+            weights of the surface are kept. Default is None.
         :return: TopoDS_Face (Shape)
 
         :rtype: TopoDS_Shape
 
         """
 
-        # convert Face to Geom B-spline Surface
-        nurbs_converter = BRepBuilderAPI_NurbsConvert(topo_face)
-        nurbs_converter.Perform(topo_face)
-        nurbs_face = nurbs_converter.Shape()
-        topo_nurbsface = topods.Face(nurbs_face)
-        h_geomsurface = BRep_Tool.Surface(topo_nurbsface)
-        h_bsurface = geomconvert_SurfaceToBSplineSurface(h_geomsurface)
+        # convert Face to Geom B-spline Surface, or copy the cached one; the
+        # handle of the copy is kept, since it owns the surface
+        topo_nurbsface, h_bsurface = self._nurbs_face(topo_face)
+        h_bsurface = self._copy_surface(h_bsurface)
         bsurface = h_bsurface.GetObject()
 
         nb_u = bsurface.NbUPoles()
@@ -489,7 +1033,11 @@ class NurbsHandler(fh.FileHandler):
         for iu in range(1, nb_u + 1):
             for iv in range(1, nb_v + 1):
                 cpt = points_face[indice_cpt]
-                bsurface.SetPole(iu, iv, gp_Pnt(cpt[0], cpt[1], cpt[2]))
+                if weights_face is None:
+                    bsurface.SetPole(iu, iv, gp_Pnt(cpt[0], cpt[1], cpt[2]))
+                else:
+                    bsurface.SetPole(iu, iv, gp_Pnt(cpt[0], cpt[1], cpt[2]),
+                                     float(weights_face[indice_cpt]))
                 indice_cpt += 1
 
         # create modified new face
@@ -497,6 +1045,14 @@ class NurbsHandler(fh.FileHandler):
         toler = precision_Confusion()
         new_bspline_tface.Init(bsurface.GetHandle(), False, toler)
 
+        # the indices of the parsed edges of the face, in the order of
+        # `list_points_edge`: the edges of the converted face are different
+        # shapes, they are neither looked up among the parsed ones nor
+        # converted again
+        parsed_edges = [
+            self._edge_index(edge) for edge in self._face_edges(topo_face)
+        ]
+
         # cycle on the wires
         face_wires_explorer = TopExp_Explorer(
             topo_nurbsface.Oriented(TopAbs_FORWARD), TopAbs_WIRE)
@@ -520,8 +1076,23 @@ class NurbsHandler(fh.FileHandler):
             # cycle on the edges
             while wire_explorer_edge.More():
                 tedge = topods_Edge(wire_explorer_edge.Current())
-                new_bspline_tedge = self.write_edge(
-                    list_points_edge[ind_edge_total], tedge)
+                if edges is not None and edges[ind_edge_total] is not None:
+                    # the edge is shared and it has been rebuilt once
+                    new_bspline_tedge = edges[ind_edge_total]
+                elif np.array_equal(
+                        list_points_edge[ind_edge_total],
+                        self._edges_poles[parsed_edges[ind_edge_total]]):
+                    # the poles did not move: the edge is copied, since its
+                    # tolerance is set below and the converted face is cached
+                    new_bspline_tedge = topods_Edge(
+                        BRepBuilderAPI_Copy(
+                            tedge.Oriented(TopAbs_FORWARD)).Shape())
+                else:
+                    new_bspline_tedge = self._write_edge(
+                        list_points_edge[ind_edge_total],
+                        topods_Edge(
+                            self._edges_map.FindKey(
+                                parsed_edges[ind_edge_total] + 1)))
 
                 deformed_edges.append(new_bspline_tedge)
                 analyzer = topexp()
@@ -567,141 +1138,502 @@ class NurbsHandler(fh.FileHandler):
         return topods.Face(new_bspline_tface.Face())
 
     @staticmethod
-    def combine_faces(compshape, sew_tolerance):
+    def combine_faces(compshape, sew_tolerance, find_contiguous_edges=False):
         """
         Method to combine faces in a shell by adding connectivity and continuity
         :param compshape: TopoDS_Shape
         :param sew_tolerance: tolerance for sewing
-        :return: Topo_Shell
+        :param find_contiguous_edges: if True the contiguous edges are
+            analysed before sewing. Default is False.
+        :return: the shell and the statistics of the sewing: the number of
+            'faces', of 'free_edges', 'contiguous_edges', 'multiple_edges'
+            and 'degenerated_shapes', the number of contiguous edges found by
+            the analysis ('analysed_edges', None if skipped) and the time, in
+            seconds, of the analysis ('analysis_time') and of the sewing
+            ('sewing_time').
+        :rtype: tuple(TopoDS_Shell, dict)
         """
-
-        offsew = BRepOffsetAPI_FindContigousEdges(sew_tolerance)
         sew = BRepBuilderAPI_Sewing(sew_tolerance)
-
+        faces = []
         face_explorers = TopExp_Explorer(compshape, TopAbs_FACE)
-        n_faces = 0
         # cycle on Faces
         while face_explorers.More():
-            tface = topods.Face(face_explorers.Current())
-            sew.Add(tface)
-            offsew.Add(tface)
-            n_faces += 1
+            faces.append(topods.Face(face_explorers.Current()))
+            sew.Add(faces[-1])
             face_explorers.Next()
 
-        offsew.Perform()
-        offsew.Dump()
+        analysed_edges = None
+        start = time.time()
+        if find_contiguous_edges:
+            offsew = BRepOffsetAPI_FindContigousEdges(sew_tolerance)
+            for tface in faces:
+                offsew.Add(tface)
+            offsew.Perform()
+            analysed_edges = offsew.NbEdges()
+        analysis_time = time.time() - start
+
+        start = time.time()
         sew.Perform()
-        shell = sew.SewedShape()
-        sew.Dump()
-
-        shell = topods.Shell(shell)
+        shell = topods.Shell(sew.SewedShape())
         shell_fixer = ShapeFix_Shell()
         shell_fixer.FixFaceOrientation(shell)
-        """
-        if shell_fixer.Perform():
-            print("{} shells fixed! ".format(shell_fixer.NbShells()))
-        else:
-            print "Shells not fixed! "
-
         new_shell = shell_fixer.Shell()
-
-        if brepalgo_IsValid(new_shell):
-            print "Shell valid! "
-        else:
-            print "Shell failed! "
-        """
-        return new_shell
-
-    def write_shape(self, l_shells, filename, tol):
+        sewing_time = time.time() - start
+
+        stats = {
+            'faces': len(faces),
+            'free_edges': sew.NbFreeEdges(),
+            'contiguous_edges': sew.NbContigousEdges(),
+            'multiple_edges': sew.NbMultipleEdges(),
+            'degenerated_shapes': sew.NbDegeneratedShapes(),
+            'analysed_edges': analysed_edges,
+            'analysis_time': analysis_time,
+            'sewing_time': sewing_time
+        }
+        return new_shell, stats
+
+    def write_shape(self, l_shells, filename, tol, weights=None):
         """
         Method to recreate a TopoDS_Shape associated to a geometric shape
         after the modification of points of each Face. It
-        returns a TopoDS_Shape (Shape).
+        returns a TopoDS_Shape (Shape). Only the Faces whose points or Edge
+        points moved are rebuilt, the other ones are copied from
+        `self.shape`. Each moved Edge is rebuilt once, also when it is shared
+        by several Faces: their control points must be the same. With
+        `self.n_jobs` equal to 1 the rebuilt Faces share the rebuilt Edge;
+        with more processes each Face gets a copy of it, since the Faces are
+        sent back as BRep files. The Faces of each shell are then sewed by
+        `combine_faces`, with `self.sew_tolerance`; the statistics of the
+        sewing are stored in `self.sewing_stats`.
 
         :param l_shells: the list of shells after initial parsing
         :param filename: the output filename
         :param tol: tolerance on the surface creation after modification
+        :param weights: the new weights of the points, as a list of shells
+            like `l_shells`; if None the parsed weights are kept. Default is
+            None.
         :return: None
 
         """
         self.outfile = filename
-        # global compound containing multiple shells
-        global_compound_builder = BRep_Builder()
-        global_comp = TopoDS_Compound()
-        global_compound_builder.MakeCompound(global_comp)
 
+        # the faces of every shell (a single one with the free faces)
+        shells_faces = []
         if self.check_topo == 0:
             # cycle on shells (multiple objects)
             shape_shells_explorer = TopExp_Explorer(
                 self.shape.Oriented(TopAbs_FORWARD), TopAbs_SHELL)
-            ishell = 0
-
             while shape_shells_explorer.More():
                 per_shell = topods_Shell(shape_shells_explorer.Current())
-                # a local compound containing a shell
-                compound_builder = BRep_Builder()
-                comp = TopoDS_Compound()
-                compound_builder.MakeCompound(comp)
-
-                # cycle on faces
-                faces_explorer = TopExp_Explorer(
-                    per_shell.Oriented(TopAbs_FORWARD), TopAbs_FACE)
-                iface = 0
-                while faces_explorer.More():
-                    topoface = topods.Face(faces_explorer.Current())
-                    newface = self.write_face(l_shells[ishell][iface][0],
-                                              l_shells[ishell][iface][1],
-                                              topoface, tol)
-
-                    # add face to compound
-                    compound_builder.Add(comp, newface)
-                    iface += 1
-                    faces_explorer.Next()
-
-                new_shell = self.combine_faces(comp, 0.01)
-                itype = TopoDS_Shape.ShapeType(new_shell)
-                # add the new shell to the global compound
-                global_compound_builder.Add(global_comp, new_shell)
-
-                # TODO
-                #print("Shell {0} of type {1} Processed ".format(ishell, itype))
-                #print "=============================================="
-
-                ishell += 1
+                shells_faces.append(
+                    self._explore_faces(per_shell.Oriented(TopAbs_FORWARD)))
                 shape_shells_explorer.Next()
-
         else:
-            # cycle on faces
+            shells_faces.append(
+                self._explore_faces(self.shape.Oriented(TopAbs_FORWARD)))
+
+        # the faces of all the shells whose face or edge poles moved are
+        # rebuilt together, the others are copied; then they are combined
+        # shell by shell
+        self._write_faces = [face for faces in shells_faces for face in faces]
+        self._rebuild_shared_edges(shells_faces, l_shells, weights)
+        new_faces = list(self._write_faces)
+        arguments = []
+        index = 0
+        for ishell, faces in enumerate(shells_faces):
+            for iface, face in enumerate(faces):
+                points_face, list_points_edge = l_shells[ishell][iface]
+                weights_face = None if weights is None else weights[ishell][
+                    iface][0]
+                if self._face_changed(index, points_face, weights_face):
+                    arguments.append((index, points_face, list_points_edge,
+                                      tol, weights_face))
+                index += 1
+        rebuilt_faces = self._rebuild_faces('_rebuild_shape_face', arguments)
+        for item, new_face in zip(arguments, rebuilt_faces):
+            new_faces[item[0]] = new_face
+        new_faces = iter(new_faces)
+
+        compounds = []
+        for faces in shells_faces:
             # a local compound containing a shell
             compound_builder = BRep_Builder()
             comp = TopoDS_Compound()
             compound_builder.MakeCompound(comp)
+            for __ in faces:
+                compound_builder.Add(comp, next(new_faces))
+            compounds.append(comp)
 
-            # cycle on faces
-            faces_explorer = TopExp_Explorer(
-                self.shape.Oriented(TopAbs_FORWARD), TopAbs_FACE)
-            iface = 0
-            while faces_explorer.More():
-                topoface = topods.Face(faces_explorer.Current())
-                newface = self.write_face(l_shells[0][iface][0],
-                                          l_shells[0][iface][1], topoface, tol)
-
-                # add face to compound
-                compound_builder.Add(comp, newface)
-                iface += 1
-                faces_explorer.Next()
-
-            new_shell = self.combine_faces(comp, 0.01)
-            itype = TopoDS_Shape.ShapeType(new_shell)
+        # global compound containing multiple shells
+        global_compound_builder = BRep_Builder()
+        global_comp = TopoDS_Compound()
+        global_compound_builder.MakeCompound(global_comp)
+
+        self.sewing_stats = []
+        for new_shell, stats in self._sew_shells(compounds):
             # add the new shell to the global compound
             global_compound_builder.Add(global_comp, new_shell)
-
-            # TODO print to logging
-            # print("Shell {0} of type {1} Processed ".format(0, itype))
-            # print "=============================================="
+            self.sewing_stats.append(stats)
 
         self.write_shape_to_file(global_comp, self.outfile)
 
+    def _sew_shells(self, compounds):
+        """
+        This private method sews the faces of each compound in a shell, with
+        `combine_faces`. If `self.n_jobs` is not 1 and there are several
+        compounds, they are sewed in a pool of forked processes.
+
+        :param list compounds: the compounds of the faces of each shell.
+
+        :return: the shell and the statistics of the sewing of each
+            compound.
+        :rtype: list
+        """
+        self._sew_compounds = compounds
+        try:
+            n_jobs = self._n_processes(len(compounds))
+            if n_jobs <= 1:
+                return [
+                    self._sew_shell(index) for index in range(len(compounds))
+                ]
+            return [(topods.Shell(shell), stats)
+                    for shell, stats in self._map_processes(
+                        _sew_shell_worker, [(index, ) for index in range(
+                            len(compounds))], n_jobs)]
+        finally:
+            self._sew_compounds = []
+
+    def _sew_shell(self, index):
+        """
+        This private method sews the faces of the compound `index` of the
+        compounds given to `_sew_shells`.
+
+        :param int index: the index of the compound.
+
+        :return: the shell and the statistics of the sewing.
+        :rtype: tuple(TopoDS_Shell, dict)
+        """
+        return self.combine_faces(self._sew_compounds[index],
+                                  self.sew_tolerance,
+                                  self.find_contiguous_edges)
+
+    def write_shape_points(self, mesh_points, filename, tol, weights=None):
+        """
+        Method to write the Shape parsed by `parse_shape_points` after the
+        modification of its control points, as `write_shape` does. The
+        points of each Face and Edge are read as views of `mesh_points`,
+        without copies.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
+            containing the coordinates of the control points of the Faces
+            and of the Edges.
+        :param str filename: the output filename.
+        :param float tol: tolerance on the surface creation after
+            modification.
+        :param numpy.ndarray weights: the new weights of the points. If not
+            given the parsed ones are kept.
+        """
+        self._check_infile_instantiation()
+        if self.shape_table is None:
+            raise RuntimeError(
+                'You can not write a shape without having parsed one.')
+        self.write_shape(
+            self._shape_shells(mesh_points), filename, tol,
+            None if weights is None else self._shape_shells(weights))
+
+    def _rebuild_shape_face(self,
+                            index,
+                            points_face,
+                            list_points_edge,
+                            tol,
+                            weights_face=None):
+        """
+        This private method rebuilds the face `index` of the faces explored
+        by `write_shape`, with `write_face`.
+
+        :param int index: the index of the face.
+        :param numpy.ndarray points_face: the new face points array.
+        :param list list_points_edge: the new edge points.
+        :param float tol: tolerance on the surface creation after
+            modification.
+        :param numpy.ndarray weights_face: the new weights of the face
+            points, or None. Default is None.
+
+        :return: the new face.
+        :rtype: TopoDS_Face
+        """
+        edges = [
+            self._write_edges.get(edge_index)
+            for edge_index in self._write_face_edges[index]
+        ]
+        return self.write_face(points_face, list_points_edge,
+                               self._write_faces[index], tol, edges,
+                               weights_face)
+
+    def _rebuild_shared_edges(self, shells_faces, l_shells, weights=None):
+        """
+        This private method rebuilds, once, the edges of the faces explored
+        by `write_shape` whose poles (or weights) moved. The faces sharing
+        an edge must give it the same poles, otherwise a ValueError is
+        raised.
+
+        :param list shells_faces: the faces of every shell.
+        :param list l_shells: the new points of the faces of every shell.
+        :param list weights: the new weights of the points of the faces of
+            every shell, or None. Default is None.
+        """
+        self._write_face_edges = []
+        edges_points = {}
+        edges_weights = {}
+        for ishell, faces in enumerate(shells_faces):
+            for iface, face in enumerate(faces):
+                face_edges = [
+                    self._edge_index(edge) for edge in self._face_edges(face)
+                ]
+                if len(face_edges) != len(l_shells[ishell][iface][1]):
+                    raise ValueError("Input edges do not have the same number "
+                                     "as the edges of the face!")
+                for edge_index, points_edge in zip(face_edges,
+                                                   l_shells[ishell][iface][1]):
+                    shared_points = edges_points.setdefault(
+                        edge_index, points_edge)
+                    if shared_points is not points_edge and \
+                            not np.array_equal(shared_points, points_edge):
+                        raise ValueError("The control points of an edge "
+                                         "shared by several faces differ!")
+                if weights is not None:
+                    for edge_index, weights_edge in zip(
+                            face_edges, weights[ishell][iface][1]):
+                        edges_weights.setdefault(edge_index, weights_edge)
+                self._write_face_edges.append(face_edges)
+
+        self._write_edges = {}
+        for edge_index, points_edge in edges_points.items():
+            weights_edge = edges_weights.get(edge_index)
+            if not np.array_equal(points_edge, self._edges_poles[edge_index]) \
+                    or (weights_edge is not None and not np.array_equal(
+                        weights_edge, self._edges_weights[edge_index])):
+                self._write_edges[edge_index] = self._write_edge(
+                    points_edge,
+                    topods_Edge(self._edges_map.FindKey(edge_index + 1)),
+                    weights_edge)
+
+    def _face_changed(self, index, points_face, weights_face=None):
+        """
+        This private method checks if the poles (or the weights) of the face
+        `index` of the faces explored by `write_shape`, or of its edges,
+        moved, comparing them to the parsed ones.
+
+        :param int index: the index of the face.
+        :param numpy.ndarray points_face: the new face points array.
+        :param numpy.ndarray weights_face: the new weights of the face
+            points, or None. Default is None.
+
+        :rtype: bool
+        """
+        face = self._write_faces[index]
+        if not np.array_equal(points_face, self._face_poles(face)):
+            return True
+        if weights_face is not None and not np.array_equal(
+                weights_face, self._face_weights(face)):
+            return True
+        return any(edge_index in self._write_edges
+                   for edge_index in self._write_face_edges[index])
+
+    @staticmethod
+    def _explore_faces(shape):
+        """
+        This private static method returns the faces of `shape`, in the order
+        they are explored.
+
+        :param TopoDS_Shape shape: the shape.
+
+        :rtype: list
+        """
+        faces = []
+        faces_explorer = TopExp_Explorer(shape, TopAbs_FACE)
+        while faces_explorer.More():
+            faces.append(topods.Face(faces_explorer.Current()))
+            faces_explorer.Next()
+        return faces
+
+    def parse_tessellation(self, filename, deflection=1e-3,
+                           merge_tolerance=None):
+        """
+        Method to parse the file `filename` as a triangulated surface: the
+        shape is triangulated once, with BRepMesh, and it returns a matrix
+        with the coordinates of the vertices of the triangles. The vertices
+        shared by adjacent faces appear once: each face computes them with
+        slightly different coordinates, so the vertices of different faces
+        closer than `merge_tolerance` are merged. The triangles are stored in
+        `self.triangles`, so that the deformed vertices can be written by
+        `write_tessellation` without rebuilding the faces.
+
+        :param str filename: the input filename.
+        :param float deflection: the maximum distance between the triangles
+            and the surfaces they approximate. Default is 1e-3.
+        :param float merge_tolerance: the distance below which the vertices
+            of different faces are merged. If None, the largest tolerance of
+            the edges of the shape is used. Default is None.
+
+        :return: mesh_points: it is a `n_points`-by-3 matrix containing the
+            coordinates of the vertices of the triangles.
+        :rtype: numpy.ndarray
+        """
+        self.infile = filename
+        self.shape = self.load_shape_from_file(filename)
+        self._clear_nurbs_cache()
+
+        BRepMesh_IncrementalMesh(self.shape, deflection)
+
+        faces_nodes = [np.empty((0, 3))]
+        faces_triangles = [np.empty((0, 3), dtype=int)]
+        nodes_face = [np.empty(0, dtype=int)]
+        n_nodes = 0
+        for iface, face in enumerate(self._explore_faces(self.shape)):
+            location = TopLoc_Location()
+            h_triangulation = BRep_Tool.Triangulation(face, location)
+            if h_triangulation.IsNull():
+                continue
+            triangulation = h_triangulation.GetObject()
+            transformation = location.Transformation()
+
+            nodes = triangulation.Nodes()
+            face_nodes = np.empty((triangulation.NbNodes(), 3))
+            for i in range(triangulation.NbNodes()):
+                node = nodes.Value(i + 1).Transformed(transformation)
+                face_nodes[i] = node.X(), node.Y(), node.Z()
+
+            triangles = triangulation.Triangles()
+            face_triangles = np.array([
+                triangles.Value(i + 1).Get()
+                for i in range(triangulation.NbTriangles())
+            ], dtype=int).reshape(-1, 3) - 1 + n_nodes
+            # the triangles follow the orientation of the face
+            if face.Orientation() == TopAbs_REVERSED:
+                face_triangles = face_triangles[:, [0, 2, 1]]
+
+            faces_nodes.append(face_nodes)
+            faces_triangles.append(face_triangles)
+            nodes_face.append(np.full(face_nodes.shape[0], iface))
+            n_nodes += face_nodes.shape[0]
+
+        if merge_tolerance is None:
+            merge_tolerance = 0.
+            edges_explorer = TopExp_Explorer(self.shape, TopAbs_EDGE)
+            while edges_explorer.More():
+                merge_tolerance = max(
+                    merge_tolerance,
+                    BRep_Tool.Tolerance(topods_Edge(edges_explorer.Current())))
+                edges_explorer.Next()
+
+        # the nodes of the edges are shared by the triangulations of the
+        # adjacent faces: they are merged
+        mesh_points, indices = self._merge_nodes(
+            np.concatenate(faces_nodes), np.concatenate(nodes_face),
+            merge_tolerance)
+        self.triangles = indices[np.concatenate(faces_triangles)]
+        self._n_vertices = mesh_points.shape[0]
+        return mesh_points
+
+    @staticmethod
+    def _merge_nodes(nodes, nodes_face, tolerance):
+        """
+        This private static method merges the nodes of different faces
+        closer than `tolerance`, looking for them with a KD-tree. The nodes
+        of a same face are never merged. Every group of merged nodes is
+        replaced by the mean of their coordinates.
+
+        :param numpy.ndarray nodes: the `n_nodes`-by-3 coordinates of the
+            nodes of all the faces.
+        :param numpy.ndarray nodes_face: the index of the face of each node.
+        :param float tolerance: the distance below which the nodes are
+            merged.
+
+        :return: the coordinates of the merged nodes and, for every node, the
+            index of the merged node it belongs to.
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        n_nodes = nodes.shape[0]
+        if n_nodes == 0:
+            return np.empty((0, 3)), np.empty(0, dtype=int)
+
+        pairs = cKDTree(nodes).query_pairs(tolerance, output_type='ndarray')
+        pairs = pairs[nodes_face[pairs[:, 0]] != nodes_face[pairs[:, 1]]]
+        graph = coo_matrix(
+            (np.ones(pairs.shape[0]), (pairs[:, 0], pairs[:, 1])),
+            shape=(n_nodes, n_nodes))
+        n_merged, indices = connected_components(graph, directed=False)
+
+        counts = np.bincount(indices, minlength=n_merged)
+        merged = np.column_stack([
+            np.bincount(indices, weights=nodes[:, i], minlength=n_merged)
+            for i in range(3)
+        ]) / counts[:, np.newaxis]
+        return merged, indices
+
+    def write_tessellation(self, mesh_points, filename):
+        """
+        Method to write the triangulated surface parsed by
+        `parse_tessellation`, with the vertices moved to `mesh_points`, in a
+        STereoLithography ('.stl') or vtk ('.vtk') file. The faces of the
+        shape are not rebuilt.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
+            containing the coordinates of the vertices of the triangles.
+        :param str filename: the output filename.
+        """
+        self._check_filename_type(filename)
+        if self.triangles is None:
+            raise RuntimeError(
+                'You can not write a tessellation without having parsed one.')
+        if mesh_points.shape[0] != self._n_vertices:
+            raise ValueError(
+                'The number of points does not match the parsed tessellation.')
+
+        extension = os.path.splitext(filename)[-1]
+        if extension == '.stl':
+            # numpy-stl and VTK are imported only when they are needed, not
+            # with the module
+            from stl import mesh
+
+            stl_mesh = mesh.Mesh(
+                np.zeros(self.triangles.shape[0], dtype=mesh.Mesh.dtype))
+            stl_mesh.vectors[:] = mesh_points[self.triangles]
+            stl_mesh.save(filename)
+        elif extension == '.vtk':
+            import vtk
+            from vtk.util import numpy_support
+
+            points = vtk.vtkPoints()
+            points.SetData(
+                numpy_support.numpy_to_vtk(
+                    np.ascontiguousarray(mesh_points, dtype=float), deep=1))
+            cells = np.hstack([
+                np.full((self.triangles.shape[0], 1), 3, dtype=np.int64),
+                self.triangles
+            ])
+            triangles = vtk.vtkCellArray()
+            triangles.SetCells(
+                self.triangles.shape[0],
+                numpy_support.numpy_to_vtkIdTypeArray(
+                    np.ascontiguousarray(cells.ravel(), dtype=np.int64),
+                    deep=1))
+
+            data = vtk.vtkPolyData()
+            data.SetPoints(points)
+            data.SetPolys(triangles)
+            writer = vtk.vtkPolyDataWriter()
+            writer.SetFileName(filename)
+            writer.SetInputData(data)
+            writer.Write()
+        else:
+            raise ValueError(
+                'The extension of the file must be .stl or .vtk, not {0!s}.'.
+                format(extension))
+
+        self.outfile = filename
+
     def write_shape_to_file(self, shape, filename):
         """
         Abstract method to write the 'shape' to the `filename`.
@@ -725,6 +1657,12 @@ class NurbsHandler(fh.FileHandler):
             chosen geometry
         :rtype: matplotlib.pyplot.figure
         """
+        # matplotlib and numpy-stl are imported only when they are needed,
+        # not with the package
+        from matplotlib import pyplot
+        from mpl_toolkits import mplot3d
+        from stl import mesh
+
         if plot_file is None:
             shape = self.shape
             plot_file = self.infile
@@ -782,6 +1720,10 @@ class NurbsHandler(fh.FileHandler):
 
         :param string show_file: the filename you want to show.
         """
+        # the display is imported only when it is needed, since it loads the
+        # GUI backend
+        from OCC.Display.SimpleGui import init_display
+
         if show_file is None:
             shape = self.shape
         else:
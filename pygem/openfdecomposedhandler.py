@@ -0,0 +1,232 @@
+"""
+Derived module from openfhandler.py to handle decomposed OpenFOAM cases.
+"""
+import os
+import re
+from multiprocessing import Pool, cpu_count
+import numpy as np
+from pygem.openfhandler import OpenFoamHandler
+
+# Directory of the points file of a processor, relative to its directory.
+_POLY_MESH = os.path.join('constant', 'polyMesh')
+
+
+def _parse_processor(filename):
+    """
+    Parses the points file of a processor. It is a module level function
+    so that it can be sent to the processes of a pool.
+
+    :param string filename: name of the points file.
+
+    :return: the handler that parsed the file and the parsed points.
+    :rtype: tuple
+    """
+    handler = OpenFoamHandler()
+    mesh_points = handler.parse(filename)
+    return handler, mesh_points
+
+
+def _write_processor(arguments):
+    """
+    Writes the points file of a processor. It is a module level function
+    so that it can be sent to the processes of a pool.
+
+    :param tuple arguments: the handler that parsed the processor, the
+        points of the processor and the name of the output file.
+    """
+    handler, mesh_points, filename = arguments
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    handler.write(mesh_points, filename)
+
+
+class OpenFoamDecomposedHandler(OpenFoamHandler):
+    """
+    Decomposed OpenFOAM case handler class. The case is a directory with
+    a `processorN` subdirectory for each subdomain: the points of all the
+    `processorN/constant/polyMesh/points` files are read and written
+    concurrently by a pool of processes, and they are presented as a single
+    matrix, the points of `processor0` first. The gzip compressed
+    `points.gz` files are read and written as well.
+
+    :param int n_jobs: the number of processes reading and writing the
+        files of the processors. If None, the number of CPUs is used.
+        Default is None.
+
+    :cvar string infile: name of the input case directory.
+    :cvar string outfile: name of the output case directory.
+    :cvar list extensions: extensions of the input/output directories. It
+        is equal to [''].
+    :cvar list processors: the names of the processor directories of the
+        parsed case, sorted by their number.
+    :cvar numpy.ndarray offsets: the index of the first point of each
+        processor in the parsed points; the last entry is the total number
+        of points.
+    :cvar int n_jobs: the number of processes reading and writing the
+        files of the processors.
+    """
+
+    def __init__(self, n_jobs=None):
+        super(OpenFoamDecomposedHandler, self).__init__()
+        self.n_jobs = n_jobs
+        self.processors = []
+        self.offsets = None
+        self._handlers = []
+
+    def parse(self, filename):
+        """
+        Method to parse the case directory `filename`. It returns a matrix
+        with the coordinates of the points of all the processors, in the
+        order of their numbers.
+
+        :param string filename: name of the input case directory.
+
+        :return: mesh_points: it is a `n_points`-by-3 matrix containing
+            the coordinates of the points of the mesh
+        :rtype: numpy.ndarray
+        """
+        self._check_filename_type(filename)
+        self._check_extension(filename)
+
+        self.infile = filename
+        self.processors = self._find_processors(self.infile)
+
+        results = self._map(_parse_processor, [
+            self._points_file(self.infile, processor)
+            for processor in self.processors
+        ])
+
+        self._handlers = [handler for handler, _ in results]
+        self.header = self._handlers[0].header
+        self.offsets = np.cumsum(
+            [0] + [points.shape[0] for _, points in results])
+        self._n_points = self.offsets[-1]
+
+        return np.concatenate([points for _, points in results])
+
+    def write(self, mesh_points, filename):
+        """
+        Writes the decomposed case directory `filename`: the rows of
+        `mesh_points` are split back among the processors according to the
+        offsets of the parsed case, and each processor file is written from
+        the parsed one, creating the directories that do not exist yet.
+
+        :param numpy.ndarray mesh_points: it is a `n_points`-by-3
+            matrix containing the coordinates of the points of the mesh.
+        :param string filename: name of the output case directory.
+        """
+        self._check_filename_type(filename)
+        self._check_extension(filename)
+        self._check_infile_instantiation()
+
+        self.outfile = filename
+
+        if mesh_points.shape[0] != self._n_points:
+            raise ValueError(
+                'The number of points does not match the parsed case.')
+
+        self._map(_write_processor, [
+            (handler, mesh_points[start:end],
+             os.path.join(self.outfile, processor, _POLY_MESH,
+                          os.path.basename(handler.infile)))
+            for handler, processor, start, end in zip(
+                self._handlers, self.processors, self.offsets[:-1],
+                self.offsets[1:])
+        ])
+
+    def deform_stream(self, deformation, filename, outfile,
+                      block_size=100000):
+        """
+        Deforms the decomposed case `filename` into `outfile` without
+        holding the whole mesh in memory: the points files of the processors
+        are deformed one after the other, block by block, as
+        :meth:`OpenFoamHandler.deform_stream` does.
+
+        :param deformation: the deformation to apply to the points.
+        :param string filename: name of the input case directory.
+        :param string outfile: name of the output case directory.
+        :param int block_size: the number of lines read at a time. The
+            default value is 100000.
+        """
+        self._check_filename_type(filename)
+        self._check_extension(filename)
+        self._check_filename_type(outfile)
+        self._check_extension(outfile)
+
+        self.infile = filename
+        self.outfile = outfile
+        self.processors = self._find_processors(self.infile)
+
+        for processor in self.processors:
+            points_file = self._points_file(self.infile, processor)
+            directory = os.path.join(self.outfile, processor, _POLY_MESH)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            OpenFoamHandler().deform_stream(
+                deformation, points_file,
+                os.path.join(directory, os.path.basename(points_file)),
+                block_size)
+
+    def _map(self, function, arguments):
+        """
+        This private method applies `function` to each item of `arguments`,
+        in a pool of processes unless a single process is needed.
+
+        :param function function: the module level function to apply.
+        :param list arguments: the arguments of the calls.
+
+        :return: the results of the calls, in the order of `arguments`.
+        :rtype: list
+        """
+        n_jobs = cpu_count() if self.n_jobs is None else self.n_jobs
+        n_jobs = min(n_jobs, len(arguments))
+        if n_jobs <= 1:
+            return [function(argument) for argument in arguments]
+
+        pool = Pool(n_jobs)
+        try:
+            return pool.map(function, arguments)
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def _points_file(case, processor):
+        """
+        This private static method returns the points file of `processor`,
+        that is the gzip compressed one if the plain file does not exist.
+
+        :param string case: name of the case directory.
+        :param string processor: name of the processor directory.
+
+        :rtype: string
+        """
+        points_file = os.path.join(case, processor, _POLY_MESH, 'points')
+        if not os.path.exists(points_file) and os.path.exists(points_file +
+                                                              '.gz'):
+            return points_file + '.gz'
+        return points_file
+
+    @staticmethod
+    def _find_processors(case):
+        """
+        This private static method returns the `processorN` directories of
+        the `case` directory, sorted by their number.
+
+        :param string case: name of the case directory.
+
+        :rtype: list
+        """
+        if not os.path.isdir(case):
+            raise ValueError('{0!s} is not a directory.'.format(case))
+
+        processors = [
+            name for name in os.listdir(case)
+            if re.match(r'processor\d+$', name) and os.path.isdir(
+                os.path.join(case, name))
+        ]
+        if not processors:
+            raise ValueError(
+                'No processor directory found in {0!s}.'.format(case))
+        return sorted(processors, key=lambda name: int(name[len('processor'):]))
@@ -1,9 +1,18 @@
 """
 Derived module from filehandler.py to handle OpenFOAM files.
 """
+import json
+import re
 import numpy as np
 import pygem.filehandler as fh
 
+# Blanks and C/C++ comments, that separate the tokens of OpenFOAM files.
+_SEPARATOR = re.compile(br'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+
+# A token of OpenFOAM files: a punctuation character, a quoted string or a
+# word.
+_TOKEN = re.compile(br'[(){};]|"[^"]*"|[^\s(){};"]+')
+
 
 class OpenFoamHandler(fh.FileHandler):
     """
@@ -13,48 +22,87 @@ class OpenFoamHandler(fh.FileHandler):
     :cvar string outfile: name of the output file where to write in.
     :cvar list extensions: extensions of the input/output files. It
         is equal to [''] since openFOAM files do not have extension.
+    :cvar bool gzip: it is True, since the files can also be gzip
+        compressed (e.g. 'points.gz').
+    :cvar dict header: the entries of the FoamFile dictionary of the
+        parsed file (e.g. 'format', 'class', 'object').
     """
 
     def __init__(self):
         super(OpenFoamHandler, self).__init__()
         self.extensions = ['']
+        self.gzip = True
+        self.header = {}
+        self._n_points = None
+        self._binary_dtype = None
 
     def parse(self, filename):
         """
         Method to parse the `filename`. It returns a matrix with all
-        the coordinates.
+        the coordinates. The FoamFile header is read entry by entry,
+        skipping comments, and the points are located as the list
+        following it. In ascii files the `(x y z)` entries are
+        converted all together; in binary files the raw scalars are
+        read as they are, with the precision and byte order given by
+        the `arch` entry of the header. If `self.cache` is set, the points
+        of an unchanged file are loaded from it.
 
         :param string filename: name of the input file.
-        
+
         :return: mesh_points: it is a `n_points`-by-3 matrix containing
             the coordinates of the points of the mesh
         :rtype: numpy.ndarray
-
-        .. todo::
-
-            - specify when it works
         """
         self._check_filename_type(filename)
         self._check_extension(filename)
 
         self.infile = filename
 
-        nrow = 0
-        i = 0
-        with open(self.infile, 'r') as input_file:
-            for line in input_file:
-                nrow += 1
-                if nrow == 19:
-                    n_points = int(line)
-                    mesh_points = np.zeros(shape=(n_points, 3))
-                if 20 < nrow < 21 + n_points:
-                    line = line[line.index("(") + 1:line.rindex(")")]
-                    j = 0
-                    for number in line.split():
-                        mesh_points[i][j] = float(number)
-                        j += 1
-                    i += 1
+        mesh_points = self._load_cache()
+        if mesh_points is not None:
+            return mesh_points
+
+        content = self._read_file(self.infile)
+
+        self.header, position = self._parse_header(content)
+
+        size, position = self._next_token(content, position)
+        opening, position = self._next_token(content, position)
+        if not size.isdigit() or opening != b'(':
+            raise ValueError(
+                'No list of points found in {0!s}.'.format(self.infile))
+        n_points = int(size)
 
+        file_format = self.header.get('format', 'ascii')
+        if file_format == 'binary':
+            self._binary_dtype = self._scalar_dtype(self.header.get('arch', ''))
+            points_start = position
+            points_end = position + 3 * n_points * self._binary_dtype.itemsize
+            if content[points_end:points_end + 1] != b')':
+                raise ValueError('The list of points of {0!s} is truncated.'.
+                                 format(self.infile))
+            mesh_points = np.frombuffer(
+                content,
+                dtype=self._binary_dtype,
+                count=3 * n_points,
+                offset=points_start).reshape(n_points, 3).astype(float)
+        elif file_format == 'ascii':
+            self._binary_dtype = None
+            points_start, points_end = self._locate_ascii_points(
+                content, position, n_points)
+            coordinates = content[points_start:points_end].replace(b'(', b' ')
+            mesh_points = np.array(
+                coordinates.replace(b')', b' ').split(),
+                dtype=float).reshape(n_points, 3)
+        else:
+            raise ValueError(
+                'The format {0!s} of {1!s} is not supported.'.format(
+                    file_format, self.infile))
+
+        self._coord_spans = np.array([[points_start, points_end]])
+        self._n_points = n_points
+
+        self._store_cache(mesh_points)
         return mesh_points
 
     def write(self, mesh_points, filename):
@@ -62,13 +110,14 @@ class OpenFoamHandler(fh.FileHandler):
         Writes a openFOAM file, called filename, copying all the
         lines from self.filename but the coordinates. mesh_points
         is a matrix that contains the new coordinates to write in
-        the openFOAM file.
+        the openFOAM file. The input file is not scanned again: its
+        bytes are copied verbatim but the points located by `parse`,
+        that are written one per line (ascii files) or as raw scalars
+        (binary files).
 
         :param numpy.ndarray mesh_points: it is a `n_points`-by-3
             matrix containing the coordinates of the points of the mesh.
         :param string filename: name of the output file.
-
-        .. todo:: DOCS
         """
         self._check_filename_type(filename)
         self._check_extension(filename)
@@ -76,17 +125,203 @@ class OpenFoamHandler(fh.FileHandler):
 
         self.outfile = filename
 
-        n_points = mesh_points.shape[0]
-        nrow = 0
-        i = 0
-        with open(self.infile, 'r') as input_file, open(self.outfile,
-                                                        'w') as output_file:
-            for line in input_file:
-                nrow += 1
-                if 20 < nrow < 21 + n_points:
-                    output_file.write('(' + str(mesh_points[i][0]) + ' ' + str(
-                        mesh_points[i][1]) + ' ' + str(mesh_points[i][2]) + ')')
-                    output_file.write('\n')
-                    i += 1
-                else:
-                    output_file.write(line)
+        if mesh_points.shape[0] != self._n_points:
+            raise ValueError(
+                'The number of points does not match the parsed file.')
+
+        if self._binary_dtype is not None:
+            self._write_spans([
+                np.ascontiguousarray(mesh_points,
+                                     dtype=self._binary_dtype).tobytes()
+            ])
+            return
+
+        formatted = self._format_points(mesh_points, '(%r %r %r)\n')
+        self._write_spans([formatted[:-1].encode('ascii')])
+
+    def _layout(self):
+        """
+        This private method returns the layout of the parsed file: the span
+        of the points, their number, the header and the dtype of binary
+        files.
+
+        :rtype: dict
+        """
+        layout = super(OpenFoamHandler, self)._layout()
+        layout['header'] = np.array(json.dumps(self.header))
+        layout['n_points'] = np.array(self._n_points)
+        layout['binary_dtype'] = np.array(
+            '' if self._binary_dtype is None else self._binary_dtype.str)
+        return layout
+
+    def _restore_layout(self, layout):
+        """
+        This private method restores the layout returned by `_layout`.
+
+        :param dict layout: the layout of the parsed file.
+        """
+        super(OpenFoamHandler, self)._restore_layout(layout)
+        self.header = json.loads(str(layout['header']))
+        self._n_points = int(layout['n_points'])
+        binary_dtype = str(layout['binary_dtype'])
+        self._binary_dtype = np.dtype(binary_dtype) if binary_dtype else None
+
+    def _locate_stream_points(self, lines, state):
+        """
+        This private method locates the points of an ascii file in a block
+        of lines read by `deform_stream`. The list of points is expected as
+        OpenFOAM writes it: its size and its opening parenthesis on their own
+        lines, then one `(x y z)` point per line. The state is the part of
+        the file where the block starts ('header', 'points' or 'end') and
+        the last non blank line read in the header.
+
+        :param list lines: the lines of the block, as bytes.
+        :param tuple state: the state at the end of the previous block.
+
+        :return: the indices of the lines of the points and the state at the
+            end of the block.
+        :rtype: tuple
+        """
+        part, last_line = ('header', b'') if state is None else state
+        indices = []
+        for index, line in enumerate(lines):
+            stripped = line.strip()
+            if part == 'points':
+                if stripped.startswith(b'('):
+                    indices.append(index)
+                elif stripped.startswith(b')'):
+                    part = 'end'
+            elif part == 'header' and stripped:
+                if stripped.startswith(b'format') and b'binary' in stripped:
+                    raise ValueError(
+                        'Binary files can not be deformed line by line.')
+                if stripped == b'(' and last_line.isdigit():
+                    part = 'points'
+                last_line = stripped
+        return indices, (part, last_line)
+
+    def _parse_stream_points(self, lines):
+        """
+        This private method converts the `(x y z)` point `lines` all
+        together.
+
+        :param list lines: the lines of the points, as bytes.
+
+        :rtype: numpy.ndarray
+        """
+        coordinates = b' '.join(lines).replace(b'(', b' ')
+        return np.array(
+            coordinates.replace(b')', b' ').split(), dtype=float).reshape(-1, 3)
+
+    def _format_stream_points(self, lines, mesh_points):
+        """
+        This private method replaces the point `lines` with `mesh_points`,
+        as `write` does.
+
+        :param list lines: the lines of the points, as bytes.
+        :param numpy.ndarray mesh_points: the new points, one per line.
+
+        :return: the new lines.
+        :rtype: list
+        """
+        formatted = self._format_points(mesh_points, '(%r %r %r)\n')
+        return [
+            point + self._split_line_ending(line)[1] for line, point in zip(
+                lines, formatted.encode('ascii').split(b'\n'))
+        ]
+
+    @staticmethod
+    def _locate_ascii_points(content, position, n_points):
+        """
+        This private static method locates the `n_points` entries `(x y z)`
+        of an ascii list of points, starting at `position`: the list ends at
+        the first closing parenthesis not matching the opening one of a point.
+
+        :param bytes content: the content of the file.
+        :param int position: the byte following the opening parenthesis of
+            the list.
+        :param int n_points: the number of points of the list.
+
+        :return: the first and one-past-last byte of the entries.
+        :rtype: tuple
+        """
+        block = np.frombuffer(content, dtype=np.uint8, offset=position)
+        closings = np.flatnonzero(block == ord(')'))
+        if closings.shape[0] <= n_points:
+            raise ValueError('The list of points is truncated.')
+        if not n_points:
+            return position + closings[0], position + closings[0]
+        return (position + np.flatnonzero(block == ord('('))[0],
+                position + closings[n_points - 1] + 1)
+
+    @staticmethod
+    def _scalar_dtype(arch):
+        """
+        This private static method returns the dtype of the scalars of a
+        binary file from the `arch` entry of its header (e.g.
+        "LSB;label=32;scalar=64"). The default is little endian doubles.
+
+        :param string arch: the arch entry of the header.
+
+        :rtype: numpy.dtype
+        """
+        byte_order = '>' if 'MSB' in arch else '<'
+        scalar = re.search(r'scalar\s*=\s*(\d+)', arch)
+        scalar_size = int(scalar.group(1)) // 8 if scalar else 8
+        return np.dtype('{0}f{1}'.format(byte_order, scalar_size))
+
+    @staticmethod
+    def _next_token(content, position):
+        """
+        This private static method reads the token of `content` that follows
+        `position`, skipping blanks and comments.
+
+        :param bytes content: the content of the file.
+        :param int position: the byte where to start looking for the token.
+
+        :return: the token (empty at the end of `content`) and the byte
+            following it.
+        :rtype: tuple
+        """
+        position = _SEPARATOR.match(content, position).end()
+        token = _TOKEN.match(content, position)
+        if token is None:
+            return b'', position
+        return token.group(), token.end()
+
+    @classmethod
+    def _parse_header(cls, content):
+        """
+        This private class method reads the FoamFile dictionary at the
+        beginning of `content`. If there is no such dictionary the header is
+        empty.
+
+        :param bytes content: the content of the file.
+
+        :return: the entries of the dictionary and the byte following it.
+        :rtype: tuple
+        """
+        token, position = cls._next_token(content, 0)
+        if token != b'FoamFile':
+            return {}, 0
+
+        token, position = cls._next_token(content, position)
+        if token != b'{':
+            raise ValueError('Malformed FoamFile header.')
+
+        header = {}
+        key, position = cls._next_token(content, position)
+        while key != b'}':
+            if key in (b'', b'{', b'(', b')', b';'):
+                raise ValueError('Malformed FoamFile header.')
+            values = []
+            token, position = cls._next_token(content, position)
+            while token != b';':
+                if token in (b'', b'{', b'}'):
+                    raise ValueError('Malformed FoamFile header.')
+                values.append(token.strip(b'"').decode('ascii'))
+                token, position = cls._next_token(content, position)
+            header[key.decode('ascii')] = ' '.join(values)
+            key, position = cls._next_token(content, position)
+
+        return header, position
@@ -8,10 +8,6 @@ except ImportError:
     import ConfigParser as configparser
 import os
 import numpy as np
-from OCC.Bnd import Bnd_Box
-from OCC.BRepBndLib import brepbndlib_Add
-from OCC.BRepMesh import BRepMesh_IncrementalMesh
-import vtk
 import pygem.affine as at
 
 
@@ -417,6 +413,9 @@ class FFDParameters(object):
             **Point Gaussian** representation.
 
         """
+        # VTK is imported only when it is needed, not with the package
+        import vtk
+
         x = np.linspace(0, self.box_length[0], self.n_control_points[0])
         y = np.linspace(0, self.box_length[1], self.n_control_points[1])
         z = np.linspace(0, self.box_length[2], self.n_control_points[2])
@@ -480,6 +479,11 @@ class FFDParameters(object):
             surfaces are trimmed. The trimmed part, however, is still saved
             inside a file. It is just *invisible* when drawn in a program.
         """
+        # pythonOCC is imported only when it is needed, not with the package
+        from OCC.Bnd import Bnd_Box
+        from OCC.BRepBndLib import brepbndlib_Add
+        from OCC.BRepMesh import BRepMesh_IncrementalMesh
+
         bbox = Bnd_Box()
         bbox.SetGap(tol)
         if triangulate:
@@ -16,6 +16,12 @@ class IDWParameters(object):
     control points.
 
     :cvar int power: the power parameter. The default value is 2.
+    :cvar int n_neighbors: the number of nearest control points used by the
+        local (modified Shepard) IDW. The default value is None, that means all
+        the control points are used unless `radius` is set.
+    :cvar float radius: the radius of influence of the control points used by
+        the local (modified Shepard) IDW. The default value is None, that means
+        all the control points are used unless `n_neighbors` is set.
     :cvar numpy.ndarray original_control_points: it is an
         `n_control_points`-by-3 array with the coordinates of the original
         interpolation control points before the deformation. The default is the
@@ -28,6 +34,8 @@ class IDWParameters(object):
 
     def __init__(self):
         self.power = 2
+        self.n_neighbors = None
+        self.radius = None
         self.original_control_points = np.array(
             [[0., 0., 0.], [0., 0., 1.], [0., 1., 0.], [1., 0., 0.],
              [0., 1., 1.], [1., 0., 1.], [1., 1., 0.], [1., 1., 1.]])
@@ -51,6 +59,12 @@ class IDWParameters(object):
         config.read(filename)
 
         self.power = config.getint('Inverse Distance Weighting', 'power')
+        if config.has_option('Inverse Distance Weighting', 'neighbors'):
+            self.n_neighbors = config.getint('Inverse Distance Weighting',
+                                             'neighbors')
+        if config.has_option('Inverse Distance Weighting', 'radius'):
+            self.radius = config.getfloat('Inverse Distance Weighting',
+                                          'radius')
 
         ctrl_points = config.get('Control points', 'original control points')
         self.original_control_points = np.array(
@@ -75,6 +89,12 @@ class IDWParameters(object):
         output_string += "# This section describes the settings of idw.\n\n"
         output_string += "# the power parameter\n"
         output_string += "power = {}\n".format(self.power)
+        if self.n_neighbors is not None:
+            output_string += "\n# the number of nearest control points used\n"
+            output_string += "neighbors = {}\n".format(self.n_neighbors)
+        if self.radius is not None:
+            output_string += "\n# the radius of influence of control points\n"
+            output_string += "radius = {}\n".format(self.radius)
 
         output_string += "\n\n[Control points]\n"
         output_string += "# This section describes the IDW control points.\n\n"
@@ -107,6 +127,8 @@ class IDWParameters(object):
         """
         string = ''
         string += 'p = {}\n'.format(self.power)
+        string += 'n_neighbors = {}\n'.format(self.n_neighbors)
+        string += 'radius = {}\n'.format(self.radius)
         string += '\noriginal_control_points =\n'
         string += '{}\n'.format(self.original_control_points)
         string += '\ndeformed_control_points =\n'
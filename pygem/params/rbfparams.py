@@ -8,8 +8,6 @@ except ImportError:
     import ConfigParser as configparser
 import os
 import numpy as np
-import vtk
-import matplotlib.pyplot as plt
 
 
 class RBFParameters(object):
@@ -220,6 +218,9 @@ class RBFParameters(object):
             **Point Gaussian** representation.
 
         """
+        # VTK is imported only when it is needed, not with the package
+        import vtk
+
         box_points = self.deformed_control_points if write_deformed else self.original_control_points
         points = vtk.vtkPoints()
 
@@ -242,6 +243,9 @@ class RBFParameters(object):
         :param str filename: if None the figure is shown, otherwise it is saved
             on the specified `filename`. Default is None.
         """
+        # matplotlib is imported only when it is needed, not with the package
+        import matplotlib.pyplot as plt
+
         fig = plt.figure(1)
         axes = fig.add_subplot(111, projection='3d')
         orig = axes.scatter(
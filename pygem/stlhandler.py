@@ -1,35 +1,71 @@
 """
 Derived module from filehandler.py to handle STereoLithography files.
 """
+import os
 import numpy as np
-from mpl_toolkits import mplot3d
-import matplotlib.pyplot as plt
-import mpl_toolkits.mplot3d as a3
 import pygem.filehandler as fh
-import vtk
+
+# Layout of a triangle in a binary stl file, after the 80 bytes header and the
+# number of triangles.
+_STL_BINARY_DTYPE = np.dtype([('normal', '<f4', (3, )),
+                             ('vertices', '<f4', (3, 3)),
+                             ('attribute', '<u2')])
+
+_STL_ASCII_FACET = ('  facet normal %.6e %.6e %.6e\n    outer loop\n' +
+                   3 * '      vertex %.6e %.6e %.6e\n' +
+                   '    endloop\n  endfacet')
 
 
 class StlHandler(fh.FileHandler):
     """
     STereoLithography file handler class
 
+    :param string backend: the library used to read and write the files,
+        'vtk' or 'numpy'. The default is 'vtk'.
+
     :cvar string infile: name of the input file to be processed.
     :cvar string outfile: name of the output file where to write in.
     :cvar list extensions: extensions of the input/output files. It is equal to
         ['.stl'].
+    :cvar string backend: the library used to read and write the files. With
+        'vtk' the coincident vertices of the triangles are merged in a single
+        point; with 'numpy' the points are the three vertices of every
+        triangle, in the order they are stored in the file.
     """
 
-    def __init__(self):
+    def __init__(self, backend='vtk'):
         super(StlHandler, self).__init__()
+        if backend not in ('vtk', 'numpy'):
+            raise ValueError(
+                "backend must be 'vtk' or 'numpy', not {0!s}".format(backend))
+
         self.extensions = ['.stl']
+        self.backend = backend
+        self._data = None
+        self._data_file = None
+        self._attributes = None
 
-    def parse(self, filename):
+    def parse(self, filename, copy=True, mmap=False):
         """
         Method to parse the `filename`. It returns a matrix with all the
         coordinates.
 
         :param string filename: name of the input file.
-        
+        :param bool copy: if True the coordinates are copied in a new float64
+            array; if False the returned array has the precision stored in the
+            file (float32, float64 for the ASCII files read by the 'numpy'
+            backend) and, with the 'vtk' backend, it is a view on the VTK
+            points buffer. The default value is True.
+        :param bool mmap: if True, with the 'numpy' backend, binary files are
+            memory-mapped instead of read. The default value is False. If
+            `copy` is False too, the vertices are returned as a read-only
+            `n_triangles`-by-3-by-3 view on the mapped file, without reading
+            it (the attributes of the triangles are read only by `write`): the
+            rows of the triangles are not contiguous in the file, so
+            they can not be viewed as a `n_points`-by-3 matrix. If
+            `self.cache` is set, the points of an unchanged file are loaded
+            from it instead.
+
         :return: mesh_points: it is a `n_points`-by-3 matrix containing the
             coordinates of the points of the mesh
         :rtype: numpy.ndarray
@@ -39,17 +75,38 @@ class StlHandler(fh.FileHandler):
 
         self.infile = filename
 
-        reader = vtk.vtkSTLReader()
-        reader.SetFileName(self.infile)
-        reader.Update()
-        data = reader.GetOutput()
-
-        n_points = data.GetNumberOfPoints()
-        mesh_points = np.zeros([n_points, 3])
-
-        for i in range(n_points):
-            mesh_points[i][0], mesh_points[i][1], mesh_points[i][
-                2] = data.GetPoint(i)
+        mesh_points = self._load_cache()
+        if mesh_points is not None:
+            return mesh_points.astype(float) if copy else mesh_points
+
+        if self.backend == 'numpy':
+            vertices = self._parse_numpy(mmap)
+            if self.cache is not None:
+                self._store_cache(vertices.reshape(-1, 3))
+            if copy:
+                # the vertices are converted in a single pass
+                mesh_points = np.empty((vertices.size // 3, 3))
+                mesh_points.reshape(vertices.shape)[...] = vertices
+                return mesh_points
+            if mmap:
+                return vertices
+            return vertices.reshape(-1, 3)
+
+        # VTK is imported only when it is needed, so that the 'numpy' backend
+        # does not depend on it
+        from vtk.util import numpy_support
+
+        self._data = self._read_data(self.infile)
+        self._data_file = self.infile
+        data = self._data
+
+        if data.GetPoints() is None:
+            return np.zeros((0, 3))
+
+        mesh_points = numpy_support.vtk_to_numpy(data.GetPoints().GetData())
+        self._store_cache(mesh_points)
+        if copy:
+            mesh_points = np.array(mesh_points, dtype=float)
 
         return mesh_points
 
@@ -57,7 +114,8 @@ class StlHandler(fh.FileHandler):
         """
         Writes a stl file, called filename, copying all the lines from
         self.filename but the coordinates. mesh_points is a matrix that contains
-        the new coordinates to write in the stl file.
+        the new coordinates to write in the stl file. The dataset read by
+        `parse` is reused, so the input file is not read again.
 
         :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
             containing the coordinates of the points of the mesh.
@@ -71,16 +129,29 @@ class StlHandler(fh.FileHandler):
 
         self.outfile = filename
 
-        reader = vtk.vtkSTLReader()
-        reader.SetFileName(self.infile)
-        reader.Update()
-        data = reader.GetOutput()
+        if self.backend == 'numpy':
+            self._write_numpy(mesh_points, write_bin)
+            return
 
-        points = vtk.vtkPoints()
+        import vtk
+        from vtk.util import numpy_support
+
+        if self._data is None or self._data_file != self.infile:
+            self._data = self._read_data(self.infile)
+        self._data_file = self.infile
 
-        for i in range(data.GetNumberOfPoints()):
-            points.InsertNextPoint(mesh_points[i, :])
+        data = self._data.NewInstance()
+        data.ShallowCopy(self._data)
+        if mesh_points.shape != (data.GetNumberOfPoints(), 3):
+            raise ValueError(
+                'The number of points does not match the parsed file.')
 
+        # the new coordinates are shared with VTK, without copies, if they
+        # are already a contiguous float32 array
+        points = vtk.vtkPoints()
+        points.SetData(
+            numpy_support.numpy_to_vtk(
+                np.ascontiguousarray(mesh_points, dtype=np.float32)))
         data.SetPoints(points)
 
         writer = vtk.vtkSTLWriter()
@@ -95,6 +166,140 @@ class StlHandler(fh.FileHandler):
 
         writer.Write()
 
+    def _cache_tag(self):
+        """
+        This private method returns the tag that distinguishes, in the
+        cache, the parsers of the same file: the class name and the backend.
+
+        :rtype: string
+        """
+        return '{0}:{1}'.format(self.__class__.__name__, self.backend)
+
+    def _layout(self):
+        """
+        This private method returns the layout of the parsed file: the
+        attributes of the triangles of binary files read by the 'numpy'
+        backend.
+
+        :rtype: dict
+        """
+        layout = super(StlHandler, self)._layout()
+        if self._attributes is not None:
+            layout['attributes'] = self._attributes
+        return layout
+
+    def _restore_layout(self, layout):
+        """
+        This private method restores the layout returned by `_layout`.
+
+        :param dict layout: the layout of the parsed file.
+        """
+        super(StlHandler, self)._restore_layout(layout)
+        self._attributes = layout.get('attributes')
+
+    def _parse_numpy(self, mmap):
+        """
+        This private method reads the vertices of the triangles of
+        `self.infile` without VTK. Binary files are read as a whole through a
+        structured dtype; ASCII files are split in tokens, and the three tokens
+        following every 'vertex' keyword are converted at once.
+
+        :param bool mmap: if True binary files are memory-mapped, and the
+            attributes of the triangles are kept as a view on the mapped file.
+
+        :return: vertices: the coordinates of the vertices: for binary files
+            a float32 `n_triangles`-by-3-by-3 view on the triangles read (or
+            mapped), for ASCII files a float64 `3*n_triangles`-by-3 matrix.
+        :rtype: numpy.ndarray
+        """
+        with open(self.infile, 'rb') as input_file:
+            input_file.seek(80)
+            header = np.frombuffer(input_file.read(4), dtype='<u4')
+            n_triangles = int(header[0]) if header.size == 1 else -1
+            is_binary = (os.path.getsize(self.infile) ==
+                         84 + _STL_BINARY_DTYPE.itemsize * n_triangles)
+
+            if not is_binary:
+                self._attributes = None
+                input_file.seek(0)
+                tokens = np.array(input_file.read().split())
+                vertices = np.flatnonzero(tokens == b'vertex')
+                return tokens[vertices[:, np.newaxis] + np.arange(1, 4)].astype(
+                    float)
+
+            if mmap:
+                triangles = np.memmap(
+                    self.infile,
+                    dtype=_STL_BINARY_DTYPE,
+                    mode='r',
+                    offset=84,
+                    shape=(n_triangles, ))
+            else:
+                triangles = np.fromfile(
+                    input_file, dtype=_STL_BINARY_DTYPE, count=n_triangles)
+
+        # the attributes of a mapped file are read only when they are written
+        self._attributes = (triangles['attribute']
+                            if mmap else np.array(triangles['attribute']))
+        return triangles['vertices']
+
+    def _write_numpy(self, mesh_points, write_bin):
+        """
+        This private method writes `mesh_points`, the vertices of the
+        triangles as returned by the 'numpy' backend, in `self.outfile`
+        without VTK. The normals are computed from the new vertices.
+
+        :param numpy.ndarray mesh_points: it is a `3*n_triangles`-by-3 matrix
+            (or a `n_triangles`-by-3-by-3 array) containing the vertices of the
+            triangles.
+        :param bool write_bin: flag to write in the binary format.
+        """
+        vertices = np.asarray(mesh_points, dtype=float).reshape(-1, 3, 3)
+        normals = np.cross(vertices[:, 1] - vertices[:, 0],
+                           vertices[:, 2] - vertices[:, 0])
+        norms = np.linalg.norm(normals, axis=1)
+        normals[norms > 0.] /= norms[norms > 0., np.newaxis]
+
+        if not write_bin:
+            with open(self.outfile, 'w') as output_file:
+                output_file.write('solid pygem\n')
+                np.savetxt(
+                    output_file,
+                    np.hstack((normals, vertices.reshape(-1, 9))),
+                    fmt=_STL_ASCII_FACET)
+                output_file.write('endsolid pygem\n')
+            return
+
+        triangles = np.zeros(vertices.shape[0], dtype=_STL_BINARY_DTYPE)
+        triangles['normal'] = normals
+        triangles['vertices'] = vertices
+        if (self._attributes is not None and
+                self._attributes.shape[0] == triangles.shape[0]):
+            triangles['attribute'] = self._attributes
+
+        with open(self.outfile, 'wb') as output_file:
+            output_file.write(b'PyGeM binary stl'.ljust(80))
+            output_file.write(
+                np.array([triangles.shape[0]], dtype='<u4').tobytes())
+            triangles.tofile(output_file)
+
+    @staticmethod
+    def _read_data(filename):
+        """
+        This private static method reads the dataset stored in `filename`.
+
+        :param string filename: name of the file to read.
+
+        :return: data: the dataset read by VTK.
+        :rtype: vtk.vtkDataSet
+        """
+        import vtk
+
+        reader = vtk.vtkSTLReader()
+        reader.SetFileName(filename)
+        reader.Update()
+        return reader.GetOutput()
+
     def plot(self, plot_file=None, save_fig=False):
         """
         Method to plot an stl file. If `plot_file` is not given it plots
@@ -108,6 +313,12 @@ class StlHandler(fh.FileHandler):
             geometry
         :rtype: matplotlib.pyplot.figure
         """
+        # matplotlib and VTK are imported only when they are needed, not with
+        # the package
+        import matplotlib.pyplot as plt
+        import mpl_toolkits.mplot3d as a3
+        import vtk
+
         if plot_file is None:
             plot_file = self.infile
         else:
@@ -169,6 +380,8 @@ class StlHandler(fh.FileHandler):
 
         :param string show_file: the vtk filename you want to show.
         """
+        import vtk
+
         if show_file is None:
             show_file = self.infile
         else:
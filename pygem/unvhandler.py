@@ -1,6 +1,7 @@
 """
 Derived module from filehandler.py to handle Universal (unv) files.
 """
+import re
 import numpy as np
 import pygem.filehandler as fh
 
@@ -13,17 +14,28 @@ class UnvHandler(fh.FileHandler):
     :cvar string outfile: name of the output file where to write in.
     :cvar list extensions: extensions of the input/output files.
         It is equal to ['.unv'].
+    :cvar bool gzip: it is True, since the files can also be gzip
+        compressed ('.unv.gz').
+    :cvar numpy.ndarray node_ids: the labels of the nodes of the section
+        2411, in the same order of the points returned by `parse`.
     """
 
     def __init__(self):
         super(UnvHandler, self).__init__()
         self.extensions = ['.unv']
+        self.gzip = True
+        self.node_ids = None
 
     def parse(self, filename):
         """
         Method to parse the file `filename`. It returns a matrix with
         all the coordinates. It reads only the section 2411 of the unv
-        files and it assumes there are only triangles.
+        files and it assumes there are only triangles. The section is
+        located once and all its records are converted together; the
+        node labels are stored in `self.node_ids` and the byte spans
+        of the coordinate records are stored for `write`. If
+        `self.cache` is set, the points of an unchanged file are loaded
+        from it.
 
         :param string filename: name of the input file.
 
@@ -36,34 +48,82 @@ class UnvHandler(fh.FileHandler):
 
         self.infile = filename
 
-        index = -9
-        mesh_points = []
-        with open(self.infile, 'r') as input_file:
-            for num, line in enumerate(input_file):
-                if line.startswith('  2411'):
-                    index = num
-                if num == index + 2:
-                    if line.startswith('    -1'):
-                        break
-                    else:
-                        line = line.replace('D', 'E')
-                        l = []
-                        for t in line.split():
-                            try:
-                                l.append(float(t))
-                            except ValueError:
-                                pass
-                        mesh_points.append(l)
-                        index = num
-            mesh_points = np.array(mesh_points)
+        mesh_points = self._load_cache()
+        if mesh_points is not None:
+            return mesh_points
 
+        content = self._read_file(self.infile)
+
+        start, end = self._locate_nodes(content)
+
+        # each node has a record with label and coordinate systems (4
+        # integers) followed by a record with the 3 coordinates
+        records = np.array(
+            content[start:end].replace(b'D', b'E').split(),
+            dtype=float).reshape(-1, 7)
+        self.node_ids = records[:, 0].astype(np.int64)
+        mesh_points = records[:, 4:].astype(float)
+
+        # the coordinates records are the even lines of the section
+        block = np.frombuffer(content[start:end], dtype=np.uint8)
+        line_ends = start + np.flatnonzero(block == ord('\n'))
+        if line_ends.shape[0] != 2 * mesh_points.shape[0]:
+            raise ValueError(
+                'Every node of section 2411 must take exactly two lines.')
+        coord_starts = line_ends[0::2] + 1
+        coord_ends = line_ends[1::2]
+        coord_ends -= (block[coord_ends - start - 1] == ord('\r'))
+        self._coord_spans = np.column_stack((coord_starts, coord_ends))
+
+        self._store_cache(mesh_points)
         return mesh_points
 
+    def _layout(self):
+        """
+        This private method returns the layout of the parsed file: the
+        coordinate spans and the node labels.
+
+        :rtype: dict
+        """
+        layout = super(UnvHandler, self)._layout()
+        layout['node_ids'] = self.node_ids
+        return layout
+
+    def _restore_layout(self, layout):
+        """
+        This private method restores the layout returned by `_layout`.
+
+        :param dict layout: the layout of the parsed file.
+        """
+        super(UnvHandler, self)._restore_layout(layout)
+        self.node_ids = layout['node_ids']
+
+    @staticmethod
+    def _locate_nodes(content):
+        """
+        This private static method locates the records of the first
+        section 2411 (nodes) in the content of a unv file.
+
+        :param bytes content: the content of the unv file.
+
+        :return: the first and the one-past-last byte of the records.
+        :rtype: tuple
+        """
+        header = re.search(b'^  2411.*$', content, re.MULTILINE)
+        if header is None:
+            return 0, 0
+        start = content.find(b'\n', header.end()) + 1
+        delimiter = re.compile(b'^    -1', re.MULTILINE).search(content, start)
+        end = delimiter.start() if delimiter else len(content)
+        return start, end
+
     def write(self, mesh_points, filename):
         """
         Writes a unv file, called filename, copying all the lines from
         `self.filename` but the coordinates. mesh_points is a matrix
         that contains the new coordinates to write in the unv file.
+        The input file is not scanned again: its bytes are copied
+        verbatim but the coordinate records located by `parse`.
 
         :param numpy.ndarray mesh_points: it is a `n_points`-by-3 matrix
             containing the coordinates of the points of the mesh
@@ -75,23 +135,64 @@ class UnvHandler(fh.FileHandler):
 
         self.outfile = filename
 
-        index = -9
-        i = 0
-        with open(self.outfile, 'w') as output_file:
-            with open(self.infile, 'r') as input_file:
-                for num, line in enumerate(input_file):
-                    if line.startswith('  2411'):
-                        index = num
-                    if num == index + 2:
-                        if line.startswith('    -1'):
-                            index = -9
-                            output_file.write(line)
-                        else:
-                            for j in range(0, 3):
-                                output_file.write(3 * ' ' + '{:.16E}'.format(
-                                    mesh_points[i][j]))
-                            output_file.write('\n')
-                            i += 1
-                            index = num
-                    else:
-                        output_file.write(line)
+        formatted = self._format_points(mesh_points,
+                                        3 * '   %.16E' + '\n')
+        self._write_spans(formatted.encode('ascii').split(b'\n')[:-1])
+
+    def _locate_stream_points(self, lines, state):
+        """
+        This private method locates the coordinate records of the first
+        section 2411 in a block of lines read by `deform_stream`. The state
+        is the part of the file where the block starts: None before the
+        section, the index of the next line inside it, -1 after it.
+
+        :param list lines: the lines of the block, as bytes.
+        :param int state: the state at the end of the previous block.
+
+        :return: the indices of the coordinate records and the state at
+            the end of the block.
+        :rtype: tuple
+        """
+        indices = []
+        for index, line in enumerate(lines):
+            if state is None:
+                if line.startswith(b'  2411'):
+                    state = 0
+            elif state >= 0:
+                if line.startswith(b'    -1'):
+                    state = -1
+                else:
+                    if state % 2:
+                        indices.append(index)
+                    state += 1
+        return indices, state
+
+    def _parse_stream_points(self, lines):
+        """
+        This private method converts the coordinate records `lines` all
+        together.
+
+        :param list lines: the coordinate records, as bytes.
+
+        :rtype: numpy.ndarray
+        """
+        return np.array(
+            b' '.join(lines).replace(b'D', b'E').split(),
+            dtype=float).reshape(-1, 3)
+
+    def _format_stream_points(self, lines, mesh_points):
+        """
+        This private method replaces the coordinate records `lines` with
+        `mesh_points`, as `write` does.
+
+        :param list lines: the coordinate records, as bytes.
+        :param numpy.ndarray mesh_points: the new points, one per line.
+
+        :return: the new lines.
+        :rtype: list
+        """
+        formatted = self._format_points(mesh_points, 3 * '   %.16E' + '\n')
+        return [
+            record + self._split_line_ending(line)[1] for line, record in zip(
+                lines, formatted.encode('ascii').split(b'\n'))
+        ]
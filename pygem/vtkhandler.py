@@ -2,9 +2,8 @@
 Derived module from filehandler.py to handle vtk files.
 """
 import numpy as np
-import matplotlib.pyplot as plt
-import mpl_toolkits.mplot3d as a3
 import vtk
+from vtk.util import numpy_support
 import pygem.filehandler as fh
 
 
@@ -21,13 +20,19 @@ class VtkHandler(fh.FileHandler):
     def __init__(self):
         super(VtkHandler, self).__init__()
         self.extensions = ['.vtk']
+        self._data = None
+        self._data_file = None
 
-    def parse(self, filename):
+    def parse(self, filename, copy=True):
         """
         Method to parse the file `filename`. It returns a matrix
         with all the coordinates.
 
         :param string filename: name of the input file.
+        :param bool copy: if True the coordinates are copied in a
+            new float64 array; if False the returned array is a view
+            on the VTK points buffer, with the precision stored by
+            VTK. The default value is True.
 
         :return: mesh_points: it is a `n_points`-by-3 matrix
             containing the coordinates of the points of the mesh
@@ -42,19 +47,16 @@ class VtkHandler(fh.FileHandler):
 
         self.infile = filename
 
-        reader = vtk.vtkDataSetReader()
-        reader.SetFileName(self.infile)
-        reader.ReadAllVectorsOn()
-        reader.ReadAllScalarsOn()
-        reader.Update()
-        data = reader.GetOutput()
+        self._data = self._read_data(self.infile)
+        self._data_file = self.infile
+        data = self._data
 
-        n_points = data.GetNumberOfPoints()
-        mesh_points = np.zeros([n_points, 3])
+        if data.GetPoints() is None:
+            return np.zeros((0, 3))
 
-        for i in range(n_points):
-            mesh_points[i][0], mesh_points[i][1], mesh_points[i][
-                2] = data.GetPoint(i)
+        mesh_points = numpy_support.vtk_to_numpy(data.GetPoints().GetData())
+        if copy:
+            mesh_points = np.array(mesh_points, dtype=float)
 
         return mesh_points
 
@@ -63,7 +65,8 @@ class VtkHandler(fh.FileHandler):
         Writes a vtk file, called filename, copying all the
         structures from self.filename but the coordinates.
         `mesh_points` is a matrix that contains the new coordinates
-        to write in the vtk file.
+        to write in the vtk file. The dataset read by `parse` is
+        reused, so the input file is not read again.
 
         :param numpy.ndarray mesh_points: it is a `n_points`-by-3
             matrix containing the coordinates of the points of the
@@ -76,17 +79,22 @@ class VtkHandler(fh.FileHandler):
 
         self.outfile = filename
 
-        reader = vtk.vtkDataSetReader()
-        reader.SetFileName(self.infile)
-        reader.ReadAllVectorsOn()
-        reader.ReadAllScalarsOn()
-        reader.Update()
-        data = reader.GetOutput()
+        if self._data is None or self._data_file != self.infile:
+            self._data = self._read_data(self.infile)
+        self._data_file = self.infile
 
-        points = vtk.vtkPoints()
-        for i in range(data.GetNumberOfPoints()):
-            points.InsertNextPoint(mesh_points[i, :])
+        data = self._data.NewInstance()
+        data.ShallowCopy(self._data)
+        if mesh_points.shape != (data.GetNumberOfPoints(), 3):
+            raise ValueError(
+                'The number of points does not match the parsed file.')
 
+        # the new coordinates are shared with VTK, without copies, if they
+        # are already a contiguous float32 array
+        points = vtk.vtkPoints()
+        points.SetData(
+            numpy_support.numpy_to_vtk(
+                np.ascontiguousarray(mesh_points, dtype=np.float32)))
         data.SetPoints(points)
 
         writer = vtk.vtkDataSetWriter()
@@ -94,6 +102,23 @@ class VtkHandler(fh.FileHandler):
         writer.SetInputData(data)
         writer.Write()
 
+    @staticmethod
+    def _read_data(filename):
+        """
+        This private static method reads the dataset stored in `filename`.
+
+        :param string filename: name of the file to read.
+
+        :return: data: the dataset read by VTK.
+        :rtype: vtk.vtkDataSet
+        """
+        reader = vtk.vtkDataSetReader()
+        reader.SetFileName(filename)
+        reader.ReadAllVectorsOn()
+        reader.ReadAllScalarsOn()
+        reader.Update()
+        return reader.GetOutput()
+
     def plot(self, plot_file=None, save_fig=False):
         """
         Method to plot a vtk file. If `plot_file` is not given it
@@ -107,6 +132,10 @@ class VtkHandler(fh.FileHandler):
             the chosen geometry
         :rtype: matplotlib.pyplot.figure
         """
+        # matplotlib is imported only when it is needed, not with the package
+        import matplotlib.pyplot as plt
+        import mpl_toolkits.mplot3d as a3
+
         if plot_file is None:
             plot_file = self.infile
         else:
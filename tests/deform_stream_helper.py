@@ -0,0 +1,44 @@
+import filecmp
+import os
+import shutil
+import tempfile
+import numpy as np
+import pygem.freeform as ffd
+import pygem.params as ffdp
+
+
+class DeformStreamMixin(object):
+    """
+    Checks shared by the tests of the file handlers implementing
+    `deform_stream`. It is mixed in a TestCase.
+
+    The checks use a FFD, that moves each point independently of the others,
+    so that the output does not depend on how the file is split in blocks.
+    """
+
+    @staticmethod
+    def _ffd():
+        params = ffdp.FFDParameters([2, 2, 2])
+        params.box_origin = np.array([-250., -250., -1.])
+        params.box_length = np.array([500., 500., 2.])
+        params.array_mu_x[1, 1, 1] = 0.2
+        params.array_mu_y[1, 0, 1] = -0.3
+        params.array_mu_z[0, 1, 1] = 0.1
+        return ffd.FFD(params, None)
+
+    def _check_deform_stream(self, handler_class, filename, outfilename,
+                             block_size):
+        handler = handler_class()
+        deformation = self._ffd()
+        deformation.original_mesh_points = handler.parse(filename)
+        deformation.perform()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        outfilename_expected = os.path.join(directory,
+                                            os.path.basename(outfilename))
+        handler.write(deformation.modified_mesh_points, outfilename_expected)
+        handler_class().deform_stream(self._ffd(), filename, outfilename,
+                                      block_size=block_size)
+        self.addCleanup(os.remove, outfilename)
+        self.assertTrue(
+            filecmp.cmp(outfilename, outfilename_expected, shallow=False))
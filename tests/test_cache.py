@@ -0,0 +1,132 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import numpy as np
+import pygem.cache as pc
+
+
+class TestPointsCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'mesh.unv')
+        with open(self.filename, 'w') as output_file:
+            output_file.write('mesh')
+
+    def test_cache_default_directory(self):
+        cache = pc.PointsCache()
+        self.assertIsNone(cache.directory)
+
+    def test_cache_default_max_size(self):
+        cache = pc.PointsCache()
+        self.assertIsNone(cache.max_size)
+
+    def test_cache_default_use_hash(self):
+        cache = pc.PointsCache()
+        self.assertFalse(cache.use_hash)
+
+    def test_cache_key_tag(self):
+        cache = pc.PointsCache()
+        self.assertNotEqual(
+            cache.key(self.filename, 'UnvHandler'),
+            cache.key(self.filename, 'KHandler'))
+
+    def test_cache_key_modified_file(self):
+        cache = pc.PointsCache()
+        key = cache.key(self.filename, 'UnvHandler')
+        with open(self.filename, 'w') as output_file:
+            output_file.write('modified mesh')
+        self.assertNotEqual(key, cache.key(self.filename, 'UnvHandler'))
+
+    def test_cache_key_hash(self):
+        cache = pc.PointsCache(use_hash=True)
+        key = cache.key(self.filename, 'UnvHandler')
+        stat = os.stat(self.filename)
+        with open(self.filename, 'w') as output_file:
+            output_file.write('hsem')
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime))
+        self.assertNotEqual(key, pc.PointsCache(use_hash=True).key(
+            self.filename, 'UnvHandler'))
+
+    def test_cache_load_missing(self):
+        cache = pc.PointsCache()
+        key = cache.key(self.filename, 'UnvHandler')
+        self.assertIsNone(cache.load(self.filename, key))
+
+    def test_cache_store_load(self):
+        cache = pc.PointsCache()
+        key = cache.key(self.filename, 'UnvHandler')
+        mesh_points = np.random.rand(10, 3)
+        cache.store(self.filename, key, mesh_points,
+                    {'coord_spans': np.arange(20).reshape(10, 2)})
+        cached_points, layout = cache.load(self.filename, key)
+        np.testing.assert_array_equal(cached_points, mesh_points)
+        np.testing.assert_array_equal(layout['coord_spans'],
+                                      np.arange(20).reshape(10, 2))
+
+    def test_cache_store_next_to_file(self):
+        cache = pc.PointsCache()
+        key = cache.key(self.filename, 'UnvHandler')
+        cache.store(self.filename, key, np.zeros((2, 3)), {})
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(self.directory, '.pygem_cache', key + '.npy')))
+
+    def test_cache_store_directory(self):
+        directory = os.path.join(self.directory, 'cache')
+        cache = pc.PointsCache(directory=directory)
+        key = cache.key(self.filename, 'UnvHandler')
+        cache.store(self.filename, key, np.zeros((2, 3)), {})
+        self.assertTrue(os.path.isfile(os.path.join(directory, key + '.npz')))
+
+    def test_cache_store_existing_directory(self):
+        directory = os.path.join(self.directory, 'cache')
+        os.makedirs(directory)
+        cache = pc.PointsCache(directory=directory)
+        key = cache.key(self.filename, 'UnvHandler')
+        cache.store(self.filename, key, np.zeros((2, 3)), {})
+        self.assertTrue(os.path.isfile(os.path.join(directory, key + '.npy')))
+
+    def test_cache_store_replace(self):
+        cache = pc.PointsCache()
+        key = cache.key(self.filename, 'UnvHandler')
+        cache.store(self.filename, key, np.zeros((2, 3)), {})
+        cache.store(self.filename, key, np.ones((2, 3)), {})
+        np.testing.assert_array_equal(
+            cache.load(self.filename, key)[0], np.ones((2, 3)))
+
+    def test_cache_load_memory_map(self):
+        cache = pc.PointsCache()
+        key = cache.key(self.filename, 'UnvHandler')
+        cache.store(self.filename, key, np.zeros((2, 3)), {})
+        cached_points, _ = cache.load(self.filename, key)
+        self.assertIsInstance(cached_points, np.memmap)
+        cached_points[0, 0] = 1.
+        np.testing.assert_array_equal(
+            cache.load(self.filename, key)[0], np.zeros((2, 3)))
+
+    def test_cache_eviction(self):
+        directory = os.path.join(self.directory, 'cache')
+        mesh_points = np.zeros((1000, 3))
+        cache = pc.PointsCache(directory=directory)
+        cache.store(self.filename, 'first', mesh_points, {})
+        entry_size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory))
+        cache.max_size = 2 * entry_size
+        os.utime(os.path.join(directory, 'first.npy'), (0, 0))
+        os.utime(os.path.join(directory, 'first.npz'), (0, 0))
+        cache.store(self.filename, 'second', mesh_points, {})
+        cache.store(self.filename, 'third', mesh_points, {})
+        self.assertListEqual(
+            sorted(os.listdir(directory)),
+            ['second.npy', 'second.npz', 'third.npy', 'third.npz'])
+
+    def test_cache_clear(self):
+        directory = os.path.join(self.directory, 'cache')
+        cache = pc.PointsCache(directory=directory)
+        key = cache.key(self.filename, 'UnvHandler')
+        cache.store(self.filename, key, np.zeros((2, 3)), {})
+        cache.clear()
+        self.assertListEqual(os.listdir(directory), [])
@@ -1,5 +1,7 @@
 from unittest import TestCase
 
+import os
+
 import numpy as np
 
 import pygem.filehandler as fh
@@ -28,3 +30,25 @@ class TestFilehandler(TestCase):
         mesh_points = np.zeros((3, 3))
         with self.assertRaises(NotImplementedError):
             file_handler.write(mesh_points, 'output')
+
+    def test_base_class_gzip(self):
+        file_handler = fh.FileHandler()
+        self.assertFalse(file_handler.gzip)
+
+    def test_base_class_check_extension_failing_gzip(self):
+        file_handler = fh.FileHandler()
+        file_handler.extensions = ['.k']
+        with self.assertRaises(ValueError):
+            file_handler._check_extension('input.k.gz')
+
+    def test_base_class_deform_stream(self):
+        file_handler = fh.FileHandler()
+        file_handler.extensions = ['.k']
+        with self.assertRaises(NotImplementedError):
+            file_handler.deform_stream(None, 'tests/test_datasets/test_square.k',
+                                       'tests/test_datasets/test_square_out.k')
+        self.assertFalse(
+            os.path.exists('tests/test_datasets/test_square_out.k'))
+        self.assertEqual(
+            [name for name in os.listdir('tests/test_datasets')
+             if name.endswith('test_square_out.k')], [])
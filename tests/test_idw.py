@@ -36,3 +36,130 @@ class TestIDW(TestCase):
         idw.perform()
         np.testing.assert_array_almost_equal(idw.modified_mesh_points[-3],
                                              expected_stretch)
+
+    def test_idw_perform_deform_on_control_point(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points[-1],
+                                             [1.5, 1.6, 1.7])
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points[0],
+                                             [0., 0., 0.])
+
+    def test_idw_perform_all_neighbors(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        expected = idw.modified_mesh_points
+        params.n_neighbors = 8
+        idw.perform()
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points,
+                                             expected)
+
+    def test_idw_perform_neighbors(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        params.n_neighbors = 2
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points[-1],
+                                             [1.5, 1.6, 1.7])
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points[0],
+                                             [0., 0., 0.])
+
+    def test_idw_perform_neighbors_tied(self):
+        params = IDWParameters()
+        params.n_neighbors = 2
+        top = params.original_control_points[:, 2] == 1.
+        params.deformed_control_points[top] += [0., 0., 0.5]
+        idw = IDW(params, np.array([[0.5, 0.5, 0.9]]))
+        idw.perform()
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points,
+                                             [[0.5, 0.5, 1.4]])
+
+    def test_idw_perform_radius(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        params.radius = 0.5
+        mesh_points = self.get_cube_mesh_points()
+        idw = IDW(params, mesh_points)
+        idw.perform()
+        far = np.linalg.norm(mesh_points - [1., 1., 1.], ord=3, axis=1) >= 0.5
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points[far],
+                                             mesh_points[far])
+        np.testing.assert_array_almost_equal(idw.modified_mesh_points[-1],
+                                             [1.5, 1.6, 1.7])
+
+    def test_idw_tree_cached(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        params.n_neighbors = 3
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        tree = idw.tree
+        idw.perform()
+        self.assertIs(idw.tree, tree)
+
+    def test_idw_tree_rebuilt(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        idw = IDW(params, self.get_cube_mesh_points())
+        tree = idw.tree
+        params.original_control_points = params.original_control_points + 1.
+        self.assertIsNot(idw.tree, tree)
+
+    def test_idw_wrong_pool(self):
+        params = IDWParameters()
+        with self.assertRaises(ValueError):
+            IDW(params, self.get_cube_mesh_points(), pool='gpu')
+
+    def test_idw_wrong_chunk_size(self):
+        params = IDWParameters()
+        for chunk_size in [0, -10]:
+            with self.assertRaises(ValueError):
+                IDW(params, self.get_cube_mesh_points(), chunk_size=chunk_size)
+
+    def test_idw_wrong_n_jobs(self):
+        params = IDWParameters()
+        for n_jobs in [0, -1]:
+            with self.assertRaises(ValueError):
+                IDW(params, self.get_cube_mesh_points(), n_jobs=n_jobs)
+
+    def test_idw_perform_chunks(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        chunked_idw = IDW(params, self.get_cube_mesh_points(), chunk_size=777)
+        chunked_idw.perform()
+        np.testing.assert_array_almost_equal(chunked_idw.modified_mesh_points,
+                                             idw.modified_mesh_points)
+
+    def test_idw_perform_threads(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        params.n_neighbors = 3
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        threaded_idw = IDW(
+            params, self.get_cube_mesh_points(), chunk_size=500, n_jobs=4)
+        threaded_idw.perform()
+        np.testing.assert_array_almost_equal(
+            threaded_idw.modified_mesh_points, idw.modified_mesh_points)
+
+    def test_idw_perform_processes(self):
+        params = IDWParameters()
+        params.read_parameters('tests/test_datasets/parameters_idw_deform.prm')
+        idw = IDW(params, self.get_cube_mesh_points())
+        idw.perform()
+        process_idw = IDW(
+            params,
+            self.get_cube_mesh_points(),
+            chunk_size=2000,
+            n_jobs=2,
+            pool='process')
+        process_idw.perform()
+        np.testing.assert_array_almost_equal(process_idw.modified_mesh_points,
+                                             idw.modified_mesh_points)
@@ -53,6 +53,26 @@ class TestIDWParameters(TestCase):
         params.read_parameters(filename)
         assert params.power == 3
 
+    def test_class_members_default_n_neighbors(self):
+        params = IDWParameters()
+        assert params.n_neighbors is None
+
+    def test_class_members_default_radius(self):
+        params = IDWParameters()
+        assert params.radius is None
+
+    def test_write_read_local(self):
+        params = IDWParameters()
+        params.n_neighbors = 4
+        params.radius = 0.3
+        outfilename = 'parameters_idw_local.prm'
+        params.write_parameters(outfilename)
+        new_params = IDWParameters()
+        new_params.read_parameters(outfilename)
+        assert new_params.n_neighbors == 4
+        assert new_params.radius == 0.3
+        os.remove(outfilename)
+
     def test_read_not_string(self):
         params = IDWParameters()
         with self.assertRaises(TypeError):
@@ -2,10 +2,42 @@ import os
 from unittest import TestCase
 
 import numpy as np
-from OCC.TopoDS import TopoDS_Shape
+from OCC.BRep import BRep_Builder, BRep_Tool
+from OCC.BRepBuilderAPI import BRepBuilderAPI_Transform
+from OCC.gp import gp_Trsf, gp_Vec
+from OCC.TopoDS import TopoDS_Shape, TopoDS_Compound
 from OCC.BRepPrimAPI import BRepPrimAPI_MakeBox
 
 import pygem.igeshandler as ih
+import pygem.nurbshandler as nh
+import pygem.stlhandler as sh
+import pygem.vtkhandler as vh
+
+
+class ScaledIgesHandler(ih.IgesHandler):
+    """
+    Iges handler loading `n_copies` copies of the shape of the file in a
+    compound, to parse larger models. The copies are distinct shapes,
+    translated by `offset` along x one from the other.
+    """
+    offset = 100.
+
+    def __init__(self, n_copies):
+        super(ScaledIgesHandler, self).__init__()
+        self.n_copies = n_copies
+
+    def load_shape_from_file(self, filename):
+        shape = super(ScaledIgesHandler, self).load_shape_from_file(filename)
+        builder = BRep_Builder()
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for i in range(self.n_copies):
+            translation = gp_Trsf()
+            translation.SetTranslation(gp_Vec(i * self.offset, 0., 0.))
+            builder.Add(compound,
+                        BRepBuilderAPI_Transform(shape, translation,
+                                                 True).Shape())
+        return compound
 
 
 class TestIgesHandler(TestCase):
@@ -228,3 +260,486 @@ class TestIgesHandler(TestCase):
         iges_handler.write_shape_to_file(ihp, path)
         self.assertTrue(os.path.exists(path))
         self.addCleanup(os.remove, path)
+
+    def test_iges_parse_scaled_shape(self):
+        iges_handler = ScaledIgesHandler(50)
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        self.assertTupleEqual(mesh_points.shape, (50 * 32, 3))
+        self.assertEqual(iges_handler._control_point_position[-1], 50 * 32)
+        np.testing.assert_array_almost_equal(
+            mesh_points[32:64],
+            mesh_points[:32] + [ScaledIgesHandler.offset, 0., 0.])
+
+    def test_iges_parse_scaled_conversions(self):
+        for n_copies in [25, 200]:
+            iges_handler = ScaledIgesHandler(n_copies)
+            extracted_poles = []
+            surface_poles = iges_handler._surface_poles
+
+            def counting_surface_poles(bspline_surface):
+                extracted_poles.append(bspline_surface)
+                return surface_poles(bspline_surface)
+
+            iges_handler._surface_poles = counting_surface_poles
+            iges_handler.parse('tests/test_datasets/test_pipe.iges')
+            # every face of every copy is converted once, and only once
+            self.assertEqual(iges_handler._faces_map.Extent(), 6 * n_copies)
+            self.assertEqual(len(extracted_poles), 6 * n_copies)
+
+    def test_iges_parse_nurbs_cache(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        self.assertEqual(len(iges_handler._nurbs_faces), 6)
+        self.assertEqual(iges_handler._faces_map.Extent(), 6)
+
+    def test_iges_write_keeps_nurbs_cache(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write(mesh_points * 2., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        self.assertEqual(len(iges_handler._nurbs_faces), 6)
+        cached_points = np.concatenate([
+            iges_handler._surface_poles(h_bsurface.GetObject())
+            for __, h_bsurface in iges_handler._nurbs_faces
+        ])
+        np.testing.assert_array_almost_equal(cached_points, mesh_points)
+
+    def test_iges_write_twice(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        mesh_points[0][0] = 2.2
+        mesh_points[31][2] = -3.6
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        outfilename_2 = 'tests/test_datasets/test_pipe_out_2.iges'
+        iges_handler.write(mesh_points, outfilename)
+        iges_handler.write(mesh_points, outfilename_2)
+        self.addCleanup(os.remove, outfilename)
+        self.addCleanup(os.remove, outfilename_2)
+        np.testing.assert_array_almost_equal(
+            ih.IgesHandler().parse(outfilename),
+            ih.IgesHandler().parse(outfilename_2))
+
+    def test_iges_default_n_jobs(self):
+        iges_handler = ih.IgesHandler()
+        self.assertEqual(iges_handler.n_jobs, 1)
+
+    def test_iges_write_processes(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        mesh_points[0][0] = 2.2
+        mesh_points[5][1] = 4.3
+        mesh_points[9][2] = 0.5
+        mesh_points[12][0] = 7.2
+        mesh_points[16][1] = -1.2
+        mesh_points[31][2] = -3.6
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        outfilename_processes = 'tests/test_datasets/test_pipe_out_2.iges'
+        iges_handler.write(mesh_points, outfilename)
+        iges_handler.n_jobs = 3
+        iges_handler.write(mesh_points, outfilename_processes)
+        self.addCleanup(os.remove, outfilename)
+        self.addCleanup(os.remove, outfilename_processes)
+        np.testing.assert_array_almost_equal(
+            ih.IgesHandler().parse(outfilename_processes),
+            ih.IgesHandler().parse(outfilename))
+
+    def test_iges_write_processes_handler(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        mesh_points[0][0] = 2.2
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.n_jobs = 2
+        iges_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        # the handler is set in the processes of the pool, not in the parent
+        self.assertIsNone(nh._WORKER_HANDLER)
+
+    def test_iges_n_processes_without_fork(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.n_jobs = 4
+        fork_context = nh._fork_context
+        nh._fork_context = lambda: None
+        self.addCleanup(setattr, nh, '_fork_context', fork_context)
+        self.assertEqual(iges_handler._n_processes(10), 1)
+
+    def _count_rebuilt_faces(self, iges_handler):
+        rebuilt_faces = []
+        rebuild_face = iges_handler._rebuild_face
+
+        def counting_rebuild_face(index, points_face, weights_face=None):
+            rebuilt_faces.append(index)
+            return rebuild_face(index, points_face, weights_face)
+
+        iges_handler._rebuild_face = counting_rebuild_face
+        return rebuilt_faces
+
+    def test_iges_write_unchanged_faces(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        rebuilt_faces = self._count_rebuilt_faces(iges_handler)
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        self.assertListEqual(rebuilt_faces, [])
+        np.testing.assert_array_almost_equal(
+            ih.IgesHandler().parse(outfilename), mesh_points)
+
+    def test_iges_write_changed_faces(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        mesh_points[9][2] = 0.5
+        mesh_points[31][2] = -3.6
+        rebuilt_faces = self._count_rebuilt_faces(iges_handler)
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        self.assertListEqual(rebuilt_faces, [1, 5])
+        np.testing.assert_array_almost_equal(
+            ih.IgesHandler().parse(outfilename), mesh_points)
+
+    def test_iges_write_shape_unchanged_edges(self):
+        iges_handler = ih.IgesHandler()
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        l_shells[0][1][0][9][2] = 0.5
+        n_edges = len(iges_handler._edges_poles)
+        nurbs_face = iges_handler._nurbs_face(
+            iges_handler._explore_faces(iges_handler.shape)[1])[0]
+        tolerances = [
+            BRep_Tool.Tolerance(edge)
+            for edge in iges_handler._face_edges(nurbs_face)
+        ]
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write_shape(l_shells, outfilename, 1e-1)
+        iges_handler.write_shape(l_shells, outfilename, 1e-1)
+        self.addCleanup(os.remove, outfilename)
+        # the parsed edges are not converted again, and the edges of the
+        # cached faces are not modified
+        self.assertEqual(len(iges_handler._edges_poles), n_edges)
+        self.assertListEqual([
+            BRep_Tool.Tolerance(edge)
+            for edge in iges_handler._face_edges(nurbs_face)
+        ], tolerances)
+
+    def test_iges_write_face_moved_edge(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        face = iges_handler._explore_faces(iges_handler.shape)[0]
+        points_face, points_edges = iges_handler._parse_face(face)
+        points_edges[0] = points_edges[0] + 1e-3
+        n_edges = len(iges_handler._edges_poles)
+        iges_handler.write_face(points_face, points_edges, face, 1e-3)
+        self.assertEqual(len(iges_handler._edges_poles), n_edges)
+
+    def test_iges_parse_face_static(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        face = iges_handler._explore_faces(iges_handler.shape)[0]
+        points_face, points_edges = ih.IgesHandler.parse_face(face)
+        points_face_cached, points_edges_cached = iges_handler._parse_face(
+            face)
+        np.testing.assert_array_equal(points_face, points_face_cached)
+        for points_edge, points_edge_cached in zip(points_edges,
+                                                   points_edges_cached):
+            np.testing.assert_array_equal(points_edge, points_edge_cached)
+
+    def test_iges_write_edge_static(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        face = iges_handler._explore_faces(iges_handler.shape)[0]
+        edge = iges_handler._face_edges(face)[0]
+        points_edge = ih.IgesHandler.parse_face(face)[1][0]
+        new_edge = ih.IgesHandler.write_edge(points_edge + 0.1, edge)
+        np.testing.assert_array_almost_equal(
+            ih.IgesHandler()._edge_poles(new_edge), points_edge + 0.1)
+
+    @staticmethod
+    def _shared_edge(iges_handler, l_shells):
+        """
+        Returns the (list of edge points, index) of the faces sharing the
+        first shared edge of the shape parsed by `parse_shape`.
+        """
+        table = iges_handler.shape_table
+        edges, counts = np.unique(table['face_edges'], return_counts=True)
+        positions = np.flatnonzero(
+            table['face_edges'] == edges[counts > 1][0])
+        faces = [face for shell in l_shells for face in shell]
+        references = []
+        for position in positions:
+            iface = np.searchsorted(table['face_edge_offsets'], position,
+                                    'right') - 1
+            references.append(
+                (faces[iface][1],
+                 position - table['face_edge_offsets'][iface]))
+        return references
+
+    def test_iges_parse_shape_shared_edges(self):
+        iges_handler = ih.IgesHandler()
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        shared = self._shared_edge(iges_handler, l_shells)
+        self.assertGreater(len(shared), 1)
+        (points_edges, iedge), (points_edges_2, iedge_2) = shared[:2]
+        # every face gets its own copy of the shared edge
+        np.testing.assert_array_equal(points_edges[iedge],
+                                      points_edges_2[iedge_2])
+        self.assertFalse(
+            np.shares_memory(points_edges[iedge], points_edges_2[iedge_2]))
+
+    def test_iges_write_shape_shared_edges_differ(self):
+        iges_handler = ih.IgesHandler()
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        list_points_edge, iedge = self._shared_edge(iges_handler,
+                                                    l_shells)[1]
+        list_points_edge[iedge] += 0.1
+        with self.assertRaises(ValueError):
+            iges_handler.write_shape(
+                l_shells, 'tests/test_datasets/test_pipe_out.iges', 1e-3)
+
+    def test_iges_write_shape_shared_edges_processes(self):
+        iges_handler = ih.IgesHandler()
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        # the shared edge is moved in the same way for all the faces
+        for list_points_edge, iedge in self._shared_edge(
+                iges_handler, l_shells):
+            list_points_edge[iedge][:, 2] += 1e-3
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write_shape(l_shells, outfilename, 1e-3)
+        self.addCleanup(os.remove, outfilename)
+        serial_stats = iges_handler.sewing_stats
+        iges_handler.n_jobs = 2
+        outfilename_processes = 'tests/test_datasets/test_pipe_out_2.iges'
+        iges_handler.write_shape(l_shells, outfilename_processes, 1e-3)
+        self.addCleanup(os.remove, outfilename_processes)
+        # the copies of the shared edge are merged by the sewing
+        for stats, stats_processes in zip(serial_stats,
+                                          iges_handler.sewing_stats):
+            self.assertEqual(stats['free_edges'],
+                             stats_processes['free_edges'])
+            self.assertEqual(stats['contiguous_edges'],
+                             stats_processes['contiguous_edges'])
+        np.testing.assert_array_almost_equal(
+            ih.IgesHandler().parse(outfilename_processes),
+            ih.IgesHandler().parse(outfilename))
+
+    def test_iges_parse_shape_points_table(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_shape_points(
+            'tests/test_datasets/test_pipe.iges')
+        table = iges_handler.shape_table
+        self.assertEqual(mesh_points.shape[0], table['edge_offsets'][-1])
+        self.assertEqual(table['face_offsets'][-1], table['edge_offsets'][0])
+        np.testing.assert_array_equal(
+            np.diff(table['face_offsets']), np.prod(table['face_shapes'], 1))
+        self.assertEqual(table['face_edges'].shape[0],
+                         table['face_edge_offsets'][-1])
+
+    def test_iges_parse_shape_points_views(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_shape_points(
+            'tests/test_datasets/test_pipe.iges')
+        l_shells = iges_handler._shape_shells(mesh_points)
+        for faces in l_shells:
+            for points_face, list_points_edge in faces:
+                self.assertTrue(np.shares_memory(points_face, mesh_points))
+                for points_edge in list_points_edge:
+                    self.assertTrue(np.shares_memory(points_edge, mesh_points))
+
+    def test_iges_parse_shape_points_equal_parse_shape(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_shape_points(
+            'tests/test_datasets/test_pipe.iges')
+        l_shells = ih.IgesHandler().parse_shape(
+            'tests/test_datasets/test_pipe.iges')
+        for faces, faces_views in zip(
+                l_shells, iges_handler._shape_shells(mesh_points)):
+            for (points_face, list_points_edge), (view_face, views_edge) in \
+                    zip(faces, faces_views):
+                np.testing.assert_array_equal(points_face, view_face)
+                for points_edge, view_edge in zip(list_points_edge,
+                                                  views_edge):
+                    np.testing.assert_array_equal(points_edge, view_edge)
+
+    def test_iges_write_shape_points_failing_points_number(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_shape_points(
+            'tests/test_datasets/test_pipe.iges')
+        with self.assertRaises(ValueError):
+            iges_handler.write_shape_points(
+                mesh_points[:-1], 'tests/test_datasets/test_pipe_out.iges',
+                1e-3)
+
+    def test_iges_write_shape_points_failing_not_parsed(self):
+        iges_handler = ih.IgesHandler()
+        with self.assertRaises(RuntimeError):
+            iges_handler.write_shape_points(
+                np.zeros((10, 3)), 'tests/test_datasets/test_pipe_out.iges',
+                1e-3)
+
+    def test_iges_parse_weights(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        self.assertTupleEqual(iges_handler.weights.shape,
+                              (mesh_points.shape[0], ))
+        self.assertTrue(np.all(iges_handler.weights > 0))
+
+    def test_iges_parse_weights_rational(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        self.assertFalse(np.allclose(iges_handler.weights, 1.))
+
+    def test_iges_parse_shape_points_weights(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_shape_points(
+            'tests/test_datasets/test_pipe.iges')
+        self.assertTupleEqual(iges_handler.weights.shape,
+                              (mesh_points.shape[0], ))
+
+    def test_iges_write_failing_weights_number(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        with self.assertRaises(ValueError):
+            iges_handler.write(mesh_points,
+                               'tests/test_datasets/test_pipe_out.iges',
+                               weights=iges_handler.weights[:-1])
+
+    def test_iges_write_unchanged_weights(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        rebuilt_faces = self._count_rebuilt_faces(iges_handler)
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write(
+            mesh_points, outfilename, weights=iges_handler.weights.copy())
+        self.addCleanup(os.remove, outfilename)
+        self.assertListEqual(rebuilt_faces, [])
+
+    def test_iges_write_changed_weights(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse('tests/test_datasets/test_pipe.iges')
+        weights = iges_handler.weights.copy()
+        weights[9] *= 2.
+        rebuilt_faces = self._count_rebuilt_faces(iges_handler)
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write(mesh_points, outfilename, weights=weights)
+        self.addCleanup(os.remove, outfilename)
+        self.assertListEqual(rebuilt_faces, [1])
+
+    def test_iges_default_sewing_attributes(self):
+        iges_handler = ih.IgesHandler()
+        self.assertEqual(iges_handler.sew_tolerance, 0.01)
+        self.assertFalse(iges_handler.find_contiguous_edges)
+        self.assertListEqual(iges_handler.sewing_stats, [])
+
+    def test_iges_write_shape_sewing_stats(self):
+        iges_handler = ih.IgesHandler()
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write_shape(l_shells, outfilename, 1e-3)
+        self.addCleanup(os.remove, outfilename)
+        self.assertEqual(len(iges_handler.sewing_stats), len(l_shells))
+        for faces, stats in zip(l_shells, iges_handler.sewing_stats):
+            self.assertEqual(stats['faces'], len(faces))
+            self.assertIsNone(stats['analysed_edges'])
+            self.assertGreaterEqual(stats['sewing_time'], 0.)
+            for key in ('free_edges', 'contiguous_edges', 'multiple_edges',
+                        'degenerated_shapes'):
+                self.assertGreaterEqual(stats[key], 0)
+
+    def test_iges_write_shape_find_contiguous_edges(self):
+        iges_handler = ih.IgesHandler()
+        iges_handler.find_contiguous_edges = True
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write_shape(l_shells, outfilename, 1e-3)
+        self.addCleanup(os.remove, outfilename)
+        for stats in iges_handler.sewing_stats:
+            self.assertIsNotNone(stats['analysed_edges'])
+
+    def test_iges_write_shape_sewing_processes(self):
+        iges_handler = ih.IgesHandler()
+        l_shells = iges_handler.parse_shape('tests/test_datasets/test_pipe.iges')
+        outfilename = 'tests/test_datasets/test_pipe_out.iges'
+        iges_handler.write_shape(l_shells, outfilename, 1e-3)
+        self.addCleanup(os.remove, outfilename)
+        serial_stats = iges_handler.sewing_stats
+        iges_handler.n_jobs = 2
+        outfilename_processes = 'tests/test_datasets/test_pipe_out_2.iges'
+        iges_handler.write_shape(l_shells, outfilename_processes, 1e-3)
+        self.addCleanup(os.remove, outfilename_processes)
+        for stats, stats_processes in zip(serial_stats,
+                                          iges_handler.sewing_stats):
+            self.assertEqual(stats['free_edges'],
+                             stats_processes['free_edges'])
+            self.assertEqual(stats['multiple_edges'],
+                             stats_processes['multiple_edges'])
+
+    def test_iges_parse_tessellation(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges')
+        self.assertEqual(mesh_points.shape[1], 3)
+        self.assertEqual(iges_handler.triangles.shape[1], 3)
+        self.assertEqual(iges_handler.triangles.max() + 1,
+                         mesh_points.shape[0])
+
+    def test_iges_parse_tessellation_deflection(self):
+        iges_handler = ih.IgesHandler()
+        coarse_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges', deflection=1.)
+        fine_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges', deflection=1e-3)
+        self.assertLess(coarse_points.shape[0], fine_points.shape[0])
+
+    def test_iges_parse_tessellation_merge_tolerance(self):
+        iges_handler = ih.IgesHandler()
+        exact_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges', merge_tolerance=0.)
+        merged_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges')
+        self.assertLessEqual(merged_points.shape[0], exact_points.shape[0])
+        self.assertEqual(iges_handler.triangles.max() + 1,
+                         merged_points.shape[0])
+
+    def test_iges_write_tessellation_stl(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges')
+        outfilename = 'tests/test_datasets/test_pipe_out.stl'
+        iges_handler.write_tessellation(mesh_points + 1., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        stl_handler = sh.StlHandler(backend='numpy')
+        np.testing.assert_array_almost_equal(
+            stl_handler.parse(outfilename),
+            (mesh_points + 1.)[iges_handler.triangles].reshape(-1, 3),
+            decimal=5)
+
+    def test_iges_write_tessellation_vtk(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges')
+        outfilename = 'tests/test_datasets/test_pipe_out.vtk'
+        iges_handler.write_tessellation(mesh_points + 1., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        np.testing.assert_array_almost_equal(
+            vh.VtkHandler().parse(outfilename), mesh_points + 1.)
+
+    def test_iges_write_tessellation_failing_extension(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges')
+        with self.assertRaises(ValueError):
+            iges_handler.write_tessellation(
+                mesh_points, 'tests/test_datasets/test_pipe_out.iges')
+
+    def test_iges_write_tessellation_failing_points_number(self):
+        iges_handler = ih.IgesHandler()
+        mesh_points = iges_handler.parse_tessellation(
+            'tests/test_datasets/test_pipe.iges')
+        with self.assertRaises(ValueError):
+            iges_handler.write_tessellation(
+                mesh_points[:-1], 'tests/test_datasets/test_pipe_out.stl')
+
+    def test_iges_write_tessellation_failing_not_parsed(self):
+        iges_handler = ih.IgesHandler()
+        with self.assertRaises(RuntimeError):
+            iges_handler.write_tessellation(
+                np.zeros((3, 3)), 'tests/test_datasets/test_pipe_out.stl')
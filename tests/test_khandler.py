@@ -1,11 +1,16 @@
 from unittest import TestCase
 import pygem.khandler as uh
 import numpy as np
+import pygem.cache as pc
 import filecmp
+import gzip
 import os
+import shutil
+import tempfile
+from deform_stream_helper import DeformStreamMixin
 
 
-class TestKHandler(TestCase):
+class TestKHandler(TestCase, DeformStreamMixin):
     def test_k_instantiation(self):
         k_handler = uh.KHandler()
 
@@ -117,3 +122,220 @@ class TestKHandler(TestCase):
         k_handler.write(mesh_points, outfilename)
         self.assertTrue(filecmp.cmp(outfilename, outfilename_expected))
         self.addCleanup(os.remove, outfilename)
+
+    def test_k_write_mmap_comparison_1(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        outfilename = 'tests/test_datasets/test_square_out.k'
+        outfilename_expected = 'tests/test_datasets/test_square.k'
+        k_handler.write(mesh_points, outfilename, mmap=True)
+        self.assertTrue(filecmp.cmp(outfilename, outfilename_expected))
+        self.addCleanup(os.remove, outfilename)
+
+    def test_k_write_mmap_comparison_2(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        mesh_points[0][0] = 2.2
+        mesh_points[5][1] = 4.3
+        mesh_points[9][2] = 0.5
+        mesh_points[45][0] = 7.2
+        mesh_points[132][1] = -1.2
+        mesh_points[255][2] = -3.6
+        outfilename = 'tests/test_datasets/test_square_out.k'
+        outfilename_expected = 'tests/test_datasets/test_square_out_true.k'
+        k_handler.write(mesh_points, outfilename, mmap=True)
+        self.assertTrue(filecmp.cmp(outfilename, outfilename_expected))
+        self.addCleanup(os.remove, outfilename)
+
+    def test_k_write_mmap_in_place(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        outfilename = 'tests/test_datasets/test_square_out.k'
+        k_handler.write(mesh_points, outfilename)
+        k_handler.parse(outfilename)
+        mesh_points[132][1] = -1.2
+        k_handler.write(mesh_points, outfilename, mmap=True)
+        new_mesh_points = uh.KHandler().parse(outfilename)
+        np.testing.assert_array_almost_equal(new_mesh_points, mesh_points)
+        self.addCleanup(os.remove, outfilename)
+
+    def test_k_write_mmap_failing_field_width(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        mesh_points[0][0] = 1.e10
+        with self.assertRaises(ValueError):
+            k_handler.write(mesh_points,
+                            'tests/test_datasets/test_square_out.k',
+                            mmap=True)
+
+    def test_k_parse_node_ids(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        np.testing.assert_array_equal(k_handler.node_ids, np.arange(1, 257))
+
+    def test_k_parse_chunks(self):
+        mesh_points = uh.KHandler().parse('tests/test_datasets/test_square.k')
+        chunk_size = uh._CHUNK_SIZE
+        uh._CHUNK_SIZE = 7
+        self.addCleanup(setattr, uh, '_CHUNK_SIZE', chunk_size)
+        k_handler = uh.KHandler()
+        np.testing.assert_array_equal(
+            k_handler.parse('tests/test_datasets/test_square.k'), mesh_points)
+        np.testing.assert_array_equal(k_handler.node_ids, np.arange(1, 257))
+
+    def test_k_write_mmap_chunks(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        outfilename = 'tests/test_datasets/test_square_out.k'
+        k_handler.write(mesh_points + 1., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        chunk_size = uh._CHUNK_SIZE
+        uh._CHUNK_SIZE = 7
+        self.addCleanup(setattr, uh, '_CHUNK_SIZE', chunk_size)
+        outfilename_mmap = 'tests/test_datasets/test_square_out_mmap.k'
+        k_handler.write(mesh_points + 1., outfilename_mmap, mmap=True)
+        self.addCleanup(os.remove, outfilename_mmap)
+        self.assertTrue(filecmp.cmp(outfilename_mmap, outfilename))
+
+    def test_k_default_node_ids_member(self):
+        k_handler = uh.KHandler()
+        self.assertIsNone(k_handler.node_ids)
+
+    def test_k_parse_sections(self):
+        filename = 'tests/test_datasets/test_sections.k'
+        with open(filename, 'wb') as output_file:
+            output_file.write(b'*KEYWORD\r\n*NODE\r\n$ comment\r\n'
+                              b'      12             1.5             2.5'
+                              b'             3.5\r\n*PART\r\n'
+                              b'      13            -1.0            -2.0'
+                              b'            -3.0\r\n*NODE\r\n'
+                              b'      14             4.5             5.5'
+                              b'             6.5\r\n*END\r\n')
+        self.addCleanup(os.remove, filename)
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse(filename)
+        np.testing.assert_array_equal(k_handler.node_ids, [12, 14])
+        np.testing.assert_array_almost_equal(
+            mesh_points, [[1.5, 2.5, 3.5], [4.5, 5.5, 6.5]])
+
+    def test_k_write_multiple(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        outfilename = 'tests/test_datasets/test_square_out.k'
+        k_handler.write(mesh_points + 1., outfilename)
+        k_handler.write(mesh_points * 2., outfilename)
+        new_mesh_points = uh.KHandler().parse(outfilename)
+        np.testing.assert_array_almost_equal(new_mesh_points,
+                                             mesh_points * 2.)
+        self.addCleanup(os.remove, outfilename)
+
+    def test_k_write_failing_n_points(self):
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse('tests/test_datasets/test_square.k')
+        with self.assertRaises(ValueError):
+            k_handler.write(mesh_points[:-1],
+                            'tests/test_datasets/test_square_out.k')
+
+    def _compress(self, filename):
+        with open(filename, 'rb') as input_file:
+            content = input_file.read()
+        compressed = 'tests/test_datasets/test_square_gz.k.gz'
+        with gzip.open(compressed, 'wb') as output_file:
+            output_file.write(content)
+        self.addCleanup(os.remove, compressed)
+        return compressed
+
+    def test_k_default_gzip_member(self):
+        k_handler = uh.KHandler()
+        self.assertTrue(k_handler.gzip)
+
+    def test_k_parse_gzip(self):
+        compressed = self._compress('tests/test_datasets/test_square.k')
+        np.testing.assert_array_equal(
+            uh.KHandler().parse(compressed),
+            uh.KHandler().parse('tests/test_datasets/test_square.k'))
+
+    def test_k_write_gzip(self):
+        compressed = self._compress('tests/test_datasets/test_square.k')
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse(compressed)
+        mesh_points[0][0] = 2.2
+        mesh_points[5][1] = 4.3
+        mesh_points[9][2] = 0.5
+        mesh_points[45][0] = 7.2
+        mesh_points[132][1] = -1.2
+        mesh_points[255][2] = -3.6
+        outfilename = 'tests/test_datasets/test_square_out.k.gz'
+        k_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        with gzip.open(outfilename, 'rb') as output_file:
+            content = output_file.read()
+        with open('tests/test_datasets/test_square_out_true.k',
+                  'rb') as expected_file:
+            self.assertEqual(content, expected_file.read())
+
+    def test_k_write_failing_gzip_mmap(self):
+        compressed = self._compress('tests/test_datasets/test_square.k')
+        k_handler = uh.KHandler()
+        mesh_points = k_handler.parse(compressed)
+        with self.assertRaises(ValueError):
+            k_handler.write(mesh_points,
+                            'tests/test_datasets/test_square_out.k',
+                            mmap=True)
+
+    def test_k_deform_stream(self):
+        self._check_deform_stream(uh.KHandler,
+                                  'tests/test_datasets/test_square.k',
+                                  'tests/test_datasets/test_square_out.k',
+                                  block_size=7)
+
+    def test_k_deform_stream_gzip(self):
+        compressed = self._compress('tests/test_datasets/test_square.k')
+        outfilename = 'tests/test_datasets/test_square_out.k.gz'
+        uh.KHandler().deform_stream(self._ffd(), compressed, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        deformation = self._ffd()
+        deformation.original_mesh_points = uh.KHandler().parse(compressed)
+        deformation.perform()
+        np.testing.assert_array_almost_equal(
+            uh.KHandler().parse(outfilename), deformation.modified_mesh_points)
+
+    def test_k_deform_stream_failing_same_file(self):
+        k_handler = uh.KHandler()
+        with self.assertRaises(ValueError):
+            k_handler.deform_stream(self._ffd(),
+                                    'tests/test_datasets/test_square.k',
+                                    'tests/test_datasets/test_square.k')
+
+    def test_k_deform_stream_failing_block_size(self):
+        k_handler = uh.KHandler()
+        with self.assertRaises(ValueError):
+            k_handler.deform_stream(self._ffd(),
+                                    'tests/test_datasets/test_square.k',
+                                    'tests/test_datasets/test_square_out.k',
+                                    block_size=0)
+
+    def test_k_write_comparison_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = pc.PointsCache(directory=directory)
+        k_handler = uh.KHandler()
+        k_handler.cache = cache
+        k_handler.parse('tests/test_datasets/test_square.k')
+        cached_handler = uh.KHandler()
+        cached_handler.cache = cache
+        mesh_points = cached_handler.parse('tests/test_datasets/test_square.k')
+        np.testing.assert_array_equal(cached_handler.node_ids,
+                                      k_handler.node_ids)
+        mesh_points[0][0] = 2.2
+        mesh_points[5][1] = 4.3
+        mesh_points[9][2] = 0.5
+        mesh_points[45][0] = 7.2
+        mesh_points[132][1] = -1.2
+        mesh_points[255][2] = -3.6
+        outfilename = 'tests/test_datasets/test_square_out.k'
+        cached_handler.write(mesh_points, outfilename, mmap=True)
+        self.addCleanup(os.remove, outfilename)
+        self.assertTrue(
+            filecmp.cmp(outfilename,
+                        'tests/test_datasets/test_square_out_true.k'))
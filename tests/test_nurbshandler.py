@@ -1,5 +1,6 @@
 from unittest import TestCase
 import unittest
+import numpy as np
 from pygem.nurbshandler import NurbsHandler
 
 
@@ -67,3 +68,25 @@ class TestNurbsHandler(TestCase):
         except RuntimeError:
             self.fail(
                 "Handler was instantiated correctly, yet an error was raised.")
+
+    def test_nurbs_merge_nodes(self):
+        nodes = np.array([[0., 0., 0.], [1., 0., 0.], [1. + 1e-9, 0., 0.],
+                          [0., 1e-9, 0.], [0., 1., 0.]])
+        nodes_face = np.array([0, 0, 1, 1, 1])
+        merged, indices = NurbsHandler._merge_nodes(nodes, nodes_face, 1e-7)
+        np.testing.assert_array_equal(indices, [0, 1, 1, 0, 2])
+        np.testing.assert_array_almost_equal(
+            merged, [[0., 0., 0.], [1., 0., 0.], [0., 1., 0.]])
+
+    def test_nurbs_merge_nodes_same_face(self):
+        nodes = np.array([[0., 0., 0.], [1e-9, 0., 0.]])
+        merged, indices = NurbsHandler._merge_nodes(nodes, np.array([0, 0]),
+                                                    1e-7)
+        np.testing.assert_array_equal(indices, [0, 1])
+        np.testing.assert_array_equal(merged, nodes)
+
+    def test_nurbs_merge_nodes_empty(self):
+        merged, indices = NurbsHandler._merge_nodes(
+            np.empty((0, 3)), np.empty(0, dtype=int), 1e-7)
+        self.assertTupleEqual(merged.shape, (0, 3))
+        self.assertTupleEqual(indices.shape, (0, ))
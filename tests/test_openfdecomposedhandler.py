@@ -0,0 +1,156 @@
+from unittest import TestCase
+import gzip
+import os
+import shutil
+import tempfile
+import numpy as np
+import pygem.openfhandler as ofh
+import pygem.openfdecomposedhandler as odh
+from deform_stream_helper import DeformStreamMixin
+
+
+class TestOpenFoamDecomposedHandler(TestCase, DeformStreamMixin):
+    def _decompose(self, n_processors):
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(
+            'tests/test_datasets/test_openFOAM')
+        case = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, case)
+        with open('tests/test_datasets/test_openFOAM', 'rb') as input_file:
+            content = input_file.read()
+        header = content[:content.index(b'21812\n(')]
+        end = open_foam_handler._coord_spans[0][1]
+        bounds = np.linspace(
+            0, mesh_points.shape[0], n_processors + 1).astype(int)
+        for number, (first, last) in enumerate(zip(bounds[:-1], bounds[1:])):
+            directory = os.path.join(case, 'processor{0}'.format(number),
+                                     'constant', 'polyMesh')
+            os.makedirs(directory)
+            points = ofh.OpenFoamHandler._format_points(
+                mesh_points[first:last], '(%r %r %r)\n')
+            with open(os.path.join(directory, 'points'), 'wb') as output_file:
+                output_file.write(header + b'%d\n(\n' % (last - first) +
+                                  points.encode('ascii')[:-1] + content[end:])
+        return case, mesh_points, bounds
+
+    def test_open_foam_decomposed_default_extension_member(self):
+        handler = odh.OpenFoamDecomposedHandler()
+        self.assertListEqual(handler.extensions, [''])
+
+    def test_open_foam_decomposed_default_n_jobs_member(self):
+        handler = odh.OpenFoamDecomposedHandler()
+        self.assertIsNone(handler.n_jobs)
+
+    def test_open_foam_decomposed_parse_failing_filename_type(self):
+        handler = odh.OpenFoamDecomposedHandler()
+        with self.assertRaises(TypeError):
+            handler.parse(.2)
+
+    def test_open_foam_decomposed_parse_failing_no_processors(self):
+        case = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, case)
+        handler = odh.OpenFoamDecomposedHandler()
+        with self.assertRaises(ValueError):
+            handler.parse(case)
+
+    def test_open_foam_decomposed_parse_failing_not_directory(self):
+        handler = odh.OpenFoamDecomposedHandler()
+        with self.assertRaises(ValueError):
+            handler.parse('tests/test_datasets/test_openFOAM')
+
+    def test_open_foam_decomposed_parse(self):
+        case, mesh_points, _ = self._decompose(3)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=2)
+        np.testing.assert_array_equal(handler.parse(case), mesh_points)
+
+    def test_open_foam_decomposed_parse_serial(self):
+        case, mesh_points, _ = self._decompose(3)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        np.testing.assert_array_equal(handler.parse(case), mesh_points)
+
+    def test_open_foam_decomposed_parse_offsets(self):
+        case, _, bounds = self._decompose(3)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        handler.parse(case)
+        np.testing.assert_array_equal(handler.offsets, bounds)
+
+    def test_open_foam_decomposed_parse_processors_order(self):
+        case, mesh_points, bounds = self._decompose(11)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        parsed_points = handler.parse(case)
+        self.assertEqual(handler.processors[2], 'processor2')
+        self.assertEqual(handler.processors[10], 'processor10')
+        np.testing.assert_array_equal(parsed_points, mesh_points)
+
+    def test_open_foam_decomposed_write(self):
+        case, mesh_points, bounds = self._decompose(3)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=2)
+        handler.parse(case)
+        outcase = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outcase)
+        handler.write(mesh_points * 2., outcase)
+        for number in range(3):
+            points = ofh.OpenFoamHandler().parse(
+                os.path.join(outcase, 'processor{0}'.format(number),
+                             'constant', 'polyMesh', 'points'))
+            np.testing.assert_array_equal(
+                points, mesh_points[bounds[number]:bounds[number + 1]] * 2.)
+
+    def test_open_foam_decomposed_write_read(self):
+        case, mesh_points, _ = self._decompose(2)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        handler.parse(case)
+        outcase = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outcase)
+        handler.write(mesh_points + 1., outcase)
+        np.testing.assert_array_equal(
+            odh.OpenFoamDecomposedHandler(n_jobs=1).parse(outcase),
+            mesh_points + 1.)
+
+    def test_open_foam_decomposed_write_failing_n_points(self):
+        case, mesh_points, _ = self._decompose(2)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        handler.parse(case)
+        with self.assertRaises(ValueError):
+            handler.write(mesh_points[:-1], case)
+
+    def test_open_foam_decomposed_write_failing_infile_instantiation(self):
+        handler = odh.OpenFoamDecomposedHandler()
+        with self.assertRaises(RuntimeError):
+            handler.write(np.zeros((3, 3)), 'case')
+
+    def test_open_foam_decomposed_write_read_gzip(self):
+        case, mesh_points, _ = self._decompose(2)
+        for number in range(2):
+            filename = os.path.join(case, 'processor{0}'.format(number),
+                                    'constant', 'polyMesh', 'points')
+            with open(filename, 'rb') as input_file:
+                content = input_file.read()
+            with gzip.open(filename + '.gz', 'wb') as output_file:
+                output_file.write(content)
+            os.remove(filename)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        np.testing.assert_array_equal(handler.parse(case), mesh_points)
+        outcase = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outcase)
+        handler.write(mesh_points * 2., outcase)
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(outcase, 'processor1', 'constant', 'polyMesh',
+                             'points.gz')))
+        np.testing.assert_array_equal(
+            odh.OpenFoamDecomposedHandler(n_jobs=1).parse(outcase),
+            mesh_points * 2.)
+
+    def test_open_foam_decomposed_deform_stream(self):
+        case, mesh_points, _ = self._decompose(3)
+        deformation = self._ffd()
+        deformation.original_mesh_points = mesh_points
+        deformation.perform()
+        outcase = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outcase)
+        handler = odh.OpenFoamDecomposedHandler(n_jobs=1)
+        handler.deform_stream(self._ffd(), case, outcase, block_size=1000)
+        np.testing.assert_array_equal(
+            odh.OpenFoamDecomposedHandler(n_jobs=1).parse(outcase),
+            deformation.modified_mesh_points)
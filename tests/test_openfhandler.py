@@ -2,11 +2,16 @@ from unittest import TestCase
 import unittest
 import pygem.openfhandler as ofh
 import numpy as np
+import pygem.cache as pc
 import filecmp
+import gzip
 import os
+import shutil
+import tempfile
+from deform_stream_helper import DeformStreamMixin
 
 
-class TestOpenFoamHandler(TestCase):
+class TestOpenFoamHandler(TestCase, DeformStreamMixin):
     def test_open_foam_instantiation(self):
         open_foam_handler = ofh.OpenFoamHandler()
 
@@ -127,3 +132,207 @@ class TestOpenFoamHandler(TestCase):
         open_foam_handler.write(mesh_points, outfilename)
         self.assertTrue(filecmp.cmp(outfilename, outfilename_expected))
         self.addCleanup(os.remove, outfilename)
+
+    def test_open_foam_write_multiple(self):
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(
+            'tests/test_datasets/test_openFOAM')
+        outfilename = 'tests/test_datasets/test_openFOAM_out'
+        open_foam_handler.write(mesh_points + 1., outfilename)
+        open_foam_handler.write(mesh_points * 2., outfilename)
+        new_mesh_points = ofh.OpenFoamHandler().parse(outfilename)
+        np.testing.assert_array_almost_equal(new_mesh_points,
+                                             mesh_points * 2.)
+        self.addCleanup(os.remove, outfilename)
+
+    def test_open_foam_write_failing_n_points(self):
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(
+            'tests/test_datasets/test_openFOAM')
+        with self.assertRaises(ValueError):
+            open_foam_handler.write(mesh_points[:-1],
+                                    'tests/test_datasets/test_openFOAM_out')
+
+    def test_open_foam_parse_header(self):
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(
+            'tests/test_datasets/test_openFOAM')
+        self.assertDictEqual(
+            open_foam_handler.header, {
+                'version': '2.0',
+                'format': 'ascii',
+                'class': 'vectorField',
+                'location': 'constant/polyMesh',
+                'object': 'points'
+            })
+
+    def test_open_foam_parse_different_header(self):
+        filename = 'tests/test_datasets/test_openFOAM_header'
+        with open(filename, 'w') as output_file:
+            output_file.write(
+                '/* header comment with (1 2 3) and 17 */\n'
+                'FoamFile\n{\n    version 2.0; // a comment; with {\n'
+                '    format ascii;\n    class vectorField;\n'
+                '    note "points (moved)";\n    object points;\n}\n'
+                '// 5\n\n3 ((0 0 0) (1.5 0 -2) (0 1e-3 1))\n')
+        self.addCleanup(os.remove, filename)
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(filename)
+        np.testing.assert_array_almost_equal(
+            mesh_points, [[0., 0., 0.], [1.5, 0., -2.], [0., 1e-3, 1.]])
+        self.assertEqual(open_foam_handler.header['note'], 'points (moved)')
+
+    def test_open_foam_write_different_header(self):
+        filename = 'tests/test_datasets/test_openFOAM_header'
+        with open(filename, 'w') as output_file:
+            output_file.write('FoamFile\n{\n    format ascii;\n}\n'
+                              '2\n(\n(0 0 0)\n(1 1 1)\n)\n// end\n')
+        self.addCleanup(os.remove, filename)
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(filename)
+        outfilename = 'tests/test_datasets/test_openFOAM_out'
+        open_foam_handler.write(mesh_points + 1., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        with open(outfilename, 'r') as output_file:
+            self.assertEqual(
+                output_file.read(), 'FoamFile\n{\n    format ascii;\n}\n'
+                '2\n(\n(1.0 1.0 1.0)\n(2.0 2.0 2.0)\n)\n// end\n')
+
+    def test_open_foam_parse_failing_no_points(self):
+        filename = 'tests/test_datasets/test_openFOAM_header'
+        with open(filename, 'w') as output_file:
+            output_file.write('FoamFile\n{\n    format ascii;\n}\n')
+        self.addCleanup(os.remove, filename)
+        open_foam_handler = ofh.OpenFoamHandler()
+        with self.assertRaises(ValueError):
+            open_foam_handler.parse(filename)
+
+    def _write_binary_points(self, filename, mesh_points, arch, dtype):
+        with open(filename, 'wb') as output_file:
+            output_file.write(
+                b'FoamFile\n{\n    version 2.0;\n    format binary;\n'
+                b'    arch "' + arch + b'";\n    class vectorField;\n'
+                b'    object points;\n}\n\n' +
+                str(mesh_points.shape[0]).encode('ascii') + b'\n(')
+            output_file.write(mesh_points.astype(dtype).tobytes())
+            output_file.write(b')\n\n// end\n')
+        self.addCleanup(os.remove, filename)
+
+    def test_open_foam_parse_binary(self):
+        mesh_points = ofh.OpenFoamHandler().parse(
+            'tests/test_datasets/test_openFOAM')
+        filename = 'tests/test_datasets/test_openFOAM_binary'
+        self._write_binary_points(filename, mesh_points,
+                                  b'LSB;label=32;scalar=64', '<f8')
+        open_foam_handler = ofh.OpenFoamHandler()
+        binary_mesh_points = open_foam_handler.parse(filename)
+        self.assertEqual(open_foam_handler.header['format'], 'binary')
+        np.testing.assert_array_equal(binary_mesh_points, mesh_points)
+
+    def test_open_foam_parse_binary_single_precision(self):
+        mesh_points = ofh.OpenFoamHandler().parse(
+            'tests/test_datasets/test_openFOAM')
+        filename = 'tests/test_datasets/test_openFOAM_binary'
+        self._write_binary_points(filename, mesh_points,
+                                  b'MSB;label=64;scalar=32', '>f4')
+        binary_mesh_points = ofh.OpenFoamHandler().parse(filename)
+        np.testing.assert_array_almost_equal(binary_mesh_points, mesh_points,
+                                             4)
+
+    def test_open_foam_write_binary(self):
+        mesh_points = ofh.OpenFoamHandler().parse(
+            'tests/test_datasets/test_openFOAM')
+        filename = 'tests/test_datasets/test_openFOAM_binary'
+        self._write_binary_points(filename, mesh_points,
+                                  b'LSB;label=32;scalar=64', '<f8')
+        open_foam_handler = ofh.OpenFoamHandler()
+        binary_mesh_points = open_foam_handler.parse(filename)
+        outfilename = 'tests/test_datasets/test_openFOAM_out'
+        open_foam_handler.write(binary_mesh_points * 2., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        self.assertEqual(os.path.getsize(outfilename), os.path.getsize(filename))
+        np.testing.assert_array_equal(
+            ofh.OpenFoamHandler().parse(outfilename), mesh_points * 2.)
+
+    def test_open_foam_parse_failing_truncated_binary(self):
+        mesh_points = ofh.OpenFoamHandler().parse(
+            'tests/test_datasets/test_openFOAM')
+        filename = 'tests/test_datasets/test_openFOAM_binary'
+        self._write_binary_points(filename, mesh_points,
+                                  b'LSB;label=32;scalar=32', '<f8')
+        with self.assertRaises(ValueError):
+            ofh.OpenFoamHandler().parse(filename)
+
+    def test_open_foam_default_gzip_member(self):
+        open_foam_handler = ofh.OpenFoamHandler()
+        self.assertTrue(open_foam_handler.gzip)
+
+    def test_open_foam_parse_gzip(self):
+        with open('tests/test_datasets/test_openFOAM', 'rb') as input_file:
+            content = input_file.read()
+        filename = 'tests/test_datasets/test_openFOAM.gz'
+        with gzip.open(filename, 'wb') as output_file:
+            output_file.write(content)
+        self.addCleanup(os.remove, filename)
+        np.testing.assert_array_equal(
+            ofh.OpenFoamHandler().parse(filename),
+            ofh.OpenFoamHandler().parse('tests/test_datasets/test_openFOAM'))
+
+    def test_open_foam_write_gzip_comparison(self):
+        open_foam_handler = ofh.OpenFoamHandler()
+        mesh_points = open_foam_handler.parse(
+            'tests/test_datasets/test_openFOAM')
+        mesh_points[0] = [-14.1, 3.24, 0.]
+        mesh_points[1] = [-14.1, 3.24, 0.]
+        outfilename = 'tests/test_datasets/test_openFOAM_out.gz'
+        open_foam_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        with gzip.open(outfilename, 'rb') as output_file:
+            content = output_file.read()
+        outfilename_plain = 'tests/test_datasets/test_openFOAM_out'
+        open_foam_handler.write(mesh_points, outfilename_plain)
+        self.addCleanup(os.remove, outfilename_plain)
+        with open(outfilename_plain, 'rb') as output_file:
+            self.assertEqual(content, output_file.read())
+
+    def test_open_foam_deform_stream(self):
+        self._check_deform_stream(ofh.OpenFoamHandler,
+                                  'tests/test_datasets/test_openFOAM',
+                                  'tests/test_datasets/test_openFOAM_out',
+                                  block_size=1000)
+
+    def test_open_foam_deform_stream_failing_binary(self):
+        mesh_points = ofh.OpenFoamHandler().parse(
+            'tests/test_datasets/test_openFOAM')
+        filename = 'tests/test_datasets/test_openFOAM_binary'
+        self._write_binary_points(filename, mesh_points,
+                                  b'LSB;label=32;scalar=64', '<f8')
+        outfilename = 'tests/test_datasets/test_openFOAM_out'
+        with self.assertRaises(ValueError):
+            ofh.OpenFoamHandler().deform_stream(self._ffd(), filename,
+                                                outfilename)
+        self.assertFalse(os.path.exists(outfilename))
+
+    def test_open_foam_write_binary_cache(self):
+        mesh_points = ofh.OpenFoamHandler().parse(
+            'tests/test_datasets/test_openFOAM')
+        filename = 'tests/test_datasets/test_openFOAM_binary'
+        self._write_binary_points(filename, mesh_points,
+                                  b'LSB;label=32;scalar=32', '<f4')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = pc.PointsCache(directory=directory)
+        open_foam_handler = ofh.OpenFoamHandler()
+        open_foam_handler.cache = cache
+        binary_mesh_points = open_foam_handler.parse(filename)
+        cached_handler = ofh.OpenFoamHandler()
+        cached_handler.cache = cache
+        np.testing.assert_array_equal(
+            cached_handler.parse(filename), binary_mesh_points)
+        self.assertDictEqual(cached_handler.header, open_foam_handler.header)
+        outfilename = 'tests/test_datasets/test_openFOAM_out'
+        cached_handler.write(binary_mesh_points * 2., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        self.assertEqual(os.path.getsize(outfilename), os.path.getsize(filename))
+        np.testing.assert_array_equal(
+            ofh.OpenFoamHandler().parse(outfilename), binary_mesh_points * 2.)
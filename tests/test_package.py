@@ -1,10 +1,31 @@
 from unittest import TestCase
 import unittest
+import json
 import pkgutil
+import subprocess
+import sys
 from os import walk
 from os import path
 
 
+def import_modules(statement):
+    """
+    Runs `statement` in a new interpreter, from the root of the repository,
+    and returns the time it took and the top level modules imported.
+    """
+    code = ('import json, sys, time\n'
+            'start = time.time()\n'
+            '{0}\n'
+            'elapsed = time.time() - start\n'
+            'print(json.dumps([elapsed, '
+            'sorted(set(name.split(".")[0] for name in sys.modules))]))'
+           ).format(statement)
+    output = subprocess.check_output(
+        [sys.executable, '-c', code],
+        cwd=path.dirname(path.dirname(path.abspath(__file__))))
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
 class TestPackage(TestCase):
     def test_import_pg_1(self):
         import pygem as pg
@@ -46,6 +67,45 @@ class TestPackage(TestCase):
         import pygem as pg
         stph = pg.stephandler.StepHandler()
 
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'lazy imports need a module __getattr__')
+    def test_import_pg_lazy(self):
+        __, modules = import_modules('import pygem')
+        for module in ('vtk', 'OCC', 'matplotlib'):
+            self.assertNotIn(module, modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'lazy imports need a module __getattr__')
+    def test_import_pg_lazy_handler(self):
+        __, modules = import_modules('import pygem\npygem.VtkHandler')
+        self.assertIn('vtk', modules)
+        self.assertNotIn('OCC', modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'lazy imports need a module __getattr__')
+    def test_import_pg_lazy_stl_handler(self):
+        __, modules = import_modules('import pygem\npygem.StlHandler')
+        for module in ('vtk', 'OCC', 'matplotlib'):
+            self.assertNotIn(module, modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'lazy imports need a module __getattr__')
+    def test_import_pg_lazy_iges_handler(self):
+        __, modules = import_modules('import pygem\npygem.IgesHandler')
+        self.assertIn('OCC', modules)
+        for module in ('vtk', 'stl', 'matplotlib'):
+            self.assertNotIn(module, modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'lazy imports need a module __getattr__')
+    def test_import_pg_time(self):
+        lazy_time = min(
+            import_modules('import pygem')[0] for __ in range(3))
+        handler_time = min(
+            import_modules('import pygem\npygem.VtkHandler')[0]
+            for __ in range(3))
+        self.assertLess(lazy_time, handler_time)
+
     """
     def test_modules_name(self):
         # it checks that __all__ includes all the .py files in pygem folder
@@ -228,3 +228,27 @@ class TestStepHandler(TestCase):
         step_handler.write_shape_to_file(shp, path)
         self.assertTrue(os.path.exists(path))
         self.addCleanup(os.remove, path)
+
+    def test_step_default_n_jobs(self):
+        step_handler = sh.StepHandler()
+        self.assertEqual(step_handler.n_jobs, 1)
+
+    def test_step_write_processes(self):
+        step_handler = sh.StepHandler()
+        mesh_points = step_handler.parse('tests/test_datasets/test_pipe.step')
+        mesh_points[0][0] = 2.2
+        mesh_points[5][1] = 4.3
+        mesh_points[9][2] = 0.5
+        mesh_points[12][0] = 7.2
+        mesh_points[16][1] = -1.2
+        mesh_points[31][2] = -3.6
+        outfilename = 'tests/test_datasets/test_pipe_out.step'
+        outfilename_processes = 'tests/test_datasets/test_pipe_out_2.step'
+        step_handler.write(mesh_points, outfilename)
+        step_handler.n_jobs = 3
+        step_handler.write(mesh_points, outfilename_processes)
+        self.addCleanup(os.remove, outfilename)
+        self.addCleanup(os.remove, outfilename_processes)
+        np.testing.assert_array_almost_equal(
+            sh.StepHandler().parse(outfilename_processes),
+            sh.StepHandler().parse(outfilename))
@@ -2,8 +2,11 @@ from unittest import TestCase
 import unittest
 import pygem.stlhandler as sh
 import numpy as np
+import pygem.cache as pc
 import filecmp
 import os
+import shutil
+import tempfile
 
 
 class TestStlHandler(TestCase):
@@ -75,6 +78,122 @@ class TestStlHandler(TestCase):
             'tests/test_datasets/test_sphere_bin.stl')
         np.testing.assert_almost_equal(mesh_points[-2][2], -39.05963898)
 
+    def test_stl_parse_copy(self):
+        stl_handler = sh.StlHandler()
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        self.assertEqual(mesh_points.dtype, np.float64)
+        self.assertTrue(mesh_points.flags['OWNDATA'])
+
+    def test_stl_parse_view(self):
+        stl_handler = sh.StlHandler()
+        mesh_points = stl_handler.parse(
+            'tests/test_datasets/test_sphere.stl', copy=False)
+        self.assertFalse(mesh_points.flags['OWNDATA'])
+        np.testing.assert_almost_equal(mesh_points[33][0], -17.51774978, 5)
+
+    def test_stl_wrong_backend(self):
+        with self.assertRaises(ValueError):
+            stl_handler = sh.StlHandler(backend='gmsh')
+
+    def test_stl_default_backend_member(self):
+        stl_handler = sh.StlHandler()
+        self.assertEqual(stl_handler.backend, 'vtk')
+
+    def test_stl_numpy_parse_shape(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        self.assertTupleEqual(mesh_points.shape, (7200, 3))
+
+    def test_stl_numpy_parse_coords(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        np.testing.assert_almost_equal(mesh_points[2],
+                                       [-21.93821, -5.436286, 39.05964], 5)
+
+    def test_stl_numpy_parse_same_points_as_vtk(self):
+        mesh_points = sh.StlHandler(backend='numpy').parse(
+            'tests/test_datasets/test_sphere.stl')
+        vtk_mesh_points = sh.StlHandler().parse(
+            'tests/test_datasets/test_sphere.stl')
+        # VTK stores the points in single precision
+        np.testing.assert_array_equal(
+            np.unique(mesh_points.astype(np.float32), axis=0),
+            np.unique(vtk_mesh_points.astype(np.float32), axis=0))
+
+    def test_stl_numpy_parse_ascii_double(self):
+        mesh_points = sh.StlHandler(backend='numpy').parse(
+            'tests/test_datasets/test_sphere.stl', copy=False)
+        self.assertEqual(mesh_points.dtype, np.float64)
+        np.testing.assert_array_equal(mesh_points[2],
+                                      [-21.93821, -5.436286, 39.05964])
+
+    def test_stl_numpy_parse_bin(self):
+        mesh_points = sh.StlHandler(backend='numpy').parse(
+            'tests/test_datasets/test_sphere.stl')
+        mesh_points_bin = sh.StlHandler(backend='numpy').parse(
+            'tests/test_datasets/test_sphere_bin.stl')
+        np.testing.assert_array_almost_equal(mesh_points_bin, mesh_points, 5)
+
+    def test_stl_numpy_parse_bin_mmap(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl')
+        mesh_points_mmap = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl', mmap=True)
+        np.testing.assert_array_equal(mesh_points_mmap, mesh_points)
+
+    def test_stl_numpy_parse_bin_mmap_view(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl')
+        vertices = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl', copy=False, mmap=True)
+        self.assertEqual(vertices.shape, (2400, 3, 3))
+        self.assertIsInstance(stl_handler._attributes, np.memmap)
+        self.assertFalse(vertices.flags.owndata)
+        self.assertFalse(vertices.flags.writeable)
+        np.testing.assert_array_equal(vertices.reshape(-1, 3), mesh_points)
+
+    def test_stl_numpy_write_bin_mmap_view(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        vertices = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl', copy=False, mmap=True)
+        outfilename = 'tests/test_datasets/test_sphere_view_out.stl'
+        self.addCleanup(os.remove, outfilename)
+        stl_handler.write(vertices, outfilename, write_bin=True)
+        np.testing.assert_array_equal(
+            sh.StlHandler(backend='numpy').parse(outfilename),
+            vertices.reshape(-1, 3))
+
+    def test_stl_numpy_parse_view(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl', copy=False)
+        self.assertEqual(mesh_points.dtype, np.float32)
+
+    def test_stl_numpy_write_bin(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl')
+        outfilename = 'tests/test_datasets/test_sphere_out.stl'
+        stl_handler.write(mesh_points * 2., outfilename, write_bin=True)
+        new_mesh_points = sh.StlHandler(backend='numpy').parse(outfilename)
+        np.testing.assert_array_equal(new_mesh_points, mesh_points * 2.)
+        self.assertEqual(os.path.getsize(outfilename), 84 + 50 * 2400)
+        self.addCleanup(os.remove, outfilename)
+
+    def test_stl_numpy_write_ascii(self):
+        stl_handler = sh.StlHandler(backend='numpy')
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        outfilename = 'tests/test_datasets/test_sphere_out.stl'
+        stl_handler.write(mesh_points * 2., outfilename)
+        new_mesh_points = sh.StlHandler().parse(outfilename)
+        self.assertTupleEqual(new_mesh_points.shape, (1202, 3))
+        new_mesh_points = sh.StlHandler(backend='numpy').parse(outfilename)
+        np.testing.assert_array_almost_equal(new_mesh_points,
+                                             mesh_points * 2., 4)
+        self.addCleanup(os.remove, outfilename)
+
     def test_stl_write_failing_filename_type(self):
         stl_handler = sh.StlHandler()
         mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
@@ -95,6 +214,14 @@ class TestStlHandler(TestCase):
             stl_handler.write(mesh_points,
                               'tests/test_datasets/test_sphere_out.stl')
 
+    def test_stl_write_failing_points_number(self):
+        stl_handler = sh.StlHandler()
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        outfilename = 'tests/test_datasets/test_sphere_short_out.stl'
+        with self.assertRaises(ValueError):
+            stl_handler.write(mesh_points[:10], outfilename)
+        self.assertFalse(os.path.exists(outfilename))
+
     def test_stl_write_outfile(self):
         stl_handler = sh.StlHandler()
         mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
@@ -103,6 +230,26 @@ class TestStlHandler(TestCase):
         self.assertEqual(stl_handler.outfile, outfilename)
         self.addCleanup(os.remove, outfilename)
 
+    def test_stl_write_multiple(self):
+        stl_handler = sh.StlHandler()
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        outfilename = 'tests/test_datasets/test_sphere_out.stl'
+        stl_handler.write(mesh_points + 1., outfilename)
+        stl_handler.write(mesh_points * 2., outfilename)
+        new_points = sh.StlHandler().parse(outfilename)
+        np.testing.assert_array_almost_equal(new_points, mesh_points * 2., 4)
+        self.addCleanup(os.remove, outfilename)
+
+    def test_stl_write_keeps_parsed_points(self):
+        stl_handler = sh.StlHandler()
+        mesh_points = stl_handler.parse(
+            'tests/test_datasets/test_sphere.stl', copy=False)
+        expected = np.array(mesh_points)
+        outfilename = 'tests/test_datasets/test_sphere_out.stl'
+        stl_handler.write(mesh_points + 1., outfilename)
+        np.testing.assert_array_equal(mesh_points, expected)
+        self.addCleanup(os.remove, outfilename)
+
     def test_stl_write_comparison(self):
         stl_handler = sh.StlHandler()
         mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
@@ -213,3 +360,38 @@ class TestStlHandler(TestCase):
         stl_handler = sh.StlHandler()
         with self.assertRaises(TypeError):
             stl_handler.show(show_file=3)
+
+    def test_stl_parse_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = pc.PointsCache(directory=directory)
+        stl_handler = sh.StlHandler()
+        stl_handler.cache = cache
+        mesh_points = stl_handler.parse('tests/test_datasets/test_sphere.stl')
+        cached_handler = sh.StlHandler()
+        cached_handler.cache = cache
+        cached_points = cached_handler.parse(
+            'tests/test_datasets/test_sphere.stl')
+        np.testing.assert_array_equal(cached_points, mesh_points)
+        self.assertEqual(cached_points.dtype, np.float64)
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_stl_parse_cache_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = pc.PointsCache(directory=directory)
+        stl_handler = sh.StlHandler()
+        stl_handler.cache = cache
+        stl_handler.parse('tests/test_datasets/test_sphere_bin.stl')
+        numpy_handler = sh.StlHandler(backend='numpy')
+        numpy_handler.cache = cache
+        numpy_handler.parse('tests/test_datasets/test_sphere_bin.stl')
+        cached_handler = sh.StlHandler(backend='numpy')
+        cached_handler.cache = cache
+        mesh_points = cached_handler.parse(
+            'tests/test_datasets/test_sphere_bin.stl')
+        self.assertEqual(len(os.listdir(directory)), 4)
+        np.testing.assert_array_equal(cached_handler._attributes,
+                                      numpy_handler._attributes)
+        self.assertEqual(mesh_points.shape[0],
+                         3 * numpy_handler._attributes.shape[0])
@@ -2,11 +2,16 @@ from unittest import TestCase
 import unittest
 import pygem.unvhandler as uh
 import numpy as np
+import pygem.cache as pc
 import filecmp
+import gzip
 import os
+import shutil
+import tempfile
+from deform_stream_helper import DeformStreamMixin
 
 
-class TestUnvHandler(TestCase):
+class TestUnvHandler(TestCase, DeformStreamMixin):
     def test_unv_instantiation(self):
         unv_handler = uh.UnvHandler()
 
@@ -125,3 +130,106 @@ class TestUnvHandler(TestCase):
         unv_handler.write(mesh_points, outfilename)
         self.assertTrue(filecmp.cmp(outfilename, outfilename_expected))
         self.addCleanup(os.remove, outfilename)
+
+    def test_unv_parse_node_ids(self):
+        unv_handler = uh.UnvHandler()
+        mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+        np.testing.assert_array_equal(unv_handler.node_ids,
+                                      np.arange(1, 257))
+
+    def test_unv_default_node_ids_member(self):
+        unv_handler = uh.UnvHandler()
+        self.assertIsNone(unv_handler.node_ids)
+
+    def test_unv_write_multiple(self):
+        unv_handler = uh.UnvHandler()
+        mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+        outfilename = 'tests/test_datasets/test_square_out.unv'
+        unv_handler.write(mesh_points + 1., outfilename)
+        unv_handler.write(mesh_points * 2., outfilename)
+        new_mesh_points = uh.UnvHandler().parse(outfilename)
+        np.testing.assert_array_almost_equal(new_mesh_points,
+                                             mesh_points * 2.)
+        self.addCleanup(os.remove, outfilename)
+
+    def test_unv_write_failing_n_points(self):
+        unv_handler = uh.UnvHandler()
+        mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+        with self.assertRaises(ValueError):
+            unv_handler.write(mesh_points[:-1],
+                              'tests/test_datasets/test_square_out.unv')
+
+    def test_unv_default_gzip_member(self):
+        unv_handler = uh.UnvHandler()
+        self.assertTrue(unv_handler.gzip)
+
+    def test_unv_write_read_gzip(self):
+        unv_handler = uh.UnvHandler()
+        mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+        outfilename = 'tests/test_datasets/test_square_out.unv.gz'
+        unv_handler.write(mesh_points * 2., outfilename)
+        self.addCleanup(os.remove, outfilename)
+        np.testing.assert_array_almost_equal(
+            uh.UnvHandler().parse(outfilename), mesh_points * 2.)
+
+    def test_unv_write_gzip_comparison(self):
+        unv_handler = uh.UnvHandler()
+        mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+        outfilename = 'tests/test_datasets/test_square_out.unv.gz'
+        unv_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        with gzip.open(outfilename, 'rb') as output_file:
+            content = output_file.read()
+        with open('tests/test_datasets/test_square.unv', 'rb') as input_file:
+            self.assertEqual(content, input_file.read())
+
+    def test_unv_deform_stream(self):
+        self._check_deform_stream(uh.UnvHandler,
+                                  'tests/test_datasets/test_square.unv',
+                                  'tests/test_datasets/test_square_out.unv',
+                                  block_size=5)
+
+    def _cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return pc.PointsCache(directory=directory)
+
+    def test_unv_default_cache_member(self):
+        unv_handler = uh.UnvHandler()
+        self.assertIsNone(unv_handler.cache)
+
+    def test_unv_parse_cache(self):
+        cache = self._cache()
+        unv_handler = uh.UnvHandler()
+        unv_handler.cache = cache
+        mesh_points = unv_handler.parse('tests/test_datasets/test_square.unv')
+        cached_handler = uh.UnvHandler()
+        cached_handler.cache = cache
+        cached_points = cached_handler.parse(
+            'tests/test_datasets/test_square.unv')
+        self.assertIsInstance(cached_points, np.memmap)
+        np.testing.assert_array_equal(cached_points, mesh_points)
+        np.testing.assert_array_equal(cached_handler.node_ids,
+                                      unv_handler.node_ids)
+
+    def test_unv_write_comparison_cache(self):
+        cache = self._cache()
+        unv_handler = uh.UnvHandler()
+        unv_handler.cache = cache
+        unv_handler.parse('tests/test_datasets/test_square.unv')
+        cached_handler = uh.UnvHandler()
+        cached_handler.cache = cache
+        mesh_points = cached_handler.parse(
+            'tests/test_datasets/test_square.unv')
+        mesh_points[0][0] = 2.2
+        mesh_points[5][1] = 4.3
+        mesh_points[9][2] = 0.5
+        mesh_points[45][0] = 7.2
+        mesh_points[132][1] = -1.2
+        mesh_points[255][2] = -3.6
+        outfilename = 'tests/test_datasets/test_square_out.unv'
+        cached_handler.write(mesh_points, outfilename)
+        self.addCleanup(os.remove, outfilename)
+        self.assertTrue(
+            filecmp.cmp(outfilename,
+                        'tests/test_datasets/test_square_out_true.unv'))
@@ -83,6 +83,20 @@ class TestVtkHandler(TestCase):
             'tests/test_datasets/test_red_blood_cell.vtk')
         np.testing.assert_almost_equal(mesh_points[-1][2], -2.8480699)
 
+    def test_vtk_parse_copy(self):
+        vtk_handler = vh.VtkHandler()
+        mesh_points = vtk_handler.parse(
+            'tests/test_datasets/test_red_blood_cell.vtk')
+        self.assertEqual(mesh_points.dtype, np.float64)
+        self.assertTrue(mesh_points.flags['OWNDATA'])
+
+    def test_vtk_parse_view(self):
+        vtk_handler = vh.VtkHandler()
+        mesh_points = vtk_handler.parse(
+            'tests/test_datasets/test_red_blood_cell.vtk', copy=False)
+        self.assertFalse(mesh_points.flags['OWNDATA'])
+        np.testing.assert_almost_equal(mesh_points[33][0], -2.2977099, 5)
+
     def test_vtk_write_failing_filename_type(self):
         vtk_handler = vh.VtkHandler()
         mesh_points = vtk_handler.parse(
@@ -105,6 +119,15 @@ class TestVtkHandler(TestCase):
             vtk_handler.write(mesh_points,
                               'tests/test_datasets/test_red_blood_cell_out.vtk')
 
+    def test_vtk_write_failing_points_number(self):
+        vtk_handler = vh.VtkHandler()
+        mesh_points = vtk_handler.parse(
+            'tests/test_datasets/test_red_blood_cell.vtk')
+        outfilename = 'tests/test_datasets/test_red_blood_cell_short_out.vtk'
+        with self.assertRaises(ValueError):
+            vtk_handler.write(mesh_points[:10], outfilename)
+        self.assertFalse(os.path.exists(outfilename))
+
     def test_vtk_write_outfile(self):
         vtk_handler = vh.VtkHandler()
         mesh_points = vtk_handler.parse(
@@ -114,6 +137,17 @@ class TestVtkHandler(TestCase):
         assert vtk_handler.outfile == outfilename
         os.remove(outfilename)
 
+    def test_vtk_write_multiple(self):
+        vtk_handler = vh.VtkHandler()
+        mesh_points = vtk_handler.parse(
+            'tests/test_datasets/test_red_blood_cell.vtk')
+        outfilename = 'tests/test_datasets/test_red_blood_cell_out.vtk'
+        vtk_handler.write(mesh_points + 1., outfilename)
+        vtk_handler.write(mesh_points * 2., outfilename)
+        new_points = vh.VtkHandler().parse(outfilename)
+        np.testing.assert_array_almost_equal(new_points, mesh_points * 2., 5)
+        os.remove(outfilename)
+
     def test_vtk_write_comparison(self):
         import vtk
         vtk_handler = vh.VtkHandler()